@@ -1,9 +1,14 @@
 from datetime import datetime
-from flask import Flask, jsonify, request
-import sqlite3
+from flask import Flask, g, jsonify, request
 import os
+import sqlite3
 import sys
 
+from utils import (
+    binning, cube, fx, instrumentation, leaderboard, outcomes, replica, responses, search, series, storage
+)
+from utils.config import BACKEND_PORT, DATA_DIR, DB_NAME
+
 # Redirect stdout and stderr to null (no output)
 # sys.stdout = open(os.devnull, 'w')
 # sys.stderr = open(os.devnull, 'w')
@@ -12,37 +17,106 @@ import sys
 app = Flask(__name__)
 
 # Define paths
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-DB_NAME = os.path.join(DATA_DIR, "trades.db")
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+
+# Opt-in request/query metrics (TRADESTAT_METRICS=1) and sampled cProfile output
+# (TRADESTAT_PROFILE_SAMPLE_RATE=0.05)
+instrumentation.init_app(app, PROFILE_DIR)
+# orjson encoding, ?format=columnar tables and gzip/br compression of JSON responses
+responses.init_app(app)
+
+# Analytics read from a periodically refreshed snapshot so they never contend with
+# the importer writing to the primary (TRADESTAT_REPLICA_INTERVAL=0 to disable)
+analytics = replica.Replica(DB_NAME)
+# Storage backend: SQLite by default, DuckDB for analytics with TRADESTAT_STORAGE=duckdb
+store = storage.get_storage(DB_NAME, replica=analytics)
+
+
+def record_freshness():
+    """
+    Remember where the data of the last read came from, for the response headers.
+    """
+    g.data_source, g.data_as_of = store.freshness()
 
 
-def query_database(query, params=()):
+def query_database(query, params=(), account_id=None):
     """
-    Helper function to query the database and return results.
+    Helper function to query the database and return results. Queries filtering on one
+    account pass its id, so sharded storage only opens that account's database.
     """
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
+    rows = store.analytics(query, params, account_id)
+    record_freshness()
     return rows
 
+
+def stream_database(query, params=(), account_id=None):
+    """
+    Like query_database, but yield the rows as they are fetched in chunks, for endpoints
+    aggregating every trade of an account without holding all of them.
+    """
+    for rows in store.stream(query, params, account_id):
+        yield from rows
+    record_freshness()
+
+
+def outcome_sql(account_id):
+    """
+    SQL expression of a trade's outcome under the account's break-even threshold, which
+    is read once here so the per-row expression compares with a constant.
+    """
+    rows = query_database(*outcomes.threshold_query(account_id), account_id=account_id)
+    return outcomes.expression(threshold=outcomes.threshold_of(rows))
+
+
+def series_response(fields, rows, stride):
+    """
+    Per-trade table response; X-Series-Stride tells how many trades each entry stands
+    for when the account exceeded the point ceiling (1 when every trade is included).
+    """
+    response = responses.table(fields, rows)
+    response.headers["X-Series-Stride"] = str(stride)
+    return response
+
+
+@app.after_request
+def add_freshness_headers(response):
+    """
+    Tell clients which copy answered and how old its data is.
+    """
+    source = g.get("data_source")
+    if source is not None:
+        response.headers["X-Data-Source"] = source
+        as_of = g.get("data_as_of")
+        if as_of is not None:
+            response.headers["X-Data-As-Of"] = datetime.fromtimestamp(as_of).isoformat(timespec="seconds")
+            response.headers["X-Data-Lag"] = f"{max(0.0, datetime.now().timestamp() - as_of):.1f}"
+        else:
+            response.headers["X-Data-Lag"] = "0.0"
+    return response
+
 @app.route('/stats/health', methods=['GET'])
 def health_check():
     """
-    Simple health check endpoint.
+    Simple health check endpoint, including the age of the analytics replica.
     """
-    return jsonify({"status": "OK"})
+    as_of = analytics.as_of() if analytics.enabled else None
+    return jsonify({
+        "status": "OK",
+        "replica": {
+            "enabled": analytics.enabled,
+            "as_of": datetime.fromtimestamp(as_of).isoformat(timespec="seconds") if as_of else None,
+            "lag_seconds": round(datetime.now().timestamp() - as_of, 1) if as_of else None,
+        }
+    })
 
 @app.route('/accounts', methods=['GET'])
 def get_accounts():
     """
-    Endpoint to retrieve all account IDs and names.
+    Endpoint to retrieve all account IDs, names and the currency their P/L is stored in.
     """
-    query = "SELECT id, name FROM accounts"
+    query = "SELECT id, name, base_currency FROM accounts"
     rows = query_database(query)
-    accounts = [{"id": row[0], "name": row[1]} for row in rows]
+    accounts = [{"id": row[0], "name": row[1], "base_currency": row[2] or fx.DEFAULT_BASE_CURRENCY} for row in rows]
     return jsonify(accounts)
 
 
@@ -52,67 +126,96 @@ def summary_stats():
     Endpoint to provide summary statistics including break-even trades, filtered by account_id.
     """
     account_id = request.args.get('account_id',1)
-    query = """
-    SELECT 
-        COUNT(*) AS total_trades,
-        SUM(CASE WHEN trade_outcome = 'Win' THEN 1 ELSE 0 END) AS total_wins,
-        SUM(CASE WHEN trade_outcome = 'Loss' THEN 1 ELSE 0 END) AS total_losses,
-        SUM(CASE WHEN trade_outcome = 'Break-even' THEN 1 ELSE 0 END) AS total_break_even,
-        SUM(CASE WHEN trade_outcome = 'Unknown' THEN 1 ELSE 0 END) AS total_unknowns
+    # Grouped rather than one SUM per outcome, which would compute the outcome once per SUM
+    query = f"""
+    SELECT {outcome_sql(account_id)} AS outcome, COUNT(*) AS trade_count
     FROM trades WHERE account_id = ?
+    GROUP BY outcome
     """
-    stats = query_database(query, params=(account_id,))[0]
+    counts = dict(query_database(query, params=(account_id,), account_id=account_id))
     return jsonify({
-        'total_trades': stats[0],
-        'total_wins': stats[1],
-        'total_losses': stats[2],
-        'total_break_even': stats[3],
-        'total_unknowns': stats[4]
+        'total_trades': sum(counts.values()),
+        'total_wins': counts.get('Win', 0),
+        'total_losses': counts.get('Loss', 0),
+        'total_break_even': counts.get('Break-even', 0),
+        'total_unknowns': counts.get('Unknown', 0)
     })
 
 @app.route('/stats/pnl', methods=['GET'])
 def pnl_stats():
     """
     Endpoint to provide profit and loss stats over time, filtered by account_id.
+    Accounts with more trades than `max_points` get consecutive trades merged into
+    points carrying their summed P/L and trade count; single trades carry their outcome.
     """
     account_id = request.args.get('account_id',1)
-    query = """
-    SELECT opened, profit_loss FROM trades 
-    WHERE profit_loss != '#' AND account_id = ?
-    ORDER BY datetime(substr(opened, 7, 4) || '-' || substr(opened, 4, 2) || '-' || substr(opened, 1, 2))
-    """
-    rows = query_database(query, params=(account_id,))
-    pnl = []
-    cumulative_pnl = 0.0
-    for row in rows:
+    query = f"""
+    SELECT opened, profit_loss, {outcome_sql(account_id)} FROM trades 
+    WHERE {outcomes.pnl_as_written()} != '#' AND account_id = ?
+    ORDER BY substr(opened, 7, 4) || '-' || substr(opened, 4, 2) || '-' || substr(opened, 1, 2),
+             substr(opened, 12, 5), id
+    """
+    curve = series.EquityCurve(series.max_points(request.args.get('max_points')))
+    for opened, value, outcome in stream_database(query, params=(account_id,), account_id=account_id):
         try:
-            profit_loss = float(row[1])
-            cumulative_pnl += profit_loss
-            pnl.append({
-                'date': row[0],
-                'profit_loss': profit_loss,
-                'cumulative_pnl': cumulative_pnl
-            })
-        except ValueError:
+            profit_loss = float(value)
+        except (TypeError, ValueError):
+            # '#' and P/L waiting for an FX rate (NULL) have no point on the curve
             continue
-    return jsonify(pnl)
+        curve.add(opened, profit_loss, outcome)
+    return series_response(
+        ('date', 'profit_loss', 'cumulative_pnl', 'trades', 'outcome'), curve.points(), curve.stride
+    )
 
 @app.route('/stats/duration_heatmap', methods=['GET'])
 def duration_heatmap():
     """
-    Endpoint to provide trade outcomes and durations for heatmap generation.
+    Endpoint to provide trade outcomes and durations for heatmap generation, sampled
+    evenly down to `max_points` trades for larger accounts.
     """
     account_id = request.args.get('account_id',1)
-    query = """
+    query = f"""
     SELECT
-        trade_outcome,
+        {outcome_sql(account_id)} AS outcome,
         trade_duration_minutes
     FROM trades
-    WHERE trade_duration_minutes IS NOT NULL AND trade_outcome IN ('Win', 'Loss', 'Break-Even') AND account_id = ?
+    WHERE trade_duration_minutes IS NOT NULL AND account_id = ?
     """
-    rows = query_database(query, params=(account_id,))
-    duration_data = [{"outcome": row[0], "duration": row[1]} for row in rows]
-    return jsonify(duration_data)
+    sample = series.Sample(series.max_points(request.args.get('max_points')))
+    rows = stream_database(query, params=(account_id,), account_id=account_id)
+    sample.extend(row for row in rows if row[0] in outcomes.OUTCOMES)
+    return series_response(("outcome", "duration"), sample.rows, sample.stride)
+
+@app.route('/stats/duration_histogram', methods=['GET'])
+def duration_histogram():
+    """
+    Endpoint to provide trade counts per duration bin and outcome, filtered by account_id.
+    The bins split the account's duration range into `bins` equal parts (default 10).
+    """
+    account_id = request.args.get('account_id', 1)
+    try:
+        bins = min(max(int(request.args.get('bins', 10)), 1), 200)
+    except ValueError:
+        return jsonify({"error": "bins must be an integer"}), 400
+    query = f"""
+    SELECT {outcome_sql(account_id)} AS outcome, trade_duration_minutes, COUNT(*)
+    FROM trades
+    WHERE trade_duration_minutes IS NOT NULL AND account_id = ?
+    GROUP BY outcome, trade_duration_minutes
+    HAVING outcome <> 'Unknown'
+    """
+    rows = query_database(query, params=(account_id,), account_id=account_id)
+    if not rows:
+        return jsonify({"bins": bins, "edges": [], "outcomes": {}})
+
+    durations = [row[1] for row in rows]
+    value_range = (min(durations), max(durations))
+    outcomes = {}
+    for outcome in sorted({row[0] for row in rows}):
+        selected = [row for row in rows if row[0] == outcome]
+        edges, counts = binning.histogram([row[1] for row in selected], [row[2] for row in selected], bins, value_range)
+        outcomes[outcome] = counts
+    return jsonify({"bins": bins, "edges": edges, "outcomes": outcomes})
 
 
 @app.route('/stats/monthly', methods=['GET'])
@@ -125,11 +228,9 @@ def monthly_performance():
         FROM trades
         WHERE account_id = ?
     """
-    rows = query_database(query, (account_id,))
-
     monthly_data = {}
 
-    for time_writing, opened, profit_loss in rows:
+    for time_writing, opened, profit_loss in stream_database(query, (account_id,), account_id=account_id):
         try:
             if time_writing_mode and time_writing:
                 time_obj = datetime.strptime(time_writing.strip(), "%d/%m/%Y %H:%M")
@@ -156,14 +257,13 @@ def daily_performance():
     Endpoint to provide daily performance stats, filtered by account_id.
     """
     account_id = request.args.get('account_id',1)
-    query = """
+    query = f"""
     SELECT 
         open_day,
-        trade_outcome
+        {outcome_sql(account_id)}
     FROM trades
     WHERE account_id = ?
     """
-    rows = query_database(query, params=(account_id,))
     performance = {
         "Monday": {"wins": 0, "losses": 0, "break_even": 0},
         "Tuesday": {"wins": 0, "losses": 0, "break_even": 0},
@@ -173,14 +273,14 @@ def daily_performance():
         "Saturday": {"wins": 0, "losses": 0, "break_even": 0},
         "Sunday": {"wins": 0, "losses": 0, "break_even": 0},
     }
-    for row in rows:
-        day, trade_outcome = row
+    for row in stream_database(query, params=(account_id,), account_id=account_id):
+        day, outcome = row
         if day in performance:
-            if trade_outcome == "Win":
+            if outcome == "Win":
                 performance[day]["wins"] += 1
-            elif trade_outcome == "Loss":
+            elif outcome == "Loss":
                 performance[day]["losses"] += 1
-            elif trade_outcome == "Break-even":
+            elif outcome == "Break-even":
                 performance[day]["break_even"] += 1
     return jsonify(performance)
 
@@ -191,17 +291,17 @@ def performance_killzone():
     """
     account_id = request.args.get('account_id',1)
 
-    query = """
+    query = f"""
     SELECT
         killzone,
         open_day,
         COUNT(*) AS trade_count
     FROM trades
-    WHERE profit_loss != '#' AND killzone IS NOT NULL AND open_day IS NOT NULL AND account_id = ?
+    WHERE {outcomes.pnl_as_written()} != '#' AND killzone IS NOT NULL AND open_day IS NOT NULL AND account_id = ?
     GROUP BY killzone, open_day
     ORDER BY killzone, open_day
     """
-    rows = query_database(query, params=(account_id,))
+    rows = query_database(query, params=(account_id,), account_id=account_id)
 
     performance = {}
     for row in rows:
@@ -219,17 +319,17 @@ def performance_killzone_outcomes():
     Endpoint to provide trade outcomes grouped by killzone, filtered by account_id.
     """
     account_id = request.args.get('account_id',1)
-    query = """
+    query = f"""
     SELECT 
         killzone,
-        trade_outcome,
+        {outcome_sql(account_id)} AS outcome,
         COUNT(*) AS trade_count
     FROM trades
-    WHERE profit_loss != '#' AND killzone IS NOT NULL AND account_id = ?
-    GROUP BY killzone, trade_outcome
-    ORDER BY killzone, trade_outcome
+    WHERE {outcomes.pnl_as_written()} != '#' AND killzone IS NOT NULL AND account_id = ?
+    GROUP BY killzone, outcome
+    ORDER BY killzone, outcome
     """
-    rows = query_database(query, params=(account_id,))
+    rows = query_database(query, params=(account_id,), account_id=account_id)
     performance = {}
     for row in rows:
         killzone, outcome, count = row
@@ -243,51 +343,117 @@ def performance_killzone_outcomes():
             performance[killzone]["break_even"] += count
     return jsonify(performance)
 
+@app.route('/stats/cube', methods=['GET'])
+def cube_slice():
+    """
+    Endpoint to slice the precomputed analytics cube: trade count, wins, P/L and duration
+    sums grouped by any of account, weekday, hour, killzone, outcome and strategy.
+    Example: /stats/cube?account_id=1&group_by=weekday,hour&outcome=Win
+    """
+    group_by = [d.strip() for d in request.args.get('group_by', '').split(',') if d.strip()]
+    filters = {d: request.args[d] for d in cube.DIMENSIONS if d != 'account' and d in request.args}
+    if 'account_id' in request.args:
+        filters['account'] = request.args['account_id']
+    try:
+        query, params, fields = cube.slice_query(group_by, filters)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if store.sharded and filters.get('account') is None:
+        # All accounts: slice every shard on its own (there may be more than SQLite can
+        # attach at once) and add up the cells
+        connections = store.analytics_connections()
+        record_freshness()
+        try:
+            rows = cube.merge_slices(
+                [instrumentation.fetch_all(conn, query, params) for conn in connections], group_by
+            )
+        finally:
+            for conn in connections:
+                conn.close()
+    else:
+        rows = query_database(query, params=params, account_id=filters.get('account'))
+    return responses.table(fields, rows)
+
 @app.route('/stats/best_worst_trade', methods=['GET'])
 def best_worst_trade():
     """
-    Endpoint to fetch the top 5 best and worst trades, filtered by account_id.
+    Endpoint to fetch the K best and worst trades of an account from the precomputed
+    leaderboards. metric is pnl (default), pips or r, k defaults to 5 (at most 100),
+    and strategy and date_from/date_to (YYYY-MM-DD, inclusive) narrow the ranking.
+    Example: /stats/best_worst_trade?account_id=1&metric=pips&k=10&strategy=Order%20Block
     """
     account_id = request.args.get('account_id',1)
-    best_query = """
-    SELECT filename, opened, closed, profit_loss
-    FROM trades
-    WHERE profit_loss != '#' AND account_id = ?
-    ORDER BY CAST(profit_loss AS FLOAT) DESC
-    LIMIT 5
-    """
-    worst_query = """
-    SELECT filename, opened, closed, profit_loss
-    FROM trades
-    WHERE profit_loss != '#' AND account_id = ?
-    ORDER BY CAST(profit_loss AS FLOAT) ASC
-    LIMIT 5
-    """
-    best_trades = query_database(best_query, params=(account_id,))
-    worst_trades = query_database(worst_query, params=(account_id,))
-    best_trades_list = [{'filename': row[0], 'opened': row[1], 'closed': row[2], 'profit_loss': row[3]} for row in best_trades]
-    worst_trades_list = [{'filename': row[0], 'opened': row[1], 'closed': row[2], 'profit_loss': row[3]} for row in worst_trades]
+    metric = request.args.get('metric', 'pnl')
+    strategy = request.args.get('strategy') or None
+    date_from = request.args.get('date_from') or None
+    date_to = request.args.get('date_to') or None
+    if metric not in leaderboard.METRICS:
+        return jsonify({"error": f"Unknown metric '{metric}'. Use: {', '.join(leaderboard.METRICS)}"}), 400
+    try:
+        for value in (date_from, date_to):
+            if value:
+                datetime.strptime(value, "%Y-%m-%d")
+        k = int(request.args.get('k', 5))
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD and k an integer"}), 400
+    best_query, best_params, fields = leaderboard.top_query(
+        metric, True, k, account_id, strategy, date_from, date_to
+    )
+    worst_query, worst_params, _ = leaderboard.top_query(
+        metric, False, k, account_id, strategy, date_from, date_to
+    )
+    best_trades = query_database(best_query, params=best_params, account_id=account_id)
+    worst_trades = query_database(worst_query, params=worst_params, account_id=account_id)
     return jsonify({
-        'best_trades': best_trades_list,
-        'worst_trades': worst_trades_list
+        'metric': metric,
+        'best_trades': [dict(zip(fields, row)) for row in best_trades],
+        'worst_trades': [dict(zip(fields, row)) for row in worst_trades]
     })
 
 @app.route('/stats/reward_ratios', methods=['GET'])
 def reward_ratios():
     """
-    Endpoint to provide reward ratios grouped by trade outcome, filtered by account_id.
+    Endpoint to provide reward ratios grouped by trade outcome, filtered by account_id,
+    sampled evenly down to `max_points` trades for larger accounts.
     """
     account_id = request.args.get('account_id',1)
-    query = """
+    query = f"""
     SELECT 
-        trade_outcome,
-        CAST(risk_reward AS FLOAT) AS reward_ratio
+        {outcome_sql(account_id)} AS outcome,
+        CAST(risk_reward AS DOUBLE) AS reward_ratio
     FROM trades
     WHERE risk_reward != '' AND risk_reward IS NOT NULL AND account_id = ?
     """
-    rows = query_database(query, params=(account_id,))
-    reward_ratios = [{"outcome": row[0], "reward_ratio": row[1]} for row in rows]
-    return jsonify(reward_ratios)
+    sample = series.Sample(series.max_points(request.args.get('max_points')))
+    sample.extend(stream_database(query, params=(account_id,), account_id=account_id))
+    return series_response(("outcome", "reward_ratio"), sample.rows, sample.stride)
+
+@app.route('/stats/reward_ratio_summary', methods=['GET'])
+def reward_ratio_summary():
+    """
+    Endpoint to provide box-plot statistics of reward ratios per trade outcome, filtered
+    by account_id: quartiles, mean, whisker fences and at most `max_outliers` outliers.
+    """
+    account_id = request.args.get('account_id', 1)
+    try:
+        max_outliers = min(max(int(request.args.get('max_outliers', 50)), 0), 1000)
+    except ValueError:
+        return jsonify({"error": "max_outliers must be an integer"}), 400
+    query = f"""
+    SELECT {outcome_sql(account_id)} AS outcome, CAST(risk_reward AS DOUBLE) AS reward_ratio, COUNT(*)
+    FROM trades
+    WHERE risk_reward != '' AND risk_reward IS NOT NULL AND account_id = ?
+    GROUP BY outcome, CAST(risk_reward AS DOUBLE)
+    """
+    rows = query_database(query, params=(account_id,), account_id=account_id)
+    summary = {}
+    for outcome in sorted({row[0] for row in rows if row[0] is not None}):
+        selected = [row for row in rows if row[0] == outcome and row[1] is not None]
+        if selected:
+            summary[outcome] = binning.box_summary(
+                [row[1] for row in selected], [row[2] for row in selected], max_outliers
+            )
+    return jsonify(summary)
 
 @app.route('/stats/average_trade_duration', methods=['GET'])
 def average_trade_duration():
@@ -295,15 +461,15 @@ def average_trade_duration():
     Endpoint to provide average trade duration by outcome, filtered by account_id.
     """
     account_id = request.args.get('account_id',1)
-    query = """
+    query = f"""
     SELECT 
-        trade_outcome,
+        {outcome_sql(account_id)} AS outcome,
         AVG(trade_duration_minutes) AS avg_duration
     FROM trades
     WHERE trade_duration_minutes IS NOT NULL AND account_id = ?
-    GROUP BY trade_outcome
+    GROUP BY outcome
     """
-    rows = query_database(query, params=(account_id,))
+    rows = query_database(query, params=(account_id,), account_id=account_id)
     avg_duration = {row[0]: row[1] for row in rows}
     return jsonify(avg_duration)
 
@@ -313,27 +479,73 @@ def strategy_success():
     Endpoint to provide success rate for each strategy, filtered by account_id.
     """
     account_id = request.args.get('account_id',1)
-    query = """
+    query = f"""
     SELECT 
         strategy_used,
-        COUNT(*) AS total_trades,
-        SUM(CASE WHEN trade_outcome = 'Win' THEN 1 ELSE 0 END) AS wins,
-        SUM(CASE WHEN trade_outcome = 'Loss' THEN 1 ELSE 0 END) AS losses
+        {outcome_sql(account_id)} AS outcome,
+        COUNT(*) AS trade_count
     FROM trades
     WHERE account_id = ?
-    GROUP BY strategy_used
-    """
-    rows = query_database(query, params=(account_id,))
-    strategy_stats = {
-        row[0]: {
-            'total_trades': row[1],
-            'wins': row[2],
-            'losses': row[3],
-            'win_rate': round((row[2] / row[1]) * 100, 2) if row[1] > 0 else 0
-        }
-        for row in rows
-    }
+    GROUP BY strategy_used, outcome
+    """
+    rows = query_database(query, params=(account_id,), account_id=account_id)
+    strategy_stats = {}
+    for strategy, outcome, count in rows:
+        stats = strategy_stats.setdefault(strategy, {'total_trades': 0, 'wins': 0, 'losses': 0})
+        stats['total_trades'] += count
+        if outcome == "Win":
+            stats['wins'] += count
+        elif outcome == "Loss":
+            stats['losses'] += count
+    for stats in strategy_stats.values():
+        stats['win_rate'] = round((stats['wins'] / stats['total_trades']) * 100, 2) if stats['total_trades'] > 0 else 0
     return jsonify(strategy_stats)
 
+@app.route('/trades/search', methods=['GET'])
+def search_trades():
+    """
+    Endpoint to search the journal notes, ranked and highlighted, optionally filtered
+    by account_id and by opening date (date_from/date_to as YYYY-MM-DD).
+    """
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({"error": "Query parameter 'q' is required"}), 400
+    date_from = request.args.get('date_from') or None
+    date_to = request.args.get('date_to') or None
+    try:
+        for value in (date_from, date_to):
+            if value:
+                datetime.strptime(value, "%Y-%m-%d")
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD and limit/offset integers"}), 400
+
+    # Full-text search needs the FTS5 index, so it always reads SQLite. With sharded
+    # storage every shard is searched and the best matches of all of them are kept.
+    account_id = request.args.get('account_id') or None
+    connections = store.analytics_connections(account_id)
+    record_freshness()
+    results = []
+    try:
+        for conn in connections:
+            results.extend(search.search_trades(
+                conn, text,
+                account_id=account_id,
+                date_from=date_from, date_to=date_to, limit=limit + offset if len(connections) > 1 else limit,
+                offset=0 if len(connections) > 1 else offset,
+                start_mark=request.args.get('start_mark', '<mark>'),
+                end_mark=request.args.get('end_mark', '</mark>'),
+            ))
+    except sqlite3.OperationalError as e:
+        print(f"Error searching trades: {e}")
+        return jsonify({"error": "Search is unavailable, run the database setup to build the index"}), 503
+    finally:
+        for conn in connections:
+            conn.close()
+    if len(connections) > 1:
+        results = sorted(results, key=lambda result: result["rank"])[offset:offset + limit]
+    return jsonify({"query": text, "results": results})
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    app.run(host='0.0.0.0', port=BACKEND_PORT, debug=False)
@@ -2,34 +2,52 @@ import dash
 from dash import dcc, html, Input, Output
 import dash_bootstrap_components as dbc
 import requests
-import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
+# Plotly serializes figures with orjson, which inspects numpy when it is in sys.modules.
+# Importing numpy lazily from one request thread while another serializes crashed the
+# process, so it is loaded once here before any request is served.
+import numpy  # noqa: F401
+
+from utils.config import BACKEND_TIMEOUT, BACKEND_URL, DASHBOARD_PORT, IMPORTER_URL
+
+# Number of duration bins in the outcome/duration heatmap
+DURATION_BINS = 10
 
 # Initialize Dash app with a dark theme
 external_stylesheets = [dbc.themes.DARKLY]
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets, title="TradeStatsEngine")
 server = app.server
 
+@server.route('/health')
+def health_check():
+    return {"status": "OK"}
+
 # Helper function to fetch data from the backend
 def fetch_data(endpoint, params=None):
     try:
-        response = requests.get(f"http://127.0.0.1:5000{endpoint}", params=params)
+        response = requests.get(f"{BACKEND_URL}{endpoint}", params=params, timeout=BACKEND_TIMEOUT)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data from {endpoint}: {e}")
         return {}
 
-# Fetch the list of accounts for the dropdown
-accounts = fetch_data('/accounts')
-if not accounts:
-    print("No accounts fetched from backend. Please ensure the backend is running and accessible.")
-    accounts = [{"id": 0, "name": "No Accounts Available"}]
-account_options = [{"label": account["name"], "value": account["id"]} for account in accounts]
+def fetch_table(endpoint, params=None):
+    """
+    Fetch a per-trade table in the backend's columnar form: {field: [values, ...]}.
+    """
+    payload = fetch_data(endpoint, dict(params or {}, format="columnar"))
+    if isinstance(payload, dict) and payload.get("format") == "columnar":
+        return payload.get("data", {})
+    if isinstance(payload, list) and payload:
+        # Backend without columnar support: one object per row
+        return {field: [row.get(field) for row in payload] for field in payload[0]}
+    return {}
 
 # Layout
 app.layout = dbc.Container([
+    # Triggers loading the account list once the page is opened
+    dcc.Location(id="url"),
     dbc.Row(
         dbc.Col(
             html.H1("TradeStatsEngine 📈", className="my-4 text-center"),
@@ -42,8 +60,8 @@ app.layout = dbc.Container([
                 html.H4("Select Account", className="mb-2"),
                 dbc.Select(
                     id="account-dropdown",
-                    options=account_options,
-                    value=accounts[0]["id"] if accounts else None,
+                    options=[],
+                    value=None,
                     style={
                         "backgroundColor": "#333",
                         "color": "#fff",
@@ -60,7 +78,7 @@ app.layout = dbc.Container([
                 dbc.Button(
                     "Import File",
                     color="primary",
-                    href="http://127.0.0.1:5050/upload",
+                    href=f"{IMPORTER_URL}/upload",
                     target="_blank"
                 ),
                 style={"textAlign": "right", "marginTop": "20px"}
@@ -149,6 +167,9 @@ app.layout = dbc.Container([
         dbc.Col(dcc.Graph(id="reward-ratios", config={"displayModeBar": True}), width=6),
         dbc.Col(dcc.Graph(id="heatmap", config={"displayModeBar": True}), width=6)
     ], className="mb-4"),
+    dbc.Row([
+        dbc.Col(dcc.Graph(id="session-heatmap", config={"displayModeBar": True}), width=12)
+    ], className="mb-4"),
     dbc.Row([
         dbc.Col(
             html.Div([
@@ -165,8 +186,108 @@ app.layout = dbc.Container([
             width=6
         )
     ]),
+    dbc.Row([
+        dbc.Col(
+            html.Div([
+                html.H4("Search Journal Notes", className="mb-2"),
+                dbc.Input(
+                    id="notes-search",
+                    type="search",
+                    placeholder='e.g. FOMO, "moved stop", liquid*',
+                    debounce=True,
+                    style={"backgroundColor": "#333", "color": "#fff"}
+                ),
+                html.Div(id="notes-search-results", className="mt-3")
+            ]),
+            width=12
+        )
+    ], className="my-4"),
 ], fluid=True)
 
+# Callback to load the account list on page load rather than at import time
+@app.callback(
+    [
+        Output("account-dropdown", "options"),
+        Output("account-dropdown", "value"),
+    ],
+    Input("url", "pathname")
+)
+def load_accounts(pathname):
+    accounts = fetch_data('/accounts')
+    if not accounts:
+        print("No accounts fetched from backend. Please ensure the backend is running and accessible.")
+        accounts = [{"id": 0, "name": "No Accounts Available"}]
+    account_options = [{"label": account["name"], "value": account["id"]} for account in accounts]
+    return account_options, accounts[0]["id"]
+
+# Callback to search the notes of the selected account
+@app.callback(
+    Output("notes-search-results", "children"),
+    [
+        Input("notes-search", "value"),
+        Input("account-dropdown", "value")
+    ]
+)
+def search_notes(text, selected_account):
+    if not text or not text.strip():
+        return []
+    data = fetch_data("/trades/search", params={
+        "q": text, "account_id": selected_account, "limit": 25, "start_mark": "**", "end_mark": "**"
+    }) or {}
+    results = data.get("results", [])
+    if not results:
+        return html.P("No matching notes.", className="text-muted")
+    return [
+        html.Div([
+            html.H6(
+                f"{trade['opened'] or '-'} | {trade['instrument'] or '-'} | {trade['strategy_used'] or '-'} | "
+                f"{trade['trade_outcome']} ({trade['profit_loss'] or '-'}) | {trade['filename']}"
+            ),
+            dcc.Markdown(trade["snippet"] or "", className="text-muted"),
+        ], className="mb-3")
+        for trade in results
+    ]
+
+# Callback to draw the hour x weekday P/L heatmap from the backend's analytics cube
+@app.callback(
+    Output("session-heatmap", "figure"),
+    Input("account-dropdown", "value")
+)
+def update_session_heatmap(selected_account):
+    import plotly.express as px
+
+    cells = fetch_table("/stats/cube", {"account_id": selected_account, "group_by": "weekday,hour"})
+    if not cells.get("weekday"):
+        return go.Figure().update_layout(
+            title="P/L by Weekday and Hour (No Data)",
+            template="plotly_dark"
+        )
+
+    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    pnl = [[0.0] * 24 for _ in days]
+    trades = [[0] * 24 for _ in days]
+    for day, hour, pnl_sum, count in zip(cells["weekday"], cells["hour"], cells["pnl_sum"], cells["trades"]):
+        if day in days and hour is not None:
+            pnl[days.index(day)][hour] = round(pnl_sum, 2)
+            trades[days.index(day)][hour] = count
+
+    fig = px.imshow(
+        pnl,
+        x=[f"{hour:02d}:00" for hour in range(24)],
+        y=days,
+        title="P/L by Weekday and Hour",
+        labels={"x": "Hour Opened", "y": "Weekday", "color": "P/L"},
+        template="plotly_dark",
+        color_continuous_scale="RdYlGn",
+        color_continuous_midpoint=0,
+        aspect="auto"
+    )
+    fig.update_traces(
+        customdata=trades,
+        hovertemplate="%{y} %{x}<br>P/L: %{z}<br>Trades: %{customdata}<extra></extra>"
+    )
+    return fig
+
 # Callback to update graphs and statistics when an account is selected
 @app.callback(
     [
@@ -193,19 +314,22 @@ app.layout = dbc.Container([
     ]
 )
 def update_dashboard(selected_account, time_writing_toggle):
+    import pandas as pd
+    import plotly.express as px
+
     # Fetch data from your backend
     summary = fetch_data(f"/stats/summary?account_id={selected_account}") or {}
-    pnl_data = fetch_data(f"/stats/pnl?account_id={selected_account}") or []
+    pnl_data = fetch_table("/stats/pnl", {"account_id": selected_account})
     monthly_performance = fetch_data(f"/stats/monthly?account_id={selected_account}&time_writing_toggle={str(time_writing_toggle).lower()}") or {}
     daily_performance = fetch_data(f"/stats/daily?account_id={selected_account}") or {}
     killzone_performance = fetch_data(f"/stats/killzone?account_id={selected_account}") or {}
     killzone_outcomes = fetch_data(f"/stats/killzone_outcomes?account_id={selected_account}") or {}
-    reward_ratios_data = fetch_data(f"/stats/reward_ratios?account_id={selected_account}") or []
-    duration_data = fetch_data(f"/stats/duration_heatmap?account_id={selected_account}") or []
+    reward_ratio_summary = fetch_data(f"/stats/reward_ratio_summary?account_id={selected_account}") or {}
+    duration_histogram = fetch_data(f"/stats/duration_histogram?account_id={selected_account}&bins={DURATION_BINS}") or {}
     best_worst_trade = fetch_data(f"/stats/best_worst_trade?account_id={selected_account}") or {}
 
     # Total PNL and Win Rate
-    total_pnl = sum([float(entry.get('profit_loss', 0)) for entry in pnl_data]) if pnl_data else 0
+    total_pnl = sum(pnl_data.get('profit_loss', []))
     total_trades = summary.get("total_trades", 0)
     win_rate = (summary.get("total_wins", 0) / total_trades) * 100 if total_trades else 0
 
@@ -219,33 +343,32 @@ def update_dashboard(selected_account, time_writing_toggle):
     outcome_order = ['Win', 'Break-even', 'Loss']
 
     # Equity Curve
-    if pnl_data:
-        pnl_df = pd.DataFrame(pnl_data)
-        pnl_df['trade_outcome'] = pnl_df['profit_loss'].apply(
-            lambda pnl: 'Win' if pnl > 0.5 else ('Break-even' if abs(pnl) < 0.5 else 'Loss')
-        )
-        pnl_df['color'] = pnl_df['trade_outcome'].map(color_mapping)
-        pnl_df['trade_outcome'] = pd.Categorical(
-            pnl_df['trade_outcome'],
-            categories=outcome_order,
-            ordered=True
-        )
+    if pnl_data.get('date'):
+        dates = pnl_data['date']
+        cumulative = pnl_data['cumulative_pnl']
         equity_curve_fig = go.Figure()
         equity_curve_fig.add_trace(go.Scatter(
-            x=pnl_df['date'],
-            y=pnl_df['cumulative_pnl'],
+            x=dates,
+            y=cumulative,
             mode='lines',
             name='Equity Curve',
             line=dict(color='blue')
         ))
+        # Outcome markers for single trades, classified by the backend with the account's
+        # break-even threshold; large accounts come merged into longer steps without one
+        outcomes = {outcome: ([], []) for outcome in outcome_order}
+        for date, cumulative_pnl, outcome in zip(dates, cumulative, pnl_data.get('outcome') or []):
+            if outcome in outcomes:
+                outcomes[outcome][0].append(date)
+                outcomes[outcome][1].append(cumulative_pnl)
         for outcome in outcome_order:
-            filtered_df = pnl_df[pnl_df['trade_outcome'] == outcome]
-            if not filtered_df.empty:
+            x, y = outcomes[outcome]
+            if x:
                 equity_curve_fig.add_trace(go.Scatter(
-                    x=filtered_df['date'],
-                    y=filtered_df['cumulative_pnl'],
+                    x=x,
+                    y=y,
                     mode='markers',
-                    marker=dict(color=filtered_df['color'].iloc[0], size=10),
+                    marker=dict(color=color_mapping[outcome], size=10),
                     name=outcome
                 ))
         equity_curve_fig.update_layout(
@@ -391,18 +514,17 @@ def update_dashboard(selected_account, time_writing_toggle):
             template="plotly_dark"
         )
 
-    # Heatmap of Duration
-    duration_df = pd.DataFrame(duration_data)
-    if not duration_df.empty:
-        bin_edges = pd.cut(duration_df['duration'], bins=10, retbins=True)[1]
-        def format_range(start, end):
-            return f"{int(start)}-{int(end)}"
-        bin_labels = [format_range(bin_edges[i], bin_edges[i + 1]) for i in range(len(bin_edges) - 1)]
-        duration_df['Duration Range'] = pd.cut(duration_df['duration'], bins=bin_edges, labels=bin_labels)
-        heatmap_data = duration_df.groupby(['Duration Range', 'outcome']).size().reset_index(name='Count')
-        heatmap_pivot = heatmap_data.pivot(index='outcome', columns='Duration Range', values='Count').fillna(0)
+    # Heatmap of Duration (binned by the backend)
+    duration_outcomes = duration_histogram.get("outcomes", {})
+    if duration_outcomes:
+        edges = duration_histogram["edges"]
+        bin_labels = [f"{int(edges[i])}-{int(edges[i + 1])}" for i in range(len(edges) - 1)]
+        heatmap_outcomes = [outcome for outcome in outcome_order if outcome in duration_outcomes]
+        heatmap_outcomes += [outcome for outcome in duration_outcomes if outcome not in heatmap_outcomes]
         heatmap_fig = px.imshow(
-            heatmap_pivot,
+            [duration_outcomes[outcome] for outcome in heatmap_outcomes],
+            x=bin_labels,
+            y=heatmap_outcomes,
             title="Heatmap of Trade Outcomes vs. Duration",
             labels={"x": "Duration Range (in minutes)", "y": "Trade Outcome", "color": "Frequency"},
             template="plotly_dark",
@@ -419,30 +541,41 @@ def update_dashboard(selected_account, time_writing_toggle):
             template="plotly_dark"
         )
 
-    # Reward Ratios
-    reward_ratios_df = pd.DataFrame(reward_ratios_data)
-    if not reward_ratios_df.empty:
-        reward_ratios_df['outcome'] = pd.Categorical(
-            reward_ratios_df['outcome'],
-            categories=outcome_order,
-            ordered=True
-        )
-        reward_ratios_fig = px.box(
-            reward_ratios_df,
-            x="outcome",
-            y="reward_ratio",
-            color="outcome",
+    # Reward Ratios (box statistics computed by the backend)
+    if reward_ratio_summary:
+        reward_ratios_fig = go.Figure()
+        box_outcomes = [outcome for outcome in outcome_order if outcome in reward_ratio_summary]
+        box_outcomes += [outcome for outcome in reward_ratio_summary if outcome not in box_outcomes]
+        for outcome in box_outcomes:
+            stats = reward_ratio_summary[outcome]
+            color = color_mapping.get(outcome, "grey")
+            reward_ratios_fig.add_trace(go.Box(
+                name=outcome,
+                x=[outcome],
+                q1=[stats["q1"]],
+                median=[stats["median"]],
+                q3=[stats["q3"]],
+                mean=[stats["mean"]],
+                lowerfence=[stats["lower_fence"]],
+                upperfence=[stats["upper_fence"]],
+                marker_color=color,
+                hovertext=f"{stats['count']} trades",
+            ))
+            if stats["outliers"]:
+                reward_ratios_fig.add_trace(go.Scatter(
+                    x=[outcome] * len(stats["outliers"]),
+                    y=[point["value"] for point in stats["outliers"]],
+                    text=[f"{point['count']} trade(s)" for point in stats["outliers"]],
+                    mode="markers",
+                    marker=dict(color=color, size=6),
+                    showlegend=False,
+                ))
+        reward_ratios_fig.update_layout(
             title="Reward Ratios by Trade Outcome",
             template="plotly_dark",
-            labels={"outcome": "Trade Outcome", "reward_ratio": "Reward Ratio"},
-            color_discrete_map=color_mapping,
-            points="all"
-        )
-        reward_ratios_fig.update_layout(
             xaxis_title="Trade Outcome",
             yaxis_title="Reward Ratio",
             showlegend=False,
-            boxmode="group",
             font=dict(size=12)
         )
     else:
@@ -481,5 +614,5 @@ def update_dashboard(selected_account, time_writing_toggle):
     )
 
 if __name__ == '__main__':
-    app.run_server(host='0.0.0.0', port=8050, debug=False)
+    app.run_server(host='0.0.0.0', port=DASHBOARD_PORT, debug=False)
 
@@ -1,9 +1,9 @@
 import subprocess
 import sys
 import os
-from utils import database_utils
+from utils import database_utils, maintenance
 
-from app import DB_NAME, DATA_DIR
+from utils.config import DB_NAME, DATA_DIR
 
 def initialize_database_if_needed():
     """
@@ -18,11 +18,38 @@ def initialize_database_if_needed():
         except Exception as e:
             print(f"Error initializing database: {e}")
             sys.exit(1)  # Exit if database setup fails
+    else:
+        # Apply schema additions to databases created by older versions
+        database_utils.DatabaseManager.setup_database()
+
+def start_maintenance():
+    """
+    Run scheduled maintenance (snapshots, compaction, statistics, integrity checks)
+    in the background, as configured by TRADESTAT_MAINTENANCE.
+    """
+    schedule = maintenance.schedule_from_env()
+    if schedule:
+        scheduler = maintenance.Scheduler(schedule, DB_NAME)
+        scheduler.start()
+        return scheduler
+    return None
+
+def run_production():
+    """
+    Serve every service behind waitress worker processes, restarting them on crash
+    or when their health endpoint stops answering.
+    """
+    from utils import serving
+
+    initialize_database_if_needed()
+    start_maintenance()
+    serving.supervise(["backend", "dashboard", "importer"], os.path.dirname(os.path.abspath(__file__)))
 
 def run_app():
     try:
         # Initialize the database if empty or doesn't exist
         initialize_database_if_needed()
+        start_maintenance()
 
         # Start the application
         flask_process = subprocess.Popen([sys.executable, "app.py"])
@@ -38,4 +65,7 @@ def run_app():
         upload_process.terminate()
 
 if __name__ == "__main__":
-    run_app()
+    if "--production" in sys.argv or os.environ.get("TRADESTAT_MODE") == "production":
+        run_production()
+    else:
+        run_app()
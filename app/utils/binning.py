@@ -0,0 +1,78 @@
+"""
+Histogram and box-plot summaries computed from pre-aggregated (value, count) pairs.
+
+The SQL side groups trades by value (durations are whole minutes, reward ratios have one
+decimal), so only distinct values reach Python and the responses hold O(bins) numbers
+instead of one entry per trade. numpy is imported lazily to keep backend startup cheap.
+"""
+
+
+def histogram(values, counts, bins, value_range=None):
+    """
+    Count weighted values into `bins` equal-width bins over value_range (default: the
+    data range). Returns (edges, counts) as lists.
+    """
+    import numpy as np
+
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(counts, dtype=float)
+    if value_range is None:
+        value_range = (float(values.min()), float(values.max())) if len(values) else (0.0, 1.0)
+    if value_range[0] == value_range[1]:
+        value_range = (value_range[0] - 0.5, value_range[1] + 0.5)
+    hist, edges = np.histogram(values, bins=bins, range=value_range, weights=weights)
+    return edges.tolist(), [int(c) for c in hist]
+
+
+def _quantile(np, sorted_values, cumulative, total, q):
+    # Linear interpolation between order statistics, as numpy.percentile and plotly do.
+    # The value of 0-based rank r is the first one whose cumulative count exceeds r.
+    position = q * (total - 1)
+    lower = int(position)
+    fraction = position - lower
+    low = float(sorted_values[np.searchsorted(cumulative, lower, side="right")])
+    if fraction == 0:
+        return low
+    high = float(sorted_values[np.searchsorted(cumulative, lower + 1, side="right")])
+    return low + (high - low) * fraction
+
+
+def box_summary(values, counts, max_outliers=50):
+    """
+    Box-plot statistics of weighted values: quartiles, mean, Tukey fences (1.5 IQR,
+    clipped to the data like plotly's whiskers) and up to max_outliers distinct outliers.
+    """
+    import numpy as np
+
+    values = np.asarray(values, dtype=float)
+    counts = np.asarray(counts, dtype=np.int64)
+    order = np.argsort(values)
+    values, counts = values[order], counts[order]
+    cumulative = np.cumsum(counts)
+    total = int(cumulative[-1]) if len(cumulative) else 0
+    if total == 0:
+        return {"count": 0}
+
+    q1, median, q3 = (_quantile(np, values, cumulative, total, q) for q in (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    inside = (values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)
+    outliers = values[~inside]
+    outlier_counts = counts[~inside]
+    if len(outliers) > max_outliers:
+        # Keep the most extreme ones on both sides
+        distance = np.abs(outliers - median)
+        keep = np.sort(np.argsort(distance)[len(distance) - max_outliers:])
+        outliers, outlier_counts = outliers[keep], outlier_counts[keep]
+
+    return {
+        "count": total,
+        "min": float(values[0]),
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        "max": float(values[-1]),
+        "mean": float((values * counts).sum() / total),
+        "lower_fence": float(values[inside][0]),
+        "upper_fence": float(values[inside][-1]),
+        "outliers": [{"value": float(v), "count": int(c)} for v, c in zip(outliers, outlier_counts)],
+    }
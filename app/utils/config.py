@@ -0,0 +1,23 @@
+"""
+Shared paths and service addresses.
+
+Importing this module is cheap on purpose: scripts that only need to know where the
+database lives (launcher, utilities, benchmarks) must not import Flask or Dash apps.
+"""
+import os
+
+# Define paths
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DATA_DIR = os.environ.get("TRADESTAT_DATA_DIR", os.path.join(BASE_DIR, "data"))
+DB_NAME = os.path.join(DATA_DIR, "trades.db")
+UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
+
+# Service ports and the addresses the services use to reach each other
+BACKEND_PORT = int(os.environ.get("TRADESTAT_BACKEND_PORT", "5000"))
+IMPORTER_PORT = int(os.environ.get("TRADESTAT_IMPORTER_PORT", "5050"))
+DASHBOARD_PORT = int(os.environ.get("TRADESTAT_DASHBOARD_PORT", "8050"))
+BACKEND_URL = os.environ.get("TRADESTAT_BACKEND_URL", f"http://127.0.0.1:{BACKEND_PORT}")
+IMPORTER_URL = os.environ.get("TRADESTAT_IMPORTER_URL", f"http://127.0.0.1:{IMPORTER_PORT}")
+
+# Seconds to wait for the backend before giving up on a request
+BACKEND_TIMEOUT = float(os.environ.get("TRADESTAT_BACKEND_TIMEOUT", "30"))
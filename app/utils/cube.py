@@ -0,0 +1,237 @@
+"""
+Precomputed analytics cube over account × weekday × hour of day × killzone × outcome ×
+strategy.
+
+trade_cube holds one row per combination that has trades, with the trade count, the
+P/L sum, the win count and the duration sum (plus how many trades had a P/L and a
+duration, for averages). Triggers on trades keep it current on insert, update and
+delete, so slice() answers any group-by over these dimensions from a few hundred rows
+instead of scanning the account's trades.
+
+Unknown values are stored as '' (and hour -1) so they take part in the primary key,
+and are returned as null. Outcomes follow the break-even threshold of the account
+(utils/outcomes.py), which rebuilds the account's cells when it changes.
+"""
+from utils import outcomes
+
+CUBE_TABLE = "trade_cube"
+
+# Slice dimension -> cube column, and the expression computing it from a trades row
+DIMENSIONS = {
+    "account": ("account_id", "{row}.account_id"),
+    "weekday": ("weekday", "COALESCE({row}.open_day, '')"),
+    "hour": (
+        "hour",
+        "CASE WHEN {row}.opened GLOB '??/??/???? [0-2][0-9]:*' "
+        "THEN CAST(substr({row}.opened, 12, 2) AS INTEGER) ELSE -1 END",
+    ),
+    "killzone": ("killzone", "COALESCE({row}.killzone, '')"),
+    "outcome": ("outcome", outcomes.expression("{row}")),
+    "strategy": ("strategy", "COALESCE({row}.strategy_used, '')"),
+}
+
+# profit_loss is TEXT: '#' marks an unknown result, anything non-numeric is ignored
+_PNL_NUMERIC = "({row}.profit_loss GLOB '*[0-9]*' AND {row}.profit_loss NOT GLOB '*[^0-9.+-]*')"
+
+MEASURES = {
+    "trades": "1",
+    "wins": f"CASE WHEN {outcomes.expression('{row}')} = 'Win' THEN 1 ELSE 0 END",
+    "pnl_trades": f"CASE WHEN {_PNL_NUMERIC} THEN 1 ELSE 0 END",
+    "pnl_sum": f"CASE WHEN {_PNL_NUMERIC} THEN CAST({{row}}.profit_loss AS REAL) ELSE 0.0 END",
+    "duration_trades": "CASE WHEN {row}.trade_duration_minutes IS NOT NULL THEN 1 ELSE 0 END",
+    "duration_sum": "COALESCE({row}.trade_duration_minutes, 0.0)",
+}
+
+# trades columns the cube depends on: updating any other column leaves it untouched
+SOURCE_COLUMNS = [
+    "account_id", "opened", "open_day", "killzone", "strategy_used", "profit_loss",
+    "profit_loss_original", "trade_duration_minutes",
+]
+
+_KEY_COLUMNS = [column for column, _ in DIMENSIONS.values()]
+
+CUBE_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS {CUBE_TABLE} (
+        account_id TEXT NOT NULL,
+        weekday TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        killzone TEXT NOT NULL,
+        outcome TEXT NOT NULL,
+        strategy TEXT NOT NULL,
+        trades INTEGER NOT NULL,
+        wins INTEGER NOT NULL,
+        pnl_trades INTEGER NOT NULL,
+        pnl_sum REAL NOT NULL,
+        duration_trades INTEGER NOT NULL,
+        duration_sum REAL NOT NULL,
+        PRIMARY KEY ({", ".join(_KEY_COLUMNS)})
+    ) WITHOUT ROWID
+"""
+
+
+def _add(row):
+    keys = [expression.format(row=row) for _, expression in DIMENSIONS.values()]
+    values = [expression.format(row=row) for expression in MEASURES.values()]
+    updates = ", ".join(f"{m} = {m} + excluded.{m}" for m in MEASURES)
+    return (
+        f"INSERT INTO {CUBE_TABLE} ({', '.join(_KEY_COLUMNS + list(MEASURES))}) "
+        f"VALUES ({', '.join(keys + values)}) "
+        f"ON CONFLICT ({', '.join(_KEY_COLUMNS)}) DO UPDATE SET {updates};"
+    )
+
+
+def _remove(row):
+    match = " AND ".join(
+        f"{column} = {expression.format(row=row)}" for column, expression in DIMENSIONS.values()
+    )
+    updates = ", ".join(f"{m} = {m} - ({e.format(row=row)})" for m, e in MEASURES.items())
+    return (
+        f"UPDATE {CUBE_TABLE} SET {updates} WHERE {match};\n"
+        f"        DELETE FROM {CUBE_TABLE} WHERE {match} AND trades <= 0;"
+    )
+
+
+CUBE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trade_cube_insert AFTER INSERT ON trades BEGIN
+        {_add("new")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trade_cube_delete AFTER DELETE ON trades BEGIN
+        {_remove("old")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trade_cube_update AFTER UPDATE OF {", ".join(SOURCE_COLUMNS)} ON trades BEGIN
+        {_remove("old")}
+        {_add("new")}
+    END
+    """,
+]
+
+
+def ensure_schema(cursor):
+    """
+    Create the cube and its triggers, filling it from the existing trades the first time.
+    Triggers created by an older definition of the cube are replaced and the cube rebuilt.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (CUBE_TABLE,))
+    created = cursor.fetchone() is None
+    cursor.execute(CUBE_SCHEMA)
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'trades'")
+    existing = dict(cursor.fetchall())
+    for trigger in CUBE_TRIGGERS:
+        # SQLite keeps the statement without IF NOT EXISTS and the surrounding whitespace
+        statement = trigger.strip().replace("IF NOT EXISTS ", "", 1)
+        name = statement.split()[2]
+        if name in existing and existing[name] != statement:
+            cursor.execute(f"DROP TRIGGER {name}")
+            created = True
+        cursor.execute(trigger)
+    if created:
+        rebuild(cursor)
+
+
+def rebuild(cursor, account_id=None, table=CUBE_TABLE):
+    """
+    Recompute the cube from the trades table (e.g. after editing the database by hand),
+    or only the cells of one account.
+    """
+    keys = [expression.format(row="t") for _, expression in DIMENSIONS.values()]
+    sums = [f"SUM({expression.format(row='t')})" for expression in MEASURES.values()]
+    query = (
+        f"INSERT INTO {table} ({', '.join(_KEY_COLUMNS + list(MEASURES))}) "
+        f"SELECT {', '.join(keys + sums)} FROM trades t"
+    )
+    if account_id is None:
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"{query} GROUP BY {', '.join(keys)}")
+    else:
+        cursor.execute(f"DELETE FROM {table} WHERE account_id = ?", (str(account_id),))
+        cursor.execute(f"{query} WHERE t.account_id = ? GROUP BY {', '.join(keys)}", (str(account_id),))
+
+
+def verify(cursor, tolerance=1e-6):
+    """
+    Compare trade_cube with a rebuild from the trades table into a scratch copy.
+    Returns the list of mismatching cells, empty when the cube is consistent.
+    """
+    scratch = f"{CUBE_TABLE}_verify"
+    columns = ", ".join(_KEY_COLUMNS + list(MEASURES))
+    cursor.execute(f"DROP TABLE IF EXISTS temp.{scratch}")
+    cursor.execute(f"CREATE TEMP TABLE {scratch} AS SELECT {columns} FROM {CUBE_TABLE} WHERE 0")
+    try:
+        rebuild(cursor, table=f"temp.{scratch}")
+        cells = []
+        for table in (CUBE_TABLE, f"temp.{scratch}"):
+            cursor.execute(f"SELECT {columns} FROM {table}")
+            cells.append({row[:len(_KEY_COLUMNS)]: row[len(_KEY_COLUMNS):] for row in cursor.fetchall()})
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS temp.{scratch}")
+
+    stored, expected = cells
+    problems = []
+    for key in sorted(set(stored) | set(expected), key=repr):
+        have, want = stored.get(key), expected.get(key)
+        # P/L and duration sums are added up in a different order, so compare them loosely
+        if have is None or want is None or any(abs(a - b) > tolerance for a, b in zip(have, want)):
+            problems.append(f"cell {key}: {have} != {want}")
+    return problems
+
+
+def slice_query(group_by, filters=None):
+    """
+    Build the SQL answering a slice of the cube: the measures summed per combination of
+    the `group_by` dimensions, over the cells matching `filters` ({dimension: value}).
+    Returns (sql, params, fields). Raises ValueError for unknown dimensions.
+    """
+    filters = filters or {}
+    unknown = [d for d in list(group_by) + list(filters) if d not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown dimension(s): {', '.join(unknown)}. Use: {', '.join(DIMENSIONS)}")
+
+    selected = []
+    for dimension in group_by:
+        column = DIMENSIONS[dimension][0]
+        missing = -1 if dimension == "hour" else "''"
+        selected.append(f"NULLIF({column}, {missing}) AS {dimension}")
+    selected += [f"SUM({m}) AS {m}" for m in MEASURES]
+
+    where, params = [], []
+    for dimension, value in filters.items():
+        column = DIMENSIONS[dimension][0]
+        if value is None:
+            value = -1 if dimension == "hour" else ""
+        where.append(f"{column} = ?")
+        params.append(int(value) if dimension == "hour" else str(value))
+
+    sql = f"SELECT {', '.join(selected)} FROM {CUBE_TABLE}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if group_by:
+        columns = [DIMENSIONS[d][0] for d in group_by]
+        sql += f" GROUP BY {', '.join(columns)} ORDER BY {', '.join(columns)}"
+    return sql, params, list(group_by) + list(MEASURES)
+
+
+def merge_slices(results, group_by):
+    """
+    Combine the rows of one slice_query run on several databases (the shards): measures
+    of rows with the same dimension values are added up, in the order slice_query sorts.
+    """
+    width = len(group_by)
+    merged = {}
+    for rows in results:
+        for row in rows:
+            key, measures = tuple(row[:width]), row[width:]
+            total = merged.get(key)
+            merged[key] = measures if total is None else [
+                b if a is None else a if b is None else a + b for a, b in zip(total, measures)
+            ]
+    if not width and not merged:
+        # Like SUM over no rows: a single row of nulls
+        merged[()] = [None] * len(MEASURES)
+    # Unknown values (null) are stored as '' or -1, which sort first
+    order = sorted(merged, key=lambda key: [(value is not None, value) for value in key])
+    return [key + tuple(merged[key]) for key in order]
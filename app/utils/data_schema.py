@@ -2,9 +2,10 @@ class TradeEntry:
     def __init__(self, filename, position_size=None, opened=None, closed=None,
                  opened_raw=None, closed_raw=None, pips_gained_lost=None,
                  profit_loss=None, risk_reward=None, strategy_used=None,
-                 open_day=None, open_time=None, trade_outcome=None,
+                 open_day=None, open_time=None,
                  trade_duration_minutes=None, killzone=None, open_month=None,
-                 time_writing=None):
+                 time_writing=None, instrument=None, notes=None, currency=None,
+                 parser_version=None):
         self.filename = filename
         self.position_size = position_size
         self.opened = opened
@@ -17,11 +18,14 @@ class TradeEntry:
         self.strategy_used = strategy_used
         self.open_day = open_day
         self.open_time = open_time
-        self.trade_outcome = trade_outcome
         self.trade_duration_minutes = trade_duration_minutes
         self.killzone = killzone
         self.open_month = open_month
         self.time_writing = time_writing
+        self.instrument = instrument
+        self.notes = notes
+        self.currency = currency
+        self.parser_version = parser_version
 
     def to_dict(self):
         """
@@ -38,9 +42,12 @@ class TradeEntry:
             'strategy_used': self.strategy_used,
             'open_day': self.open_day,
             'open_time': self.open_time,
-            'trade_outcome': self.trade_outcome,
             'open_month': self.open_month,
             'trade_duration_minutes': self.trade_duration_minutes,
             'killzone': self.killzone,
-            'time_writing': self.time_writing
+            'time_writing': self.time_writing,
+            'instrument': self.instrument,
+            'notes': self.notes,
+            'currency': self.currency,
+            'parser_version': self.parser_version
         }
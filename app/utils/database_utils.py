@@ -1,12 +1,36 @@
+import hashlib
+import heapq
+import itertools
 import sqlite3
 import os
+import sys
 
 from colorama import Fore, Style
 
-# Define directories and database file
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-DB_NAME = os.path.join(DATA_DIR, "trades.db")
+# Allow running this file directly as a script (python utils/database_utils.py)
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import cube, fx, killzones, leaderboard, maintenance, outcomes, search, storage
+from utils.config import DATA_DIR, DB_NAME, UPLOAD_DIR
+
+# Columns written when inserting a trade, in INSERT order
+TRADE_COLUMNS = [
+    "account_id", "filename", "position_size", "opened", "closed",
+    "pips_gained_lost", "profit_loss", "risk_reward", "strategy_used",
+    "open_day", "open_time", "open_month",
+    "trade_duration_minutes", "killzone", "time_writing", "instrument",
+    "content_hash", "notes", "currency", "profit_loss_original", "fx_rate", "parser_version",
+]
+
+# Columns shown by the trade listings, after id and account_id
+VIEW_COLUMNS = [
+    "filename", "position_size", "opened", "closed", "pips_gained_lost",
+    "profit_loss", "risk_reward", "strategy_used", "open_day", "open_time",
+    "trade_outcome", "open_month", "trade_duration_minutes", "killzone",
+    "time_writing", "instrument",
+]
+
 
 
 def is_running_in_docker():
@@ -49,7 +73,10 @@ def run():
             print("4. Reset database [DANGEROUS]")
             print("5. Delete trade")
             print("6. Delete account")
-            print("7. Exit")
+            print("7. Reclassify killzones")
+            print("8. Index archived journal files")
+            print("9. Maintenance (backup, compact, analyze, integrity check)")
+            print("10. Exit")
 
             choice = input("\nEnter your choice: ")
             if choice == "1":
@@ -64,18 +91,26 @@ def run():
                     print("Invalid account type.")
 
             elif choice == "3":
-                DatabaseManager.view_all()
+                DatabaseManager.view_menu()
 
             elif choice == "4":
                 DatabaseManager.reset_database()
 
             elif choice == "5":
-                DatabaseManager.view_all()
+                DatabaseManager.view_summary()
                 account_id = input("Enter the account ID to delete the trade from: ")
-                entry_id = input("Enter the trade ID to delete: ")
-                confirm = input("Are you completely sure to delete this trade? (yes/no): ")
+                if input("List this account's trades first? (yes/no): ").lower() == "yes":
+                    DatabaseManager.view_trades(account_id)
+                entry_ids = [i for i in input("Enter the trade ID(s) to delete, comma separated: ").split(",") if i.strip()]
+                confirm = input("Are you completely sure to delete these trades? (yes/no): ")
                 if confirm.lower() == "yes":
-                    DatabaseManager.delete_entry_by_id(account_id, entry_id)
+                    if len(entry_ids) == 1:
+                        DatabaseManager.delete_entry_by_id(account_id, entry_ids[0])
+                    elif entry_ids:
+                        result = DatabaseManager.delete_entries(account_id, entry_ids)
+                        print(f"{result['deleted']} trade(s) deleted.")
+                        if result["missing"]:
+                            print(f"Not found for account '{account_id}': {', '.join(result['missing'])}")
 
 
             elif choice == "6":
@@ -89,6 +124,16 @@ def run():
                     DatabaseManager.delete_account(account_id)
 
             elif choice == "7":
+                account_id = input("Enter the account ID to reclassify (leave empty for all accounts): ").strip()
+                DatabaseManager.reclassify_killzones(account_id or None)
+
+            elif choice == "8":
+                DatabaseManager.index_archived_files()
+
+            elif choice == "9":
+                DatabaseManager.maintenance_menu()
+
+            elif choice == "10":
                 print("If you like this script you may consider offering me a coffee :D")
                 print("Send BEP20, ERC20, BTC, BCH, CRO, LTC, DASH, CELO, ZEC, XRP to:")
                 print(Fore.GREEN, "landifrancesco.wallet", Style.RESET_ALL)
@@ -102,6 +147,13 @@ class DatabaseManager:
     Utility class for interacting with the database.
     """
 
+    @staticmethod
+    def storage():
+        """
+        Storage backend for the configured database (writes always go to the SQLite primary).
+        """
+        return storage.get_storage(DB_NAME)
+
     @staticmethod
     def setup_database():
         """
@@ -109,58 +161,134 @@ class DatabaseManager:
         """
         try:
             os.makedirs(DATA_DIR, exist_ok=True)
-            conn = sqlite3.connect(DB_NAME, timeout=5)
+            conn = DatabaseManager.storage().connect(timeout=5)
             cursor = conn.cursor()
 
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS trades (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    account_id TEXT NOT NULL,
-                    filename TEXT UNIQUE,
-                    position_size TEXT,
-                    opened TEXT,
-                    closed TEXT,
-                    pips_gained_lost TEXT,
-                    profit_loss TEXT,
-                    risk_reward TEXT,
-                    strategy_used TEXT,
-                    open_day TEXT,
-                    open_time TEXT,
-                    trade_outcome TEXT,
-                    open_month TEXT,
-                    trade_duration_minutes REAL,
-                    killzone TEXT,
-                    time_writing TEXT
-                );
-            """)
+            # auto_vacuum only applies to a new, empty file: freed pages can then be
+            # returned in small steps. WAL lets the stats API read during writes and maintenance.
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            cursor.execute("PRAGMA journal_mode = WAL")
+
+            DatabaseManager.create_trades_schema(cursor)
 
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS accounts (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     name TEXT NOT NULL,
-                    type TEXT CHECK(type IN ('Real', 'Paper')) NOT NULL
+                    type TEXT CHECK(type IN ('Real', 'Paper')) NOT NULL,
+                    base_currency TEXT
                 );
             """)
+            DatabaseManager.add_missing_columns(cursor, "accounts", {"base_currency": "TEXT"})
+
+            # FX rates converting journal P/L into each account's base currency
+            fx.ensure_schema(cursor)
 
             conn.commit()
             conn.close()
+
+            store = DatabaseManager.storage()
+            if store.sharded:
+                store.prepare_shards()
             print(f"Database '{DB_NAME}' is ready.")
         except Exception as e:
             print(f"Error setting up database: {e}")
 
+    @staticmethod
+    def create_trades_schema(cursor):
+        """
+        Create or upgrade the trades table with its indexes, search index, cube and leaderboards.
+        Used for the main database and for every account shard (see utils/storage.py).
+        trade_outcome is kept for older databases but no longer written: outcomes are
+        computed from profit_loss and the account's threshold (see utils/outcomes.py).
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS trades (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_id TEXT NOT NULL,
+                filename TEXT UNIQUE,
+                position_size TEXT,
+                opened TEXT,
+                closed TEXT,
+                pips_gained_lost TEXT,
+                profit_loss TEXT,
+                risk_reward TEXT,
+                strategy_used TEXT,
+                open_day TEXT,
+                open_time TEXT,
+                trade_outcome TEXT,
+                open_month TEXT,
+                trade_duration_minutes REAL,
+                killzone TEXT,
+                time_writing TEXT,
+                instrument TEXT,
+                content_hash TEXT,
+                notes TEXT,
+                currency TEXT,
+                profit_loss_original TEXT,
+                fx_rate REAL,
+                parser_version INTEGER
+            );
+        """)
+
+        DatabaseManager.add_missing_columns(cursor, "trades", {
+            "instrument": "TEXT",
+            "content_hash": "TEXT",
+            "notes": "TEXT",
+            "currency": "TEXT",
+            "profit_loss_original": "TEXT",
+            "fx_rate": "REAL",
+            "parser_version": "INTEGER",
+        })
+
+        # Content hash index used to short-circuit re-imports of identical notes
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_trades_content_hash ON trades(content_hash)"
+        )
+
+        # Full-text index over the note text of each trade. SQLite builds without FTS5
+        # only lose search (the endpoint answers 503), not the rest of the schema.
+        try:
+            search.ensure_schema(cursor)
+        except sqlite3.OperationalError as e:
+            print(f"Error creating the search index, note search is disabled: {e}")
+
+        # Break-even threshold of each account, read by the outcome of every trade
+        outcomes.ensure_schema(cursor)
+
+        # Aggregates by weekday, hour, killzone, outcome and strategy, kept by triggers
+        cube.ensure_schema(cursor)
+
+        # Trades in P/L, pips and R/R order per account, kept by triggers
+        leaderboard.ensure_schema(cursor)
+
+    @staticmethod
+    def add_missing_columns(cursor, table, columns):
+        """
+        Add columns introduced after a database was created, leaving existing ones untouched.
+        """
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, definition in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
     @staticmethod
     def reset_database():
         """
         Reset the database by clearing all rows in the trades and accounts tables.
         """
         try:
-            conn = sqlite3.connect(DB_NAME)
+            store = DatabaseManager.storage()
+            conn = store.connect()
             cursor = conn.cursor()
 
             confirm = input(
                 "Are you sure you want to delete all accounts & trades from the database? (yes/no): "
             ).lower()
             if confirm == "yes":
+                if store.sharded:
+                    store.drop_shards()
                 cursor.execute("DELETE FROM trades")
                 cursor.execute("DELETE FROM accounts")
                 conn.commit()
@@ -175,20 +303,30 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @staticmethod
+    def create_accounts(accounts):
+        """
+        Create many accounts from (name, type) pairs in a single transaction.
+        Returns {"created": n} or {"created": 0, "error": message} if nothing was written.
+        """
+        try:
+            created = DatabaseManager.storage().execute_many(
+                "INSERT INTO accounts (name, type) VALUES (?, ?)", list(accounts)
+            )
+            return {"created": created}
+        except Exception as e:
+            return {"created": 0, "error": str(e)}
+
     @staticmethod
     def create_account(name, account_type):
         """
         Create a new account with a name and type (Real or Paper).
         """
-        try:
-            conn = sqlite3.connect(DB_NAME)
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO accounts (name, type) VALUES (?, ?)", (name, account_type))
-            conn.commit()
-            conn.close()
+        result = DatabaseManager.create_accounts([(name, account_type)])
+        if result["created"]:
             print(f"Account '{name}' ({account_type}) created successfully.")
-        except Exception as e:
-            print(f"Error creating account: {e}")
+        else:
+            print(f"Error creating account: {result['error']}")
 
     @staticmethod
     def get_next_account_id():
@@ -196,11 +334,7 @@ class DatabaseManager:
         Get the next account ID (incremental).
         """
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cursor = conn.cursor()
-            cursor.execute("SELECT MAX(id) FROM accounts")
-            result = cursor.fetchone()[0]
-            conn.close()
+            result = DatabaseManager.storage().query("SELECT MAX(id) FROM accounts")[0][0]
             return 1 if result is None else result + 1
         except Exception as e:
             print(f"Error fetching next account ID: {e}")
@@ -229,53 +363,148 @@ class DatabaseManager:
     @staticmethod
     def view_all():
         """
-        Display all accounts along with detailed trades linked to each account.
+        Display the per-account summary, then page through the trades of every account.
+        """
+        DatabaseManager.view_summary()
+        DatabaseManager.view_trades(compact=False)
+
+    @staticmethod
+    def view_summary():
+        """
+        Display one line per account with its trade count, wins/losses and total P/L.
+        Computed with one aggregate query per trades database instead of one per account.
         """
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cursor = conn.cursor()
+            store = DatabaseManager.storage()
+            outcome = outcomes.expression("t", f"COALESCE(b.threshold, {outcomes.DEFAULT_THRESHOLD!r})")
+            # Every account's trades live in one database, so its row comes back once
+            totals = {}
+            for account_id, *total in store.query_each(f"""
+                SELECT t.account_id, COUNT(*),
+                       SUM(CASE WHEN {outcome} = 'Win' THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN {outcome} = 'Loss' THEN 1 ELSE 0 END),
+                       COALESCE(SUM(CAST(t.profit_loss AS REAL)), 0)
+                FROM trades t
+                LEFT JOIN {outcomes.THRESHOLD_TABLE} b ON b.account_id = t.account_id
+                GROUP BY t.account_id;
+            """):
+                totals[str(account_id)] = total
+            rows = [
+                (account_id, name, account_type, *totals.get(str(account_id), [0, 0, 0, 0.0]))
+                for account_id, name, account_type in store.query("SELECT id, name, type FROM accounts ORDER BY id")
+            ]
+
+            if not rows:
+                print("No accounts found in the database.")
+                return
+
+            print(f"\n{'ID':>4}  {'Name':<24} {'Type':<6} {'Trades':>7} {'Wins':>6} {'Losses':>6} {'Win %':>6} {'P/L':>12}")
+            print("-" * 80)
+            for account_id, name, account_type, trades, wins, losses, profit in rows:
+                win_rate = f"{100 * wins / trades:.1f}" if trades else "-"
+                print(f"{account_id:>4}  {str(name)[:24]:<24} {str(account_type):<6} {trades:>7} "
+                      f"{wins or 0:>6} {losses or 0:>6} {win_rate:>6} {profit:>12.2f}")
+        except Exception as e:
+            print(f"Error fetching account summary: {e}")
 
-            cursor.execute("SELECT id, name, type FROM accounts ORDER BY id;")
-            accounts = cursor.fetchall()
+    @staticmethod
+    def iter_trade_pages(account_id=None, outcome=None, strategy=None, killzone=None, page_size=20):
+        """
+        Yield pages (lists) of trade rows matching the filters, streamed from one cursor
+        with fetchmany so only a single page is held in memory at a time.
+        """
+        # The outcome follows the break-even threshold of each trade's account
+        outcome_column = outcomes.expression("trades")
+        columns = [f"{outcome_column} AS trade_outcome" if c == "trade_outcome" else c for c in VIEW_COLUMNS]
+        query = f"SELECT id, account_id, {', '.join(columns)} FROM trades WHERE 1 = 1"
+        params = []
+        for column, value in (("account_id", account_id), (outcome_column, outcome),
+                              ("strategy_used", strategy), ("killzone", killzone)):
+            if value:
+                query += f" AND {column} = ?"
+                params.append(value)
+        query += " ORDER BY id"
+
+        store = DatabaseManager.storage()
+        connections = [store.connect(account_id)] if account_id else store.connect_each()
+        try:
+            # One cursor per trades database, merged in id order (ids are per shard)
+            cursors = [iter(conn.execute(query, params)) for conn in connections]
+            rows = heapq.merge(*cursors, key=lambda row: row[0])
+            while True:
+                page = list(itertools.islice(rows, page_size))
+                if not page:
+                    break
+                yield page
+        finally:
+            for conn in connections:
+                conn.close()
 
-            if accounts:
-                for account in accounts:
-                    print(f"\n{'=' * 60}")
-                    print(f"Account ID: {account[0]} | Name: {account[1]} | Type: {account[2]}")
-                    print(f"{'=' * 60}")
-
-                    cursor.execute("""
-                        SELECT id, filename, position_size, opened, closed, pips_gained_lost,
-                               profit_loss, risk_reward, strategy_used, open_day, open_time,
-                               trade_outcome, open_month, trade_duration_minutes, killzone,
-                               time_writing
-                        FROM trades
-                        WHERE account_id = ?
-                        ORDER BY opened;
-                    """, (account[0],))
-
-                    trades = cursor.fetchall()
-
-                    if trades:
-                        for idx, trade in enumerate(trades, 1):
-                            print(f"\nTrade #{idx}")
-                            print("-" * 60)
-                            labels = ["Trade ID", "Filename", "Position Size", "Opened", "Closed", "Pips Gained/Lost",
-                                      "Profit/Loss", "Risk/Reward", "Strategy Used", "Open Day", "Open Time",
-                                      "Trade Outcome", "Open Month", "Duration (min)", "Killzone", "Recorded At"]
-
-                            for label, value in zip(labels, trade):
-                                print(f"{label:<20}: {value}")
-                    else:
-                        print("No trades found for this account.")
+    @staticmethod
+    def view_trades(account_id=None, outcome=None, strategy=None, killzone=None, compact=True, page_size=20):
+        """
+        Page through trades matching the filters, as a compact table or detailed records.
+        Press Enter for the next page or 'q' to stop.
+        """
+        try:
+            shown = 0
+            for page in DatabaseManager.iter_trade_pages(account_id, outcome, strategy, killzone, page_size):
+                if compact:
+                    DatabaseManager._print_trade_table(page, header=shown == 0)
+                else:
+                    for trade in page:
+                        DatabaseManager._print_trade_details(trade)
+                shown += len(page)
+                if len(page) < page_size:
+                    break
+                if input(f"-- {shown} trade(s) shown, Enter for more, 'q' to stop: ").strip().lower() == "q":
+                    break
+            if shown == 0:
+                print("No trades found.")
+        except Exception as e:
+            print(f"Error fetching trades: {e}")
 
-            else:
-                print("No accounts found in the database.")
+    @staticmethod
+    def _print_trade_table(rows, header=True):
+        if header:
+            print(f"\n{'ID':>7} {'Acc':>4}  {'Opened':<16} {'Instrument':<10} {'Strategy':<16} "
+                  f"{'Outcome':<10} {'P/L':>10} {'Killzone':<10}")
+            print("-" * 92)
+        for row in rows:
+            trade = dict(zip(["id", "account_id"] + VIEW_COLUMNS, row))
+            print(f"{trade['id']:>7} {str(trade['account_id']):>4}  {str(trade['opened'] or ''):<16} "
+                  f"{str(trade['instrument'] or '')[:10]:<10} {str(trade['strategy_used'] or '')[:16]:<16} "
+                  f"{str(trade['trade_outcome'] or '')[:10]:<10} {str(trade['profit_loss'] or ''):>10} "
+                  f"{str(trade['killzone'] or '')[:10]:<10}")
 
-            conn.close()
+    @staticmethod
+    def _print_trade_details(row):
+        labels = ["Trade ID", "Account ID", "Filename", "Position Size", "Opened", "Closed", "Pips Gained/Lost",
+                  "Profit/Loss", "Risk/Reward", "Strategy Used", "Open Day", "Open Time",
+                  "Trade Outcome", "Open Month", "Duration (min)", "Killzone", "Recorded At", "Instrument"]
+        print("-" * 60)
+        for label, value in zip(labels, row):
+            print(f"{label:<20}: {value}")
 
-        except Exception as e:
-            print(f"Error fetching accounts and trades: {e}")
+    @staticmethod
+    def view_menu():
+        """
+        Ask which view to show and which filters to apply.
+        """
+        print("\n1. Account summary")
+        print("2. List trades (compact table)")
+        print("3. List trades (detailed)")
+        choice = input("Enter your choice: ").strip()
+        if choice == "1":
+            DatabaseManager.view_summary()
+        elif choice in ("2", "3"):
+            account_id = input("Account ID (leave empty for all): ").strip()
+            outcome = input("Outcome filter, e.g. Win/Loss (leave empty for all): ").strip()
+            strategy = input("Strategy filter (leave empty for all): ").strip()
+            killzone = input("Killzone filter (leave empty for all): ").strip()
+            DatabaseManager.view_trades(account_id, outcome, strategy, killzone, compact=choice == "2")
+        else:
+            print("Invalid choice.")
 
     @staticmethod
     def get_all_accounts():
@@ -283,93 +512,291 @@ class DatabaseManager:
         Fetch all accounts from the database.
         """
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, name, type FROM accounts")
-            accounts = cursor.fetchall()
-            conn.close()
-            return accounts
+            return DatabaseManager.storage().query("SELECT id, name, type FROM accounts")
         except Exception as e:
             print(f"Error fetching accounts: {e}")
             return []
 
     @staticmethod
-    def insert_trade(trade_entry):
+    def _trade_values(trade, account_id=None, converter=None):
         """
-        Insert a TradeEntry object into the database.
+        Build the INSERT parameters for a trade given as a dict or a TradeEntry-like object.
+        With a converter, a P/L in another currency is converted to the account's base currency.
+        """
+        data = trade if isinstance(trade, dict) else dict(trade.to_dict(), account_id=getattr(trade, "account_id", None))
+        values = [data.get("account_id") if account_id is None else account_id]
+        if converter is not None and data.get("currency") and data.get("profit_loss_original") is None:
+            data = converter.normalize(dict(data), values[0])
+        values.extend(data.get(column) for column in TRADE_COLUMNS[1:])
+        return values
+
+    @staticmethod
+    def insert_trades(trades, account_id=None, chunk_size=500):
+        """
+        Insert many trades (dicts or TradeEntry objects) in a single transaction.
+
+        Each chunk is written with executemany inside a savepoint. If a chunk fails, it
+        is rolled back to its savepoint and retried row by row so that only the offending
+        trades are rejected. Returns {"inserted": n, "failed": [{"filename", "error"}]}.
+        """
+        store = DatabaseManager.storage()
+        if store.sharded and account_id is None:
+            # Trades of different accounts go to different shard files
+            by_account = {}
+            for trade in trades:
+                by_account.setdefault(DatabaseManager._trade_values(trade)[0], []).append(trade)
+            result = {"inserted": 0, "failed": []}
+            for trade_account, account_trades in by_account.items():
+                partial = DatabaseManager.insert_trades(account_trades, trade_account, chunk_size)
+                result["inserted"] += partial["inserted"]
+                result["failed"].extend(partial["failed"])
+                if "error" in partial:
+                    result["error"] = partial["error"]
+            return result
+
+        result = {"inserted": 0, "failed": []}
+        sql = f"""
+            INSERT INTO trades ({', '.join(TRADE_COLUMNS)})
+            VALUES ({', '.join('?' for _ in TRADE_COLUMNS)})
         """
+        converter = fx.Converter(store.db_name)
+        conn = store.connect(account_id, isolation_level=None)
         try:
-            conn = sqlite3.connect(DB_NAME)
             cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            chunk = []
+            for trade in trades:
+                chunk.append(DatabaseManager._trade_values(trade, account_id, converter))
+                if len(chunk) >= chunk_size:
+                    DatabaseManager._insert_chunk(cursor, sql, chunk, result)
+                    chunk = []
+            if chunk:
+                DatabaseManager._insert_chunk(cursor, sql, chunk, result)
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            print(f"Error inserting trades: {e}")
+            result["error"] = str(e)
+            result["inserted"] = 0
+        finally:
+            conn.close()
+        return result
 
-            sql = """
-                INSERT INTO trades (
-                    account_id, filename, position_size, opened, closed,
-                    pips_gained_lost, profit_loss, risk_reward, strategy_used,
-                    open_day, open_time, trade_outcome, open_month,
-                    trade_duration_minutes, killzone
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            values = (
-                trade_entry.account_id,
-                trade_entry.filename,
-                trade_entry.position_size,
-                trade_entry.opened,
-                trade_entry.closed,
-                trade_entry.pips_gained_lost,
-                trade_entry.profit_loss,
-                trade_entry.risk_reward,
-                trade_entry.strategy_used,
-                trade_entry.open_day,
-                trade_entry.open_time,
-                trade_entry.trade_outcome,
-                trade_entry.open_month,
-                trade_entry.trade_duration_minutes,
-                trade_entry.killzone
-            )
+    @staticmethod
+    def _insert_chunk(cursor, sql, chunk, result):
+        cursor.execute("SAVEPOINT chunk")
+        try:
+            cursor.executemany(sql, chunk)
+            cursor.execute("RELEASE chunk")
+            result["inserted"] += len(chunk)
+            return
+        except sqlite3.Error:
+            cursor.execute("ROLLBACK TO chunk")
+            cursor.execute("RELEASE chunk")
+
+        # Retry row by row to find out which trades are rejected
+        filename_index = TRADE_COLUMNS.index("filename")
+        for values in chunk:
+            cursor.execute("SAVEPOINT row")
+            try:
+                cursor.execute(sql, values)
+                cursor.execute("RELEASE row")
+                result["inserted"] += 1
+            except sqlite3.Error as e:
+                cursor.execute("ROLLBACK TO row")
+                cursor.execute("RELEASE row")
+                result["failed"].append({"filename": values[filename_index], "error": str(e)})
 
-            cursor.execute(sql, values)
-            conn.commit()
-            conn.close()
+    @staticmethod
+    def insert_trade(trade_entry):
+        """
+        Insert a TradeEntry object into the database.
+        """
+        result = DatabaseManager.insert_trades([trade_entry])
+        if result["inserted"]:
             print(f"Trade '{trade_entry.filename}' inserted into the database.")
-        except sqlite3.IntegrityError:
+        elif result["failed"] and "UNIQUE" in result["failed"][0]["error"]:
             print(f"Trade '{trade_entry.filename}' already exists in the database.")
-        except Exception as e:
-            print(f"Error inserting trade '{trade_entry.filename}': {e}")
+        else:
+            error = result["failed"][0]["error"] if result["failed"] else result.get("error")
+            print(f"Error inserting trade '{trade_entry.filename}': {error}")
 
     @staticmethod
-    def delete_entry_by_id(account_id, entry_id):
+    def delete_entries(account_id, entry_ids, chunk_size=500):
         """
-        Delete an entry by its unique ID for a specific account.
+        Delete many trades of an account in a single transaction.
+        Returns {"deleted": n, "missing": [ids that do not exist for this account]}.
         """
+        entry_ids = list(dict.fromkeys(str(entry_id).strip() for entry_id in entry_ids))
+        conn = DatabaseManager.storage().connect(account_id)
         try:
-            conn = sqlite3.connect(DB_NAME)
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM trades WHERE account_id = ? AND id = ?", (account_id, entry_id))
+            existing = set()
+            for start in range(0, len(entry_ids), chunk_size):
+                chunk = entry_ids[start:start + chunk_size]
+                cursor.execute(
+                    f"SELECT id FROM trades WHERE account_id = ? AND id IN ({', '.join('?' for _ in chunk)})",
+                    [account_id] + chunk
+                )
+                existing.update(str(row[0]) for row in cursor.fetchall())
+            cursor.executemany(
+                "DELETE FROM trades WHERE account_id = ? AND id = ?",
+                [(account_id, entry_id) for entry_id in entry_ids if entry_id in existing]
+            )
+            deleted = cursor.rowcount if existing else 0
             conn.commit()
+            return {"deleted": deleted, "missing": [entry_id for entry_id in entry_ids if entry_id not in existing]}
+        except Exception as e:
+            conn.rollback()
+            print(f"Error deleting entries: {e}")
+            return {"deleted": 0, "missing": [], "error": str(e)}
+        finally:
             conn.close()
+
+    @staticmethod
+    def delete_entry_by_id(account_id, entry_id):
+        """
+        Delete an entry by its unique ID for a specific account.
+        """
+        result = DatabaseManager.delete_entries(account_id, [entry_id])
+        if result["deleted"]:
             print(f"Entry with ID '{entry_id}' has been deleted.")
-        except Exception as e:
-            print(f"Error deleting entry with ID '{entry_id}': {e}")
+        elif "error" in result:
+            print(f"Error deleting entry with ID '{entry_id}': {result['error']}")
+        else:
+            print(f"No entry with ID '{entry_id}' found for account '{account_id}'.")
 
     @staticmethod
     def delete_account(account_id):
         """
-        Delete an account by its ID.
+        Delete an account and all of its trades in one atomic transaction (with sharded
+        storage: remove the account's shard, then the account).
+        Returns {"deleted_trades": n, "deleted_account": bool}.
         """
+        store = DatabaseManager.storage()
+        if store.sharded:
+            try:
+                deleted_trades = store.drop_account(account_id)
+                deleted_account = store.execute("DELETE FROM accounts WHERE id = ?", (account_id,)) > 0
+                print(f"Account with ID '{account_id}' has been deleted ({deleted_trades} trade(s)).")
+                return {"deleted_trades": deleted_trades, "deleted_account": deleted_account}
+            except Exception as e:
+                print(f"Error deleting account with ID '{account_id}': {e}")
+                return {"deleted_trades": 0, "deleted_account": False, "error": str(e)}
+
+        conn = store.connect()
         try:
-            conn = sqlite3.connect(DB_NAME)
             cursor = conn.cursor()
-
             # Delete all trades associated with the account
             cursor.execute("DELETE FROM trades WHERE account_id = ?", (account_id,))
+            deleted_trades = cursor.rowcount
             # Delete the account itself
             cursor.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
+            deleted_account = cursor.rowcount > 0
+            conn.commit()
+            print(f"Account with ID '{account_id}' has been deleted ({deleted_trades} trade(s)).")
+            return {"deleted_trades": deleted_trades, "deleted_account": deleted_account}
+        except Exception as e:
+            conn.rollback()
+            print(f"Error deleting account with ID '{account_id}': {e}")
+            return {"deleted_trades": 0, "deleted_account": False, "error": str(e)}
+        finally:
+            conn.close()
 
-            print(f"Account with ID '{account_id}' has been deleted.")
+    @staticmethod
+    def index_archived_files():
+        """
+        Record the content hash of journal files archived by older importer versions
+        (uploads/Account_<id>/<filename>.md), move them to the content-addressed layout
+        and store the note text of archived trades for full-text search.
+        """
+        try:
+            store = DatabaseManager.storage()
+            indexed = 0
+            for folder in sorted(os.listdir(UPLOAD_DIR)):
+                account_folder = os.path.join(UPLOAD_DIR, folder)
+                if not folder.startswith("Account_") or not os.path.isdir(account_folder):
+                    continue
+                account_id = folder[len("Account_"):]
+                conn = store.connect(account_id)
+                cursor = conn.cursor()
+                for filename in sorted(os.listdir(account_folder)):
+                    file_path = os.path.join(account_folder, filename)
+                    if not filename.endswith(".md") or not os.path.isfile(file_path):
+                        continue
+                    with open(file_path, "rb") as f:
+                        content_hash = hashlib.sha256(f.read()).hexdigest()
+                    try:
+                        cursor.execute(
+                            "UPDATE trades SET content_hash = ? "
+                            "WHERE filename = ? AND account_id = ? AND content_hash IS NULL",
+                            (content_hash, filename, account_id)
+                        )
+                    except sqlite3.IntegrityError:
+                        print(f"Skipping '{filename}': identical content is already indexed.")
+                        continue
+                    if cursor.rowcount:
+                        target = os.path.join(account_folder, content_hash[:2], f"{content_hash}.md")
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        os.replace(file_path, target)
+                        indexed += 1
+                conn.commit()
+                conn.close()
+            print(f"Indexed {indexed} archived journal file(s).")
+            notes = sum(search.backfill_notes(db_name, UPLOAD_DIR) for db_name in store.databases())
+            print(f"Stored the note text of {notes} trade(s) for search.")
+        except FileNotFoundError:
+            print("No archived journal files found.")
+        except Exception as e:
+            print(f"Error indexing archived files: {e}")
+
+    @staticmethod
+    def maintenance_menu():
+        """
+        Run an online maintenance task on the database.
+        """
+        report = maintenance.storage_report(DB_NAME)
+        print(f"\nDatabase size: {report['size_bytes'] / 1024 / 1024:.1f} MB, "
+              f"free space: {report['free_bytes'] / 1024 / 1024:.1f} MB ({report['free_ratio']:.0%}), "
+              f"auto_vacuum: {report['auto_vacuum']}, journal: {report['journal_mode']}")
+        print("1. Snapshot (hot backup)")
+        print("2. Write a compacted copy (VACUUM INTO)")
+        print("3. Incremental vacuum")
+        print("4. Analyze (refresh planner statistics)")
+        print("5. Integrity check")
+        print("6. Enable incremental vacuum (one-off full VACUUM, locks the database)")
+        print("7. Rebuild the analytics cube")
+        print("8. Rebuild the best/worst trade leaderboards")
+        print("9. Check the leaderboards against the trades")
+        tasks = {
+            "1": "snapshot", "2": "vacuum_into", "3": "incremental_vacuum",
+            "4": "analyze", "5": "integrity_check", "6": "enable_incremental_vacuum",
+            "7": "rebuild_cube", "8": "rebuild_leaderboards", "9": "check_leaderboards",
+        }
+        choice = input("Enter your choice: ").strip()
+        if choice not in tasks:
+            print("Invalid choice.")
+            return
+        if choice == "6" and input("Stop the services first. Continue? (yes/no): ").lower() != "yes":
+            return
+        try:
+            for db_name in DatabaseManager.storage().databases():
+                maintenance.run_task(tasks[choice], db_name)
+        except Exception as e:
+            print(f"Error running maintenance task: {e}")
 
+    @staticmethod
+    def reclassify_killzones(account_id=None):
+        """
+        Recompute the killzone of stored trades using the current session definitions.
+        """
+        try:
+            store = DatabaseManager.storage()
+            updated = sum(killzones.backfill_killzones(db_name, account_id) for db_name in store.databases(account_id))
+            print(f"Killzones reclassified: {updated} trade(s) updated.")
         except Exception as e:
-            print(f"Error deleting entry with ID '{account_id}': {e}")
+            print(f"Error reclassifying killzones: {e}")
 
 
 
@@ -0,0 +1,344 @@
+"""
+Currency of journal P/L and conversion into each account's base currency.
+
+Notes write Profit/Loss in euros or dollars. The importer records the currency and the
+amount as written (profit_loss_original), converts it at the rate of the day the trade
+closed and stores the result in profit_loss, with the rate used in fx_rate. Stats
+queries therefore sum profit_loss as plain numbers, in the account's base currency.
+
+Rates come from a local CSV file loaded into the fx_rates table of the main database
+(no network access). A rate row means 1 `base` = `rate` `quote`, so EUR,USD,1.08 is
+used for USD -> EUR too. The rate of a trade is the latest one on or before its date.
+When no rate is known profit_loss is stored as NULL (the amount as written stays in
+profit_loss_original), so the trade is left out of every P/L sum instead of being added
+in the wrong currency, and `python -m utils.fx convert` fills it in once rates are loaded.
+"""
+import argparse
+import bisect
+import csv
+import re
+import sqlite3
+from datetime import datetime
+
+from utils.config import DB_NAME
+
+DEFAULT_BASE_CURRENCY = "EUR"
+
+# Symbols accepted in the Profit/Loss field of a note
+CURRENCY_SYMBOLS = {"€": "EUR", "$": "USD"}
+
+# Currency of the Profit/Loss line, for notes imported before it was recorded
+PROFIT_LOSS_CURRENCY = re.compile(r"Profit/Loss:\s*[\*_~]*[+-]?\d+(?:\.\d+)?([€$])", re.IGNORECASE)
+
+FX_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS fx_rates (
+        base TEXT NOT NULL,
+        quote TEXT NOT NULL,
+        rate_date TEXT NOT NULL,
+        rate REAL NOT NULL,
+        loaded_at TEXT,
+        PRIMARY KEY (base, quote, rate_date)
+    ) WITHOUT ROWID
+"""
+
+# Table loads cached per database file, with the state of fx_rates they were read at
+_cache = {}
+
+
+def ensure_schema(cursor):
+    """
+    Create the rate table in the main database.
+    """
+    cursor.execute(FX_SCHEMA)
+
+
+def currency_of(symbol):
+    """
+    ISO code of a currency symbol, or None.
+    """
+    return CURRENCY_SYMBOLS.get((symbol or "").strip())
+
+
+def trade_date(opened, closed=None):
+    """
+    'yyyy-mm-dd' date at which a trade's P/L is converted: when it closed, else when it opened.
+    """
+    for value in (closed, opened):
+        try:
+            return datetime.strptime((value or "").strip(), "%d/%m/%Y %H:%M").strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+class RateTable:
+    """
+    In-memory copy of fx_rates, indexed by currency pair and date.
+    """
+
+    def __init__(self, rows=()):
+        self.pairs = {}
+        for base, quote, rate_date, rate in sorted(rows, key=lambda row: row[2]):
+            dates, rates = self.pairs.setdefault((base.upper(), quote.upper()), ([], []))
+            dates.append(rate_date)
+            rates.append(float(rate))
+
+    @classmethod
+    def load(cls, db_name=DB_NAME):
+        """
+        Return the rate table of a database, reloading it only when fx_rates changed.
+        """
+        conn = sqlite3.connect(db_name)
+        try:
+            cursor = conn.cursor()
+            ensure_schema(cursor)
+            signature = cursor.execute("SELECT COUNT(*), MAX(loaded_at) FROM fx_rates").fetchone()
+            cached = _cache.get(db_name)
+            if cached and cached[0] == signature:
+                return cached[1]
+            table = cls(cursor.execute("SELECT base, quote, rate_date, rate FROM fx_rates").fetchall())
+        finally:
+            conn.close()
+        _cache[db_name] = (signature, table)
+        return table
+
+    def _latest(self, base, quote, date):
+        dates, rates = self.pairs.get((base, quote), ((), ()))
+        position = bisect.bisect_right(dates, date)
+        return rates[position - 1] if position else None
+
+    def rate(self, currency, base_currency, date):
+        """
+        Number of `base_currency` units per unit of `currency` on `date` ('yyyy-mm-dd'),
+        or None if the table has no rate for the pair on or before that date.
+        """
+        currency, base_currency = currency.upper(), base_currency.upper()
+        if currency == base_currency:
+            return 1.0
+        if not date:
+            return None
+        direct = self._latest(currency, base_currency, date)
+        if direct is not None:
+            return direct
+        inverse = self._latest(base_currency, currency, date)
+        return 1.0 / inverse if inverse else None
+
+    def convert(self, amount, currency, base_currency, date):
+        """
+        Convert a P/L amount (text as written in the note) into the base currency.
+        Returns (profit_loss, fx_rate): a non-numeric amount is returned unchanged with a
+        None rate, and a number without a known rate gives (None, None).
+        """
+        if not currency:
+            return amount, None
+        if currency.upper() == base_currency.upper():
+            return amount, 1.0
+        try:
+            value = float(amount)
+        except (TypeError, ValueError):
+            return amount, None
+        rate = self.rate(currency, base_currency, date)
+        if rate is None:
+            return None, None
+        return f"{value * rate:.2f}", rate
+
+
+def base_currencies(db_name=DB_NAME):
+    """
+    Base currency of every account, {account_id (text): 'EUR'}.
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        rows = conn.execute("SELECT id, base_currency FROM accounts").fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+    finally:
+        conn.close()
+    return {str(account_id): (currency or DEFAULT_BASE_CURRENCY).upper() for account_id, currency in rows}
+
+
+class Converter:
+    """
+    Converts parsed trades into the base currency of their account. Rates and base
+    currencies are read from the main database on first use.
+    """
+
+    def __init__(self, db_name=DB_NAME):
+        self.db_name = db_name
+        self._rates = None
+        self._currencies = None
+
+    def normalize(self, trade, account_id):
+        """
+        Fill in profit_loss_original and fx_rate of a parsed trade (a dict with profit_loss
+        and currency) and replace profit_loss by its value in the base currency.
+        """
+        original = trade.get("profit_loss")
+        trade["profit_loss_original"] = original
+        trade["fx_rate"] = None
+        if trade.get("currency"):
+            if self._rates is None:
+                self._rates = RateTable.load(self.db_name)
+                self._currencies = base_currencies(self.db_name)
+            base_currency = self._currencies.get(str(account_id), DEFAULT_BASE_CURRENCY)
+            trade["profit_loss"], trade["fx_rate"] = self._rates.convert(
+                original, trade["currency"], base_currency, trade_date(trade.get("opened"), trade.get("closed"))
+            )
+        return trade
+
+
+def load_csv(path, db_name=DB_NAME):
+    """
+    Load rates from a CSV file with a header row and columns date (YYYY-MM-DD), base,
+    quote and rate, replacing existing rates of the same pair and date.
+    Returns the number of rates loaded.
+    """
+    loaded_at = datetime.now().isoformat(timespec="seconds")
+    rows = []
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for line, record in enumerate(csv.DictReader(f), start=2):
+            try:
+                rate_date = datetime.strptime(record["date"].strip(), "%Y-%m-%d").strftime("%Y-%m-%d")
+                rate = float(record["rate"])
+                base, quote = record["base"].strip().upper(), record["quote"].strip().upper()
+            except (KeyError, AttributeError, TypeError, ValueError) as e:
+                raise ValueError(f"{path}, line {line}: expected date,base,quote,rate ({e})")
+            if rate <= 0 or not base or not quote:
+                raise ValueError(f"{path}, line {line}: invalid rate")
+            rows.append((base, quote, rate_date, rate, loaded_at))
+    conn = sqlite3.connect(db_name)
+    try:
+        ensure_schema(conn.cursor())
+        conn.executemany("INSERT OR REPLACE INTO fx_rates VALUES (?, ?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def reconvert(db_name, rates, currencies, account_id=None, chunk_size=2000, on_chunk=None):
+    """
+    Recompute profit_loss of stored trades from their original amount, after rates were
+    loaded or an account's base currency changed. Trades imported before currencies were
+    recorded get theirs from the note text. Only changed rows are written, one short
+    transaction per chunk, so an interrupted run simply continues when started again.
+    `currencies` maps account ids to base currencies. Returns the number of updated rows.
+    on_chunk(scanned, updated) is called after each committed chunk.
+    """
+    conn = sqlite3.connect(db_name)
+    updated = 0
+    scanned = 0
+    try:
+        cursor = conn.cursor()
+        last_id = 0
+        while True:
+            query = """
+                SELECT id, account_id, currency, COALESCE(profit_loss_original, profit_loss),
+                       profit_loss, fx_rate, profit_loss_original, opened, closed,
+                       CASE WHEN currency IS NULL THEN notes END
+                FROM trades WHERE id > ?
+            """
+            params = [last_id]
+            if account_id is not None:
+                query += " AND account_id = ?"
+                params.append(account_id)
+            query += " ORDER BY id LIMIT ?"
+            params.append(chunk_size)
+
+            rows = cursor.execute(query, params).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            changes = []
+            for trade_id, account, currency, original, profit_loss, fx_rate, stored_original, opened, closed, notes in rows:
+                if currency is None and notes:
+                    match = PROFIT_LOSS_CURRENCY.search(notes)
+                    currency = currency_of(match.group(1)) if match else None
+                base_currency = currencies.get(str(account), DEFAULT_BASE_CURRENCY)
+                converted, rate = rates.convert(original, currency, base_currency, trade_date(opened, closed))
+                if (converted, rate, original) != (profit_loss, fx_rate, stored_original):
+                    changes.append((currency, original, converted, rate, trade_id))
+            if changes:
+                cursor.executemany(
+                    "UPDATE trades SET currency = ?, profit_loss_original = ?, profit_loss = ?, fx_rate = ? "
+                    "WHERE id = ?", changes
+                )
+                conn.commit()
+                updated += len(changes)
+            scanned += len(rows)
+            if on_chunk is not None:
+                on_chunk(scanned, updated)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return updated
+
+
+def unconverted(trade):
+    """
+    True when normalize() left a trade's P/L out for lack of a rate.
+    """
+    return trade.get("profit_loss") is None and trade.get("profit_loss_original") not in (None, "")
+
+
+def pending(db_name):
+    """
+    Number of trades per (account, currency) without a P/L for lack of a rate.
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        return conn.execute("""
+            SELECT account_id, currency, COUNT(*) FROM trades
+            WHERE currency IS NOT NULL AND fx_rate IS NULL
+              AND profit_loss IS NULL AND profit_loss_original IS NOT NULL
+            GROUP BY account_id, currency ORDER BY account_id, currency
+        """).fetchall()
+    finally:
+        conn.close()
+
+
+def main():
+    from utils import storage
+
+    parser = argparse.ArgumentParser(description="Manage FX rates and the base-currency P/L of trades.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("load", help="Load rates from a CSV file (date,base,quote,rate)")
+    load.add_argument("csv_file")
+    convert = commands.add_parser("convert", help="Recompute the base-currency P/L of stored trades")
+    convert.add_argument("--account", default=None, help="Only this account id")
+    base = commands.add_parser("base", help="Set the base currency of an account and reconvert its trades")
+    base.add_argument("account")
+    base.add_argument("currency")
+    commands.add_parser("status", help="List trades left unconverted for lack of a rate")
+    parser.add_argument("--db", default=DB_NAME, help="Database file (defaults to the configured trades.db)")
+    args = parser.parse_args()
+
+    store = storage.get_storage(args.db, engine="sqlite")
+    if args.command == "load":
+        print(f"{load_csv(args.csv_file, args.db)} rate(s) loaded. Run 'convert' to apply them to stored trades.")
+        return
+    if args.command == "status":
+        rows = [row for db_name in store.databases() for row in pending(db_name)]
+        for account_id, currency, count in rows:
+            print(f"Account {account_id}: {count} {currency} trade(s) without a rate")
+        print("All trades are converted." if not rows else f"{sum(row[2] for row in rows)} trade(s) unconverted.")
+        return
+
+    account_id = args.account
+    if args.command == "base":
+        currency = args.currency.strip().upper()
+        if store.execute("UPDATE accounts SET base_currency = ? WHERE id = ?", (currency, account_id)) == 0:
+            print(f"Account '{account_id}' not found.")
+            return
+        print(f"Base currency of account {account_id} set to {currency}.")
+    rates = RateTable.load(args.db)
+    currencies = base_currencies(args.db)
+    updated = sum(reconvert(db_name, rates, currencies, account_id) for db_name in store.databases(account_id))
+    print(f"{updated} trade(s) reconverted.")
+
+
+if __name__ == "__main__":
+    main()
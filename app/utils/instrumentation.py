@@ -0,0 +1,293 @@
+import cProfile
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, g, request
+
+
+def sample_rate_from_env():
+    """
+    Parse TRADESTAT_PROFILE_SAMPLE_RATE, the fraction of requests to profile, into [0, 1].
+    """
+    raw = os.environ.get("TRADESTAT_PROFILE_SAMPLE_RATE", "").strip()
+    if not raw:
+        return 0.0
+    try:
+        rate = float(raw)
+    except ValueError:
+        rate = None
+    if rate is None or rate != rate:
+        print(f"Invalid profile sample rate '{raw}', profiling is disabled.")
+        return 0.0
+    if not 0 <= rate <= 1:
+        print(f"Profile sample rate {raw} is outside [0, 1], clamping it.")
+    return min(max(rate, 0.0), 1.0)
+
+
+# Opt-in switches, read once at import time
+METRICS_ENABLED = os.environ.get("TRADESTAT_METRICS", "").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = sample_rate_from_env()
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Number of SQLite VM instructions between two progress handler calls
+VM_STEP_GRANULARITY = 1000
+
+_lock = threading.Lock()
+_profile_lock = threading.Lock()
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus exposition format.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+_request_latency = defaultdict(Histogram)
+_query_latency = defaultdict(Histogram)
+_connection_latency = Histogram()
+_query_rows = defaultdict(int)
+_query_vm_steps = defaultdict(int)
+
+
+def _current_endpoint():
+    try:
+        return request.endpoint or "unknown"
+    except RuntimeError:
+        # Outside of a request context (scripts, benchmarks)
+        return "none"
+
+
+def _request_timings():
+    try:
+        if "timings" not in g:
+            g.timings = {"conn": 0.0, "db": 0.0, "queries": 0}
+        return g.timings
+    except RuntimeError:
+        return None
+
+
+def connect(db_name, **kwargs):
+    """
+    Open a SQLite connection, recording how long acquiring it took.
+    """
+    if not METRICS_ENABLED:
+        return sqlite3.connect(db_name, **kwargs)
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_name, **kwargs)
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _connection_latency.observe(elapsed)
+    timings = _request_timings()
+    if timings is not None:
+        timings["conn"] += elapsed
+    return conn
+
+
+def _record_query(elapsed, rows, steps):
+    timings = _request_timings()
+    if timings is not None:
+        timings["db"] += elapsed
+        timings["queries"] += 1
+        label = (_current_endpoint(), timings["queries"])
+    else:
+        label = (_current_endpoint(), 1)
+
+    with _lock:
+        _query_latency[label].observe(elapsed)
+        _query_rows[label] += rows
+        _query_vm_steps[label] += steps
+
+
+def fetch_all(conn, query, params=()):
+    """
+    Execute a query and fetch all rows, recording execution time, rows returned and
+    the number of SQLite VM steps spent (a proxy for rows scanned).
+    """
+    if not METRICS_ENABLED:
+        return conn.execute(query, params).fetchall()
+
+    steps = [0]
+
+    def count_steps():
+        steps[0] += VM_STEP_GRANULARITY
+        return 0
+
+    conn.set_progress_handler(count_steps, VM_STEP_GRANULARITY)
+    start = time.perf_counter()
+    try:
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        elapsed = time.perf_counter() - start
+        conn.set_progress_handler(None, 0)
+
+    _record_query(elapsed, len(rows), steps[0])
+    return rows
+
+
+def fetch_chunks(conn, query, params=(), size=1000):
+    """
+    Execute a query and yield its rows in lists of at most `size` (cursor.fetchmany), so
+    callers aggregating a large result never hold all of it at once. Records the same
+    metrics as fetch_all, counting only the time spent in SQLite.
+    """
+    if not METRICS_ENABLED:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(size)
+            if not rows:
+                return
+            yield rows
+
+    steps = [0]
+
+    def count_steps():
+        steps[0] += VM_STEP_GRANULARITY
+        return 0
+
+    conn.set_progress_handler(count_steps, VM_STEP_GRANULARITY)
+    elapsed = 0.0
+    total = 0
+    try:
+        start = time.perf_counter()
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(size)
+            elapsed += time.perf_counter() - start
+            if not rows:
+                break
+            total += len(rows)
+            yield rows
+            start = time.perf_counter()
+    finally:
+        conn.set_progress_handler(None, 0)
+        _record_query(elapsed, total, steps[0])
+
+
+def _start_request():
+    g.request_start = time.perf_counter()
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        # cProfile cannot profile two threads at once; skip the sample if one is running
+        if _profile_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+
+def _finish_request(response, profile_dir):
+    start = g.pop("request_start", None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        try:
+            os.makedirs(profile_dir, exist_ok=True)
+            name = f"{request.endpoint or 'unknown'}_{time.time_ns()}_{os.getpid()}.prof"
+            profiler.dump_stats(os.path.join(profile_dir, name))
+        except OSError as e:
+            print(f"Error writing profile: {e}")
+        finally:
+            _profile_lock.release()
+
+    if METRICS_ENABLED:
+        label = (request.endpoint or "unknown", request.method, str(response.status_code))
+        with _lock:
+            _request_latency[label].observe(elapsed)
+
+        timings = g.get("timings", {"conn": 0.0, "db": 0.0})
+        response.headers["Server-Timing"] = ", ".join([
+            f"conn;dur={timings['conn'] * 1000:.3f}",
+            f"db;dur={timings['db'] * 1000:.3f}",
+            f"total;dur={elapsed * 1000:.3f}",
+        ])
+    return response
+
+
+def _format_labels(names, values):
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+
+def _render_histogram(lines, metric, label_names, label_values, histogram):
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        labels = _format_labels(label_names + ("le",), label_values + (repr(bound),))
+        lines.append(f"{metric}_bucket{labels} {count}")
+    labels = _format_labels(label_names + ("le",), label_values + ("+Inf",))
+    lines.append(f"{metric}_bucket{labels} {histogram.total}")
+    labels = _format_labels(label_names, label_values)
+    lines.append(f"{metric}_sum{labels} {histogram.sum:.6f}")
+    lines.append(f"{metric}_count{labels} {histogram.total}")
+
+
+def render_metrics():
+    """
+    Render all collected metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    with _lock:
+        lines.append("# HELP tradestat_request_duration_seconds Request latency per endpoint.")
+        lines.append("# TYPE tradestat_request_duration_seconds histogram")
+        for label, histogram in sorted(_request_latency.items()):
+            _render_histogram(lines, "tradestat_request_duration_seconds",
+                              ("endpoint", "method", "status"), label, histogram)
+
+        lines.append("# HELP tradestat_query_duration_seconds SQL execution time per endpoint query.")
+        lines.append("# TYPE tradestat_query_duration_seconds histogram")
+        for (endpoint, ordinal), histogram in sorted(_query_latency.items()):
+            _render_histogram(lines, "tradestat_query_duration_seconds",
+                              ("endpoint", "query"), (endpoint, str(ordinal)), histogram)
+
+        lines.append("# HELP tradestat_query_rows_total Rows returned per endpoint query.")
+        lines.append("# TYPE tradestat_query_rows_total counter")
+        for (endpoint, ordinal), value in sorted(_query_rows.items()):
+            lines.append(f'tradestat_query_rows_total{{endpoint="{endpoint}",query="{ordinal}"}} {value}')
+
+        lines.append("# HELP tradestat_query_vm_steps_total SQLite VM steps per endpoint query (rows scanned proxy).")
+        lines.append("# TYPE tradestat_query_vm_steps_total counter")
+        for (endpoint, ordinal), value in sorted(_query_vm_steps.items()):
+            lines.append(f'tradestat_query_vm_steps_total{{endpoint="{endpoint}",query="{ordinal}"}} {value}')
+
+        lines.append("# HELP tradestat_connection_acquire_seconds Time spent opening SQLite connections.")
+        lines.append("# TYPE tradestat_connection_acquire_seconds histogram")
+        _render_histogram(lines, "tradestat_connection_acquire_seconds", (), (), _connection_latency)
+
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app, profile_dir):
+    """
+    Attach the opt-in instrumentation hooks and the /metrics endpoint to a Flask app.
+    """
+    if not METRICS_ENABLED and PROFILE_SAMPLE_RATE <= 0:
+        return
+
+    app.before_request(_start_request)
+    app.after_request(lambda response: _finish_request(response, profile_dir))
+
+    if METRICS_ENABLED:
+        @app.route('/metrics', methods=['GET'])
+        def metrics():
+            """
+            Prometheus-style text metrics for the backend.
+            """
+            return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
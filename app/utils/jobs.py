@@ -0,0 +1,381 @@
+"""
+Local background job queue backed by a SQLite table and worker threads.
+
+Jobs are submitted with a kind, a JSON payload and a priority (lower runs first).
+Handlers receive a JobContext to report progress and to notice cancellation. Bulk
+jobs run on a limited number of workers and yield between chunks, so interactive
+requests served by the same process stay responsive.
+
+Several processes may share the queue. A running job is owned by the process that
+claimed it, which renews its lease (updated_at) every HEARTBEAT_INTERVAL seconds; only
+jobs whose lease is older than LEASE_SECONDS, left by a process that died, are queued again.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+# Priorities: lower values are claimed first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 5
+PRIORITY_BULK = 10
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Seconds a bulk job sleeps at each checkpoint to let request threads run
+BULK_YIELD = 0.005
+POLL_INTERVAL = 1.0
+# Running jobs not renewed for this long are considered abandoned
+LEASE_SECONDS = 60
+HEARTBEAT_INTERVAL = 15
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        payload TEXT,
+        priority INTEGER NOT NULL DEFAULT 5,
+        status TEXT NOT NULL DEFAULT 'queued',
+        progress INTEGER NOT NULL DEFAULT 0,
+        total INTEGER,
+        counters TEXT,
+        result TEXT,
+        error TEXT,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT,
+        updated_at TEXT,
+        owner TEXT
+    );
+"""
+INDEX = "CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority, id)"
+
+COLUMNS = [
+    "id", "kind", "payload", "priority", "status", "progress", "total", "counters",
+    "result", "error", "cancel_requested", "created_at", "started_at", "finished_at", "updated_at", "owner",
+]
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a handler when its job has been cancelled.
+    """
+
+
+def _now(offset=0):
+    return (datetime.now() + timedelta(seconds=offset)).isoformat(timespec="seconds")
+
+
+class JobContext:
+    """
+    Handle passed to job handlers for progress reporting and cooperative cancellation.
+    """
+
+    def __init__(self, queue, job_id, priority):
+        self.queue = queue
+        self.job_id = job_id
+        self.priority = priority
+        self.counters = {}
+
+    def checkpoint(self, progress=None, total=None, **counters):
+        """
+        Record progress, raise JobCancelled if cancellation was requested and, for
+        bulk jobs, briefly yield to request threads.
+        """
+        self.counters.update(counters)
+        if self.queue.update_progress(self.job_id, progress, total, self.counters):
+            raise JobCancelled()
+        if self.priority >= PRIORITY_BULK:
+            time.sleep(BULK_YIELD)
+
+    def increment(self, **counters):
+        """
+        Add to named counters (e.g. parsed=1) and checkpoint.
+        """
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        self.checkpoint()
+
+
+class JobQueue:
+    """
+    Persistent job queue with a pool of worker threads.
+    """
+
+    def __init__(self, db_name, workers=2, bulk_workers=1):
+        self.db_name = db_name
+        self.workers = workers
+        self.bulk_workers = min(bulk_workers, workers)
+        self.handlers = {}
+        # Identifies the jobs this process is running
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._threads = []
+        self._started = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_schema(self):
+        conn = self._connect()
+        try:
+            conn.execute(SCHEMA)
+            if "owner" not in [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            conn.execute(INDEX)
+            conn.commit()
+        finally:
+            conn.close()
+        self._requeue_expired()
+
+    def _requeue_expired(self):
+        """
+        Put back in the queue the running jobs whose owner stopped renewing their lease.
+        """
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (QUEUED, _now(), RUNNING, _now(-LEASE_SECONDS))
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _heartbeat(self):
+        """
+        Renew the lease of the jobs this process is running, and requeue abandoned ones.
+        """
+        while not self._stopping.wait(HEARTBEAT_INTERVAL):
+            try:
+                conn = self._connect()
+                try:
+                    conn.execute("UPDATE jobs SET updated_at = ? WHERE status = ? AND owner = ?",
+                                 (_now(), RUNNING, self.owner))
+                    conn.commit()
+                finally:
+                    conn.close()
+                self._requeue_expired()
+            except sqlite3.Error as e:
+                print(f"Error renewing job leases: {e}")
+
+    def register(self, kind, handler):
+        """
+        Register handler(context, payload) -> result for a job kind.
+        """
+        self.handlers[kind] = handler
+
+    def start(self):
+        """
+        Create the jobs table if needed and start the worker threads (idempotent).
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._ensure_schema()
+            for i in range(self.workers):
+                # The first bulk_workers threads may run bulk jobs, the others only interactive ones
+                allow_bulk = i < self.bulk_workers
+                thread = threading.Thread(
+                    target=self._work, args=(allow_bulk,), name=f"job-worker-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            heartbeat.start()
+            self._threads.append(heartbeat)
+            self._started = True
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def submit(self, kind, payload=None, priority=PRIORITY_NORMAL):
+        """
+        Queue a job and return its id.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        self.start()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "INSERT INTO jobs (kind, payload, priority, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload or {}), int(priority), QUEUED, _now(), _now())
+            )
+            conn.commit()
+            job_id = cursor.lastrowid
+        finally:
+            conn.close()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """
+        Return a job as a dictionary, or None if it does not exist.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._to_dict(row) if row else None
+
+    def list(self, status=None, limit=50):
+        """
+        Return the most recent jobs, optionally filtered by status.
+        """
+        query = f"SELECT {', '.join(COLUMNS)} FROM jobs"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        conn = self._connect()
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        return [self._to_dict(row) for row in rows]
+
+    def watch(self, job_id, interval=0.5, timeout=None):
+        """
+        Yield the job each time it changes, until it finishes or `timeout` seconds pass.
+        Works for jobs run by any process sharing the database.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        last = None
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return
+            if job != last:
+                last = job
+                yield job
+                if job["status"] in FINISHED_STATES:
+                    return
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            time.sleep(interval)
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued job immediately, or ask a running one to stop at its next checkpoint.
+        """
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, _now(), _now(), job_id, QUEUED)
+            )
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status = ?",
+                (_now(), job_id, RUNNING)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return self.get(job_id)
+
+    def update_progress(self, job_id, progress=None, total=None, counters=None):
+        """
+        Store progress information and return True if the job should stop: cancellation
+        was requested, or its lease expired and the job no longer belongs to this process.
+        """
+        conn = self._connect()
+        try:
+            updated = conn.execute(
+                "UPDATE jobs SET progress = COALESCE(?, progress), total = COALESCE(?, total), "
+                "counters = COALESCE(?, counters), updated_at = ? WHERE id = ? AND status = ? AND owner = ?",
+                (progress, total, json.dumps(counters) if counters else None, _now(), job_id, RUNNING, self.owner)
+            ).rowcount
+            conn.commit()
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return not updated or bool(row and row[0])
+
+    def _claim(self, allow_bulk):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            query = "SELECT id, kind, payload, priority FROM jobs WHERE status = ?"
+            params = [QUEUED]
+            if not allow_bulk:
+                query += " AND priority < ?"
+                params.append(PRIORITY_BULK)
+            query += " ORDER BY priority, id LIMIT 1"
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, started_at = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, self.owner, _now(), _now(), row["id"])
+            )
+            conn.commit()
+            return row
+        finally:
+            conn.close()
+
+    def _finish(self, job_id, status, result=None, error=None):
+        conn = self._connect()
+        try:
+            # A job requeued after its lease expired is no longer ours to finish
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = ? AND owner = ?",
+                (status, json.dumps(result) if result is not None else None, error, _now(), _now(),
+                 job_id, RUNNING, self.owner)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _work(self, allow_bulk):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim(allow_bulk)
+            except sqlite3.Error as e:
+                print(f"Error claiming job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+
+            context = JobContext(self, job["id"], job["priority"])
+            try:
+                result = self.handlers[job["kind"]](context, json.loads(job["payload"] or "{}"))
+                self._finish(job["id"], SUCCEEDED, result=result)
+            except JobCancelled:
+                self._finish(job["id"], CANCELLED)
+            except Exception as e:
+                traceback.print_exc()
+                self._finish(job["id"], FAILED, error=str(e))
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        for key in ("payload", "counters", "result"):
+            if job[key]:
+                job[key] = json.loads(job[key])
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
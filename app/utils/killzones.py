@@ -0,0 +1,247 @@
+import json
+import os
+import sqlite3
+from functools import lru_cache
+
+import pytz
+
+from utils.config import DATA_DIR, DB_NAME
+
+SESSIONS_FILE = os.path.join(DATA_DIR, "killzones.json")
+
+DATE_FORMAT = "%d/%m/%Y %H:%M"
+DEFAULT_INSTRUMENT = "default"
+
+# Journal timestamps are written without a timezone; "journal_timezone" says how to read them.
+# Each instrument lists its sessions as local wall-clock ranges in its own "timezone".
+# An instrument missing from "instruments" falls back to the "default" entry.
+DEFAULT_CONFIG = {
+    "journal_timezone": "UTC",
+    "instruments": {
+        DEFAULT_INSTRUMENT: {
+            "timezone": "Europe/Rome",
+            "sessions": [
+                {"name": "London", "start": "02:00", "end": "05:00"},
+                {"name": "New York", "start": "07:00", "end": "10:00"},
+            ],
+        },
+    },
+}
+
+_config_cache = {"mtime": None, "config": None}
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    """
+    Return a cached pytz timezone object for the given name.
+    """
+    return pytz.timezone(name)
+
+
+def normalize_instrument(instrument):
+    """
+    Normalize an instrument name so that 'eur/usd', 'EUR USD' and 'EURUSD' match.
+    """
+    if not instrument:
+        return DEFAULT_INSTRUMENT
+    normalized = "".join(ch for ch in str(instrument).upper() if ch.isalnum())
+    return normalized or DEFAULT_INSTRUMENT
+
+
+def _minutes(value):
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _compile_config(raw):
+    """
+    Validate a raw session configuration and convert session bounds to minutes of the day.
+    """
+    journal_tz = raw.get("journal_timezone", DEFAULT_CONFIG["journal_timezone"])
+    get_timezone(journal_tz)
+
+    instruments = {}
+    for name, definition in raw.get("instruments", {}).items():
+        tz_name = definition.get("timezone", journal_tz)
+        get_timezone(tz_name)
+        sessions = [
+            (session["name"], _minutes(session["start"]), _minutes(session["end"]))
+            for session in definition.get("sessions", [])
+        ]
+        key = DEFAULT_INSTRUMENT if name == DEFAULT_INSTRUMENT else normalize_instrument(name)
+        instruments[key] = {"timezone": tz_name, "sessions": sessions}
+
+    if DEFAULT_INSTRUMENT not in instruments:
+        instruments[DEFAULT_INSTRUMENT] = _compile_config(DEFAULT_CONFIG)["instruments"][DEFAULT_INSTRUMENT]
+
+    return {"journal_timezone": journal_tz, "instruments": instruments}
+
+
+def load_config():
+    """
+    Load the session definitions, re-reading the JSON file only when it changes on disk.
+    """
+    try:
+        mtime = os.path.getmtime(SESSIONS_FILE)
+    except OSError:
+        mtime = None
+
+    if _config_cache["config"] is None or _config_cache["mtime"] != mtime:
+        raw = DEFAULT_CONFIG
+        if mtime is not None:
+            try:
+                with open(SESSIONS_FILE, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error reading killzone sessions from '{SESSIONS_FILE}': {e}")
+                raw = DEFAULT_CONFIG
+        try:
+            config = _compile_config(raw)
+        except (KeyError, ValueError, pytz.UnknownTimeZoneError) as e:
+            print(f"Invalid killzone session definitions, using defaults: {e}")
+            config = _compile_config(DEFAULT_CONFIG)
+        _config_cache["config"] = config
+        _config_cache["mtime"] = mtime
+
+    return _config_cache["config"]
+
+
+def save_config(raw):
+    """
+    Validate and write session definitions to the JSON file.
+    """
+    _compile_config(raw)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with open(SESSIONS_FILE, "w", encoding="utf-8") as f:
+        json.dump(raw, f, indent=2)
+    _config_cache["config"] = None
+
+
+def _instrument_definition(config, instrument):
+    instruments = config["instruments"]
+    return instruments.get(normalize_instrument(instrument), instruments[DEFAULT_INSTRUMENT])
+
+
+def _match_session(sessions, minute_of_day):
+    for name, start, end in sessions:
+        if start <= end:
+            if start <= minute_of_day < end:
+                return name
+        elif minute_of_day >= start or minute_of_day < end:
+            return name
+    return "Other"
+
+
+def determine_killzone(opened_time, instrument=None):
+    """
+    Classify a single 'dd/mm/yyyy HH:MM' timestamp into a killzone session.
+    Goes through classify_killzones so imports and backfills resolve DST gaps and
+    overlaps the same way.
+    """
+    try:
+        return classify_killzones([opened_time], [instrument])[0]
+    except Exception as e:
+        print(f"Error determining killzone: {e}")
+        return "Unknown"
+
+
+def classify_killzones(opened_times, instruments=None):
+    """
+    Vectorized killzone classification for a batch of 'dd/mm/yyyy HH:MM' timestamps.
+
+    Timestamps are localized once per batch, converted per instrument timezone with
+    pandas (so DST transitions are honoured row by row) and matched against the session
+    ranges with array masks. A wall-clock time skipped by DST is shifted forward to the
+    end of the gap; an ambiguous one is read as standard time. Returns a list of labels
+    aligned with the input.
+    """
+    import numpy as np
+    import pandas as pd
+
+    config = load_config()
+    opened = pd.Series(list(opened_times), dtype="object")
+    if instruments is None:
+        keys = pd.Series([DEFAULT_INSTRUMENT] * len(opened), dtype="object")
+    else:
+        keys = pd.Series([normalize_instrument(i) for i in instruments], dtype="object")
+    keys = keys.where(keys.isin(list(config["instruments"])), DEFAULT_INSTRUMENT)
+
+    labels = np.full(len(opened), "Unknown", dtype=object)
+    if opened.empty:
+        return labels.tolist()
+
+    parsed = pd.to_datetime(opened.str.strip(), format=DATE_FORMAT, errors="coerce")
+    localized = parsed.dt.tz_localize(
+        config["journal_timezone"],
+        ambiguous=np.zeros(len(parsed), dtype=bool),
+        nonexistent="shift_forward",
+    )
+    valid = parsed.notna().to_numpy()
+
+    for key in keys.unique():
+        definition = config["instruments"][key]
+        mask = (keys == key).to_numpy() & valid
+        if not mask.any():
+            continue
+        session_time = localized[mask].dt.tz_convert(definition["timezone"])
+        minute_of_day = (session_time.dt.hour * 60 + session_time.dt.minute).to_numpy()
+        result = np.full(len(minute_of_day), "Other", dtype=object)
+        # Later sessions must not override earlier ones, so walk them in reverse
+        for name, start, end in reversed(definition["sessions"]):
+            if start <= end:
+                in_session = (minute_of_day >= start) & (minute_of_day < end)
+            else:
+                in_session = (minute_of_day >= start) | (minute_of_day < end)
+            result[in_session] = name
+        labels[mask] = result
+
+    return labels.tolist()
+
+
+def backfill_killzones(db_name=DB_NAME, account_id=None, chunk_size=5000, on_chunk=None):
+    """
+    Reclassify the killzone of existing trades in bulk after session definitions change.
+    Only rows whose label actually changes are rewritten, one short transaction per chunk
+    so readers and other writers are never blocked for long; re-running after an
+    interruption simply continues. Returns the number of updated rows.
+    on_chunk(scanned, updated) is called after each committed chunk, e.g. to report job progress.
+    """
+    conn = sqlite3.connect(db_name)
+    updated = 0
+    scanned = 0
+    try:
+        cursor = conn.cursor()
+        last_id = 0
+        while True:
+            query = """
+                SELECT id, opened, instrument, killzone FROM trades
+                WHERE id > ? AND opened IS NOT NULL AND opened != ''
+            """
+            params = [last_id]
+            if account_id is not None:
+                query += " AND account_id = ?"
+                params.append(account_id)
+            query += " ORDER BY id LIMIT ?"
+            params.append(chunk_size)
+
+            rows = cursor.execute(query, params).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            labels = classify_killzones([row[1] for row in rows], [row[2] for row in rows])
+            changes = [(label, row[0]) for row, label in zip(rows, labels) if label != row[3]]
+            if changes:
+                cursor.executemany("UPDATE trades SET killzone = ? WHERE id = ?", changes)
+                conn.commit()
+                updated += len(changes)
+            scanned += len(rows)
+            if on_chunk is not None:
+                on_chunk(scanned, updated)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return updated
@@ -0,0 +1,238 @@
+"""
+Best and worst trade leaderboards by P/L, pips and R/R.
+
+trade_ranks holds one row per trade with its metrics as numbers (trades stores them
+as text) and its opening date as 'yyyy-mm-dd'. Triggers on trades keep it current on
+insert, update and delete, and an index per metric keeps every account's trades in
+metric order, so the top or bottom K trades are the first K entries of an index range
+instead of a sort of the whole account. Strategy and date filters are applied while
+walking the index.
+
+Trades whose metric is missing or not a number are left out of that metric's board.
+"""
+
+RANK_TABLE = "trade_ranks"
+
+# Leaderboard metric -> trades column it is read from
+METRICS = {
+    "pnl": "profit_loss",
+    "pips": "pips_gained_lost",
+    "r": "risk_reward",
+}
+
+MAX_K = 100
+
+# Metric columns are text: '#' marks an unknown result, anything non-numeric is ignored
+_NUMERIC = (
+    "CASE WHEN {value} GLOB '*[0-9]*' AND {value} NOT GLOB '*[^0-9.+-]*' "
+    "THEN CAST({value} AS REAL) END"
+)
+
+# 'dd/mm/yyyy HH:MM' -> 'yyyy-mm-dd', comparable as text
+_OPENED_DATE = (
+    "CASE WHEN {row}.opened GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]*' "
+    "THEN substr({row}.opened, 7, 4) || '-' || substr({row}.opened, 4, 2) || '-' || substr({row}.opened, 1, 2) END"
+)
+
+# trades columns the leaderboards depend on: updating any other column leaves them untouched
+SOURCE_COLUMNS = ["id", "account_id", "strategy_used", "opened"] + list(METRICS.values())
+
+RANK_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS {RANK_TABLE} (
+        trade_id INTEGER PRIMARY KEY,
+        account_id TEXT NOT NULL,
+        strategy TEXT,
+        opened_date TEXT,
+        {", ".join(f"{metric} REAL" for metric in METRICS)}
+    )
+"""
+
+RANK_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS idx_{RANK_TABLE}_{metric} ON {RANK_TABLE}(account_id, {metric})"
+    for metric in METRICS
+]
+
+FIELDS = [
+    "id", "account_id", "filename", "opened", "closed", "strategy_used",
+    "profit_loss", "pips_gained_lost", "risk_reward", "value",
+]
+
+
+def _values(row):
+    return [
+        f"{row}.id",
+        f"{row}.account_id",
+        f"{row}.strategy_used",
+        _OPENED_DATE.format(row=row),
+    ] + [_NUMERIC.format(value=f"{row}.{column}") for column in METRICS.values()]
+
+
+_COLUMNS = ["trade_id", "account_id", "strategy", "opened_date"] + list(METRICS)
+
+
+def _add(row):
+    return f"INSERT OR REPLACE INTO {RANK_TABLE} ({', '.join(_COLUMNS)}) VALUES ({', '.join(_values(row))});"
+
+
+def _remove(row):
+    return f"DELETE FROM {RANK_TABLE} WHERE trade_id = {row}.id;"
+
+
+RANK_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trade_ranks_insert AFTER INSERT ON trades BEGIN
+        {_add("new")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trade_ranks_delete AFTER DELETE ON trades BEGIN
+        {_remove("old")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trade_ranks_update AFTER UPDATE OF {", ".join(SOURCE_COLUMNS)} ON trades BEGIN
+        {_remove("old")}
+        {_add("new")}
+    END
+    """,
+]
+
+# DuckDB scans columns fast enough to rank without the precomputed table
+DUCKDB_VIEW = (
+    f"CREATE OR REPLACE VIEW {RANK_TABLE} AS SELECT id AS trade_id, account_id, strategy_used AS strategy, "
+    f"{_OPENED_DATE.format(row='trades')} AS opened_date, "
+    + ", ".join(f"TRY_CAST({column} AS DOUBLE) AS {metric}" for metric, column in METRICS.items())
+    + " FROM trades"
+)
+
+
+def ensure_schema(cursor):
+    """
+    Create the leaderboard table, its indexes and triggers, filling it from the existing
+    trades the first time.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (RANK_TABLE,))
+    created = cursor.fetchone() is None
+    cursor.execute(RANK_SCHEMA)
+    for index in RANK_INDEXES:
+        cursor.execute(index)
+    for trigger in RANK_TRIGGERS:
+        cursor.execute(trigger)
+    if created:
+        rebuild(cursor)
+
+
+def rebuild(cursor):
+    """
+    Recompute the leaderboard table from the trades table.
+    """
+    cursor.execute(f"DELETE FROM {RANK_TABLE}")
+    cursor.execute(
+        f"INSERT INTO {RANK_TABLE} ({', '.join(_COLUMNS)}) SELECT {', '.join(_values('t'))} FROM trades t"
+    )
+
+
+def _filters(value, account, strategy, opened_date, account_id, strategy_name, date_from, date_to):
+    where, params = [f"{value} IS NOT NULL"], []
+    for column, operator, param in (
+        (account, "=", account_id),
+        (strategy, "=", strategy_name),
+        (opened_date, ">=", date_from),
+        (opened_date, "<=", date_to),
+    ):
+        if param is not None:
+            where.append(f"{column} {operator} ?")
+            params.append(str(param))
+    return " AND ".join(where), params
+
+
+def top_query(metric="pnl", best=True, k=5, account_id=None, strategy=None, date_from=None, date_to=None):
+    """
+    Build the SQL returning the K best (or worst) trades by `metric`, optionally for one
+    account and strategy and within an inclusive 'yyyy-mm-dd' date window. Ties are broken
+    by trade id, newest first for the best trades. Returns (sql, params, fields).
+    Raises ValueError for an unknown metric.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'. Use: {', '.join(METRICS)}")
+    k = min(max(int(k), 1), MAX_K)
+    direction = "DESC" if best else "ASC"
+    where, params = _filters(
+        f"r.{metric}", "r.account_id", "r.strategy", "r.opened_date",
+        account_id, strategy, date_from, date_to
+    )
+    sql = f"""
+        SELECT t.id, t.account_id, t.filename, t.opened, t.closed, t.strategy_used,
+               t.profit_loss, t.pips_gained_lost, t.risk_reward, ranked.{metric} AS value
+        FROM (
+            SELECT r.trade_id, r.account_id, r.{metric}
+            FROM {RANK_TABLE} r
+            WHERE {where}
+            ORDER BY r.{metric} {direction}, r.trade_id {direction}
+            LIMIT ?
+        ) ranked
+        JOIN trades t ON t.id = ranked.trade_id AND t.account_id = ranked.account_id
+        ORDER BY ranked.{metric} {direction}, ranked.trade_id {direction}
+    """
+    return sql, params + [k], list(FIELDS)
+
+
+def brute_force_query(metric="pnl", best=True, k=5, account_id=None, strategy=None, date_from=None, date_to=None):
+    """
+    The same leaderboard computed from the trades table alone, used to check trade_ranks.
+    """
+    k = min(max(int(k), 1), MAX_K)
+    direction = "DESC" if best else "ASC"
+    value = _NUMERIC.format(value=f"t.{METRICS[metric]}")
+    where, params = _filters(
+        value, "t.account_id", "t.strategy_used", _OPENED_DATE.format(row="t"),
+        account_id, strategy, date_from, date_to
+    )
+    sql = f"""
+        SELECT t.id, t.account_id, t.filename, t.opened, t.closed, t.strategy_used,
+               t.profit_loss, t.pips_gained_lost, t.risk_reward, {value} AS value
+        FROM trades t
+        WHERE {where}
+        ORDER BY value {direction}, t.id {direction}
+        LIMIT ?
+    """
+    return sql, params + [k]
+
+
+def verify(cursor, k=10):
+    """
+    Compare every leaderboard (each account and metric, best and worst, with and without
+    a strategy filter and a date window) with the brute-force query over trades.
+    Returns the list of mismatches, empty when trade_ranks is consistent.
+    """
+    problems = []
+    cursor.execute(f"SELECT COUNT(*) FROM {RANK_TABLE}")
+    ranked = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM trades")
+    if ranked != cursor.fetchone()[0]:
+        problems.append(f"{RANK_TABLE} has {ranked} row(s) for a different number of trades")
+
+    cursor.execute("SELECT DISTINCT account_id FROM trades")
+    for (account_id,) in cursor.fetchall():
+        cursor.execute(
+            "SELECT strategy_used, MIN(opened_date), MAX(opened_date) FROM trades t "
+            f"JOIN {RANK_TABLE} r ON r.trade_id = t.id WHERE t.account_id = ? "
+            "GROUP BY strategy_used ORDER BY COUNT(*) DESC LIMIT 1",
+            (account_id,)
+        )
+        strategy, first, last = cursor.fetchone() or (None, None, None)
+        cases = [{}, {"strategy": strategy}]
+        if first:
+            # The first calendar year of the account's trades
+            cases.append({"date_from": first, "date_to": f"{first[:4]}-12-31"})
+        for metric in METRICS:
+            for best in (True, False):
+                for filters in cases:
+                    fast = cursor.execute(*top_query(metric, best, k, account_id, **filters)[:2]).fetchall()
+                    slow = cursor.execute(*brute_force_query(metric, best, k, account_id, **filters)).fetchall()
+                    if fast != slow:
+                        problems.append(
+                            f"account {account_id}, {'best' if best else 'worst'} {metric} {filters}: "
+                            f"{[row[0] for row in fast]} != {[row[0] for row in slow]}"
+                        )
+    return problems
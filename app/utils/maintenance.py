@@ -0,0 +1,360 @@
+"""
+Online maintenance for trades.db: hot snapshots, compaction, planner statistics and
+integrity checks.
+
+Every task works on a live database. Snapshots copy a few pages at a time with the
+online backup API, compaction either writes a vacuumed copy (VACUUM INTO) or frees
+pages in small incremental-vacuum steps, so the stats API keeps answering meanwhile.
+
+Run a task once with `python -m utils.maintenance <task>` from the app directory, or let
+the launcher schedule them (TRADESTAT_MAINTENANCE, see schedule_from_env).
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from utils import cube, leaderboard, storage
+from utils.config import DATA_DIR, DB_NAME
+
+BACKUP_DIR = os.path.join(DATA_DIR, "backups")
+STATE_FILE = os.path.join(DATA_DIR, "maintenance.json")
+# Number of snapshots kept in BACKUP_DIR, older ones are removed
+BACKUP_KEEP = int(os.environ.get("TRADESTAT_BACKUP_KEEP", "7"))
+# Pages copied or freed per step, and the pause between steps
+STEP_PAGES = 256
+STEP_PAUSE = 0.01
+BUSY_TIMEOUT = 30
+
+# Default schedule, in hours between runs
+DEFAULT_SCHEDULE = "snapshot=24,analyze=24,incremental_vacuum=6,integrity_check=168"
+
+
+def _connect(db_name):
+    return sqlite3.connect(db_name, timeout=BUSY_TIMEOUT)
+
+
+def _timestamp():
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def _stem(db_name):
+    # "trades" for the main database, "account_<id>" or "group_<n>" for shards
+    return os.path.splitext(os.path.basename(db_name))[0]
+
+
+def storage_report(db_name=DB_NAME):
+    """
+    Return the page counts of the database and how much of it is free space.
+    """
+    conn = _connect(db_name)
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    finally:
+        conn.close()
+    return {
+        "size_bytes": page_size * page_count,
+        "free_bytes": page_size * freelist,
+        "free_ratio": round(freelist / page_count, 4) if page_count else 0.0,
+        "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(auto_vacuum, auto_vacuum),
+        "journal_mode": journal_mode,
+    }
+
+
+def snapshot(db_name=DB_NAME, destination=None, keep=BACKUP_KEEP):
+    """
+    Copy the live database with the online backup API, a few pages per step so readers
+    and writers are never blocked for long. Returns the snapshot path.
+    """
+    if destination is None:
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        destination = os.path.join(BACKUP_DIR, f"{_stem(db_name)}_{_timestamp()}.db")
+    partial = destination + ".part"
+
+    source = _connect(db_name)
+    target = sqlite3.connect(partial)
+    try:
+        source.backup(target, pages=STEP_PAGES, sleep=STEP_PAUSE)
+    finally:
+        target.close()
+        source.close()
+    os.replace(partial, destination)
+
+    if keep and os.path.dirname(os.path.abspath(destination)) == os.path.abspath(BACKUP_DIR):
+        prune_snapshots(keep, _stem(db_name))
+    return destination
+
+
+def prune_snapshots(keep=BACKUP_KEEP, stem="trades"):
+    """
+    Remove all but the newest `keep` snapshots (and compacted copies) of a database in BACKUP_DIR.
+    """
+    pattern = re.compile(rf"^{re.escape(stem)}_\d{{8}}_\d{{6}}(_compact)?\.db$")
+    try:
+        names = sorted(name for name in os.listdir(BACKUP_DIR) if pattern.match(name))
+    except FileNotFoundError:
+        return []
+    removed = names[:-keep] if keep else []
+    for name in removed:
+        os.remove(os.path.join(BACKUP_DIR, name))
+    return removed
+
+
+def vacuum_into(db_name=DB_NAME, destination=None):
+    """
+    Write a compacted, defragmented copy of the database with VACUUM INTO. It only reads
+    the live file, so the copy can be inspected and swapped in while the services are stopped.
+    """
+    if destination is None:
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        destination = os.path.join(BACKUP_DIR, f"{_stem(db_name)}_{_timestamp()}_compact.db")
+    if os.path.exists(destination):
+        raise FileExistsError(destination)
+    conn = _connect(db_name)
+    try:
+        conn.execute("VACUUM INTO ?", (destination,))
+    finally:
+        conn.close()
+    return destination
+
+
+def incremental_vacuum(db_name=DB_NAME, max_pages=None):
+    """
+    Return free pages to the file system in small steps, each its own short write
+    transaction. Needs auto_vacuum=INCREMENTAL (see enable_incremental_vacuum).
+    Returns the number of pages freed.
+    """
+    conn = _connect(db_name)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            print("Incremental vacuum is not enabled for this database; run enable_incremental_vacuum once.")
+            return 0
+        start = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        target = 0 if max_pages is None else max(0, start - max_pages)
+        free = start
+        while free > target:
+            # executescript steps the pragma to completion: execute() would free a single page
+            conn.executescript(f"PRAGMA incremental_vacuum({min(STEP_PAGES, free - target)})")
+            remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if remaining >= free:
+                break
+            free = remaining
+            time.sleep(STEP_PAUSE)
+        return start - free
+    finally:
+        conn.close()
+
+
+def enable_incremental_vacuum(db_name=DB_NAME):
+    """
+    Switch the database to auto_vacuum=INCREMENTAL. This requires one full VACUUM, which
+    locks the database while it runs, so do it during a quiet moment.
+    """
+    conn = _connect(db_name)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def analyze(db_name=DB_NAME):
+    """
+    Refresh the query planner statistics. analysis_limit bounds the rows sampled per
+    index, keeping the run short on large databases.
+    """
+    conn = _connect(db_name)
+    try:
+        conn.execute("PRAGMA analysis_limit = 1000")
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def integrity_check(db_name=DB_NAME, quick=False):
+    """
+    Run PRAGMA integrity_check (or quick_check) and return the list of problems found.
+    """
+    conn = _connect(db_name)
+    try:
+        pragma = "quick_check" if quick else "integrity_check"
+        rows = [row[0] for row in conn.execute(f"PRAGMA {pragma}").fetchall()]
+    finally:
+        conn.close()
+    return [] if rows == ["ok"] else rows
+
+
+def rebuild_cube(db_name=DB_NAME):
+    """
+    Recompute the analytics cube from the trades table. Triggers keep it current, so
+    this is only needed after the database was edited with the triggers missing.
+    """
+    conn = _connect(db_name)
+    try:
+        cube.rebuild(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def check_cube(db_name=DB_NAME):
+    """
+    Compare the analytics cube with the same cells computed from the trades table and
+    return the list of mismatches.
+    """
+    conn = _connect(db_name)
+    try:
+        return cube.verify(conn.cursor())
+    finally:
+        conn.close()
+
+
+def rebuild_leaderboards(db_name=DB_NAME):
+    """
+    Recompute the best/worst trade leaderboards from the trades table.
+    """
+    conn = _connect(db_name)
+    try:
+        leaderboard.rebuild(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def check_leaderboards(db_name=DB_NAME):
+    """
+    Compare the leaderboards with the same rankings computed from the trades table and
+    return the list of mismatches.
+    """
+    conn = _connect(db_name)
+    try:
+        return leaderboard.verify(conn.cursor())
+    finally:
+        conn.close()
+
+
+TASKS = {
+    "snapshot": snapshot,
+    "vacuum_into": vacuum_into,
+    "incremental_vacuum": incremental_vacuum,
+    "enable_incremental_vacuum": enable_incremental_vacuum,
+    "analyze": analyze,
+    "integrity_check": integrity_check,
+    "rebuild_cube": rebuild_cube,
+    "check_cube": check_cube,
+    "rebuild_leaderboards": rebuild_leaderboards,
+    "check_leaderboards": check_leaderboards,
+}
+
+
+def run_task(name, db_name=DB_NAME):
+    """
+    Run a maintenance task by name, print a one-line result and return it.
+    """
+    start = time.perf_counter()
+    result = TASKS[name](db_name)
+    elapsed = time.perf_counter() - start
+    if name in ("integrity_check", "check_cube", "check_leaderboards"):
+        message = "ok" if not result else f"{len(result)} problem(s): {'; '.join(result[:5])}"
+    elif name == "incremental_vacuum":
+        message = f"{result} page(s) freed"
+    else:
+        message = result or "done"
+    print(f"[maintenance] {name} ({_stem(db_name)}): {message} ({elapsed:.1f}s)")
+    return result
+
+
+def schedule_from_env():
+    """
+    Parse TRADESTAT_MAINTENANCE ("task=hours,...", "off" to disable) into {task: seconds}.
+    """
+    raw = os.environ.get("TRADESTAT_MAINTENANCE", DEFAULT_SCHEDULE).strip()
+    if raw.lower() in ("", "off", "none", "0"):
+        return {}
+    schedule = {}
+    for item in raw.split(","):
+        name, _, hours = item.partition("=")
+        name = name.strip()
+        # Enabling incremental vacuum locks the database, so it is never scheduled
+        if name not in TASKS or name == "enable_incremental_vacuum":
+            print(f"Maintenance task '{name}' cannot be scheduled, ignoring it.")
+            continue
+        try:
+            interval = float(hours or 24)
+        except ValueError:
+            interval = 0
+        if interval <= 0:
+            print(f"Invalid interval '{hours.strip()}' for maintenance task '{name}', ignoring it.")
+            continue
+        schedule[name] = interval * 3600
+    return schedule
+
+
+class Scheduler(threading.Thread):
+    """
+    Background thread running maintenance tasks at fixed intervals, on the main database
+    and on every account shard. The time of the last run of each task is kept in
+    STATE_FILE, so restarts do not re-run everything at once.
+    """
+
+    def __init__(self, schedule, db_name=DB_NAME, check_interval=60):
+        super().__init__(name="maintenance-scheduler", daemon=True)
+        self.schedule = schedule
+        self.db_name = db_name
+        self.check_interval = check_interval
+        self._stopping = threading.Event()
+
+    def _load_state(self):
+        try:
+            with open(STATE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        with open(STATE_FILE, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+
+    def run(self):
+        while not self._stopping.is_set():
+            state = self._load_state()
+            for name, interval in self.schedule.items():
+                if self._stopping.is_set():
+                    break
+                if time.time() - state.get(name, 0) < interval or not os.path.exists(self.db_name):
+                    continue
+                for db_name in storage.get_storage(self.db_name).databases():
+                    try:
+                        run_task(name, db_name)
+                    except Exception as e:
+                        print(f"Error running maintenance task '{name}' on '{db_name}': {e}")
+                state[name] = time.time()
+                self._save_state(state)
+            self._stopping.wait(self.check_interval)
+
+    def stop(self):
+        self._stopping.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a trades.db maintenance task.")
+    parser.add_argument("task", choices=sorted(TASKS) + ["report"])
+    parser.add_argument("--db", default=DB_NAME, help="Database file (defaults to the configured trades.db)")
+    args = parser.parse_args()
+    if args.task == "report":
+        print(json.dumps(storage_report(args.db), indent=2))
+    else:
+        run_task(args.task, args.db)
+
+
+if __name__ == "__main__":
+    main()
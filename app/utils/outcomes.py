@@ -0,0 +1,159 @@
+"""
+Trade outcomes (Win, Loss, Break-even, Unknown), computed in SQL from the stored P/L.
+
+A trade is a win when its P/L is above the account's break-even threshold, a loss when
+it is below minus the threshold and break-even in between (both bounds included).
+Trades without a numeric P/L ('#' or anything else) are Unknown. A trade whose P/L is
+not converted yet for lack of an FX rate (profit_loss NULL, see utils/fx.py) is
+classified from the amount as written (profit_loss_original). The threshold is set
+per account in the break_even_thresholds table (DEFAULT_THRESHOLD when unset), which
+lives next to the trades in every trades database so the cube triggers can read it.
+Nothing stored per trade depends on it: changing it rebuilds the account's cube cells
+and every other statistic follows on its next query.
+
+Usage (from app/):
+    python -m utils.outcomes show
+    python -m utils.outcomes set ACCOUNT_ID THRESHOLD
+    python -m utils.outcomes reset ACCOUNT_ID
+"""
+import argparse
+
+DEFAULT_THRESHOLD = 0.5
+OUTCOMES = ["Win", "Break-even", "Loss"]
+
+THRESHOLD_TABLE = "break_even_thresholds"
+
+THRESHOLD_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS {THRESHOLD_TABLE} (
+        account_id TEXT PRIMARY KEY,
+        threshold REAL NOT NULL
+    )
+"""
+
+
+def ensure_schema(cursor):
+    """
+    Create the per-account threshold table.
+    """
+    cursor.execute(THRESHOLD_SCHEMA)
+
+
+def lookup(row="trades"):
+    """
+    SQL looking up the threshold of the account of `row` for every row (triggers,
+    queries over several accounts).
+    """
+    return (
+        f"COALESCE((SELECT b.threshold FROM {THRESHOLD_TABLE} b "
+        f"WHERE b.account_id = {row}.account_id), {DEFAULT_THRESHOLD!r})"
+    )
+
+
+def expression(row=None, threshold=None):
+    """
+    SQL expression giving the outcome of a trade. `row` qualifies the columns (a table
+    alias, None for bare names). `threshold` is a number (per-account queries read it
+    once with threshold_query), an SQL expression, or None to look it up per row.
+    Only portable SQL: it runs on SQLite and on the DuckDB copy.
+    """
+    prefix = f"{row}." if row else ""
+    if threshold is None:
+        threshold = lookup(row or "trades")
+    elif isinstance(threshold, (int, float)):
+        threshold = repr(float(threshold))
+    amount = pnl_as_written(row)
+    # A digit and nothing but digits, signs and dots: '#' and any other text are not a
+    # result. TRIM rather than a negated GLOB class, which the two engines spell differently.
+    numeric = f"{amount} GLOB '*[0-9]*' AND TRIM({amount}, '0123456789.+-') = ''"
+    value = f"CAST({amount} AS DOUBLE)"
+    return (
+        f"CASE WHEN {numeric} THEN CASE WHEN ABS({value}) <= {threshold} THEN 'Break-even' "
+        f"WHEN {value} > 0 THEN 'Win' ELSE 'Loss' END ELSE 'Unknown' END"
+    )
+
+
+def pnl_as_written(row=None):
+    """
+    SQL giving the P/L of a trade in the base currency, or as written in the note while
+    no FX rate converts it. Only for outcomes and filters: sums use profit_loss alone.
+    """
+    prefix = f"{row}." if row else ""
+    return f"COALESCE({prefix}profit_loss, {prefix}profit_loss_original)"
+
+
+def threshold_query(account_id):
+    """
+    (sql, params) reading the threshold of one account: a single row, or none when unset.
+    """
+    return f"SELECT threshold FROM {THRESHOLD_TABLE} WHERE account_id = ?", (str(account_id),)
+
+
+def threshold_of(rows):
+    """
+    The threshold from the rows of threshold_query, DEFAULT_THRESHOLD when unset.
+    """
+    return rows[0][0] if rows else DEFAULT_THRESHOLD
+
+
+def set_threshold(store, account_id, threshold):
+    """
+    Set (or with None, reset) the break-even threshold of an account and rebuild its
+    cube cells, whose outcome and win counts depend on it, in the same transaction.
+    """
+    from utils import cube
+
+    account_id = str(account_id)
+    if threshold is not None:
+        threshold = float(threshold)
+        if threshold < 0:
+            raise ValueError("The break-even threshold cannot be negative")
+    with store.transaction(account_id) as conn:
+        cursor = conn.cursor()
+        if threshold is None:
+            cursor.execute(f"DELETE FROM {THRESHOLD_TABLE} WHERE account_id = ?", (account_id,))
+        else:
+            cursor.execute(
+                f"INSERT INTO {THRESHOLD_TABLE} (account_id, threshold) VALUES (?, ?) "
+                f"ON CONFLICT (account_id) DO UPDATE SET threshold = excluded.threshold",
+                (account_id, threshold)
+            )
+        cube.rebuild(cursor, account_id)
+
+
+def main():
+    from utils import storage
+    from utils.config import DB_NAME
+
+    parser = argparse.ArgumentParser(description="Show or set the break-even threshold of accounts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("show", help="List the accounts with their threshold")
+    set_command = commands.add_parser("set", help="Set the threshold of an account")
+    set_command.add_argument("account", help="Account id")
+    set_command.add_argument("threshold", type=float, help="Largest absolute P/L still counted as break-even")
+    reset_command = commands.add_parser("reset", help=f"Go back to the default threshold ({DEFAULT_THRESHOLD})")
+    reset_command.add_argument("account", help="Account id")
+    parser.add_argument("--db", default=DB_NAME, help="Database file (defaults to the configured trades.db)")
+    args = parser.parse_args()
+
+    store = storage.get_storage(args.db, engine="sqlite")
+    if args.command == "show":
+        accounts = store.query("SELECT id, name FROM accounts ORDER BY id")
+        for account_id, name in accounts:
+            rows = store.analytics(*threshold_query(account_id), account_id=str(account_id))
+            value = threshold_of(rows)
+            print(f"{account_id:>4}  {str(name)[:32]:<32} {value:g}{'' if rows else ' (default)'}")
+        if not accounts:
+            print("No accounts found in the database.")
+        return
+
+    try:
+        set_threshold(store, args.account, args.threshold if args.command == "set" else None)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    value = args.threshold if args.command == "set" else DEFAULT_THRESHOLD
+    print(f"Account {args.account}: trades within ±{value:g} of zero are break-even.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Parser of journal notes written with the markdown template.
+
+Shared by the web importer and the re-parse pipeline (utils/reparse.py), which runs it
+in worker processes, so it only depends on the standard library and utils.
+"""
+import re
+from datetime import datetime
+
+from utils import fx
+from utils.killzones import determine_killzone
+
+# Bump whenever a change to parse_markdown_content alters what is stored for an existing
+# note. Every trade records the version it was parsed with, and
+# `python -m utils.reparse run` re-parses the archived notes of older rows.
+#   1  first versioned parser (trades imported before versions were recorded have NULL)
+#   2  decimal pips ("Pips Gained/Lost: 12.5" was stored as 12)
+PARSER_VERSION = 2
+
+# Fields of a parsed note stored in the trades table (empty when the note lacks them)
+TRADE_FIELDS = [
+    "position_size", "opened", "closed", "pips_gained_lost",
+    "profit_loss", "risk_reward", "strategy_used", "open_day",
+    "open_time", "open_month",
+    "trade_duration_minutes", "killzone", "time_writing", "instrument", "currency", "filename",
+    "parser_version",
+]
+
+
+# Parse the text of a Markdown note
+def parse_markdown_content(content, filename):
+    trade_entry = {}
+    try:
+        # Define regex patterns for each field
+        fields = {
+            "instrument": r"Instrument:[ \t]*[\*_~]*([^\n\*_~]+)[\*_~]*",
+            "position_size": r"Position\s*Size:\s*[\*_~]*([\d\.]+)[\*_~]*",
+            "opened": r"Opened:\s*[\*_~]*(\d{2}/\d{2}/\d{4} \d{2}:\d{2})[\*_~]*",
+            "closed": r"Closed:\s*[\*_~]*(\d{2}/\d{2}/\d{4} \d{2}:\d{2})[\*_~]*",
+            "pips_gained_lost": r"Pips\s*Gained/Lost:\s*[\*_~]*([+-]?\d+(?:\.\d+)?)[\*_~]*",
+            "profit_loss": r"Profit/Loss:\s*[\*_~]*([+-]?\d+(?:\.\d+)?[€$])[\*_~]*",
+            "risk_reward": r"R/R:\s*[\*_~]*([\d\.]+)[\*_~]*",
+            "strategy_used": r"Strategy\s*[Uu]sed:\s*[\*_~]*([^\n\*_~]+)[\*_~]*",
+        }
+
+        for key, pattern in fields.items():
+            match = re.search(pattern, content, re.IGNORECASE)
+            if match:
+                trade_entry[key] = match.group(1).strip()
+
+        # Extract the first occurrence of the time of writing
+        time_writing_match = re.search(r"Time writing:\s*(\d{2}:\d{2}) (\d{2}/\d{2}/\d{4})", content)
+        if time_writing_match:
+            raw_time = f"{time_writing_match.group(2)} {time_writing_match.group(1)}"
+            # Parse into datetime and reformat as the other dates
+            dt = datetime.strptime(raw_time, "%d/%m/%Y %H:%M")
+            formatted_time_writing = dt.strftime("%d/%m/%Y %H:%M")
+            trade_entry["time_writing"] = formatted_time_writing
+
+        # Parse opened and closed timestamps
+        raw_opened = trade_entry.get("opened", "").strip()
+        raw_closed = trade_entry.get("closed", "").strip()
+        if raw_opened and raw_closed:
+            try:
+                opened_time = datetime.strptime(raw_opened, "%d/%m/%Y %H:%M")
+                closed_time = datetime.strptime(raw_closed, "%d/%m/%Y %H:%M")
+                trade_entry["trade_duration_minutes"] = max(0, (closed_time - opened_time).total_seconds() // 60)
+                trade_entry["open_day"] = opened_time.strftime("%A")
+                trade_entry["open_time"] = opened_time.strftime("%H:%M")
+                trade_entry["open_month"] = opened_time.strftime("%B")
+                trade_entry["killzone"] = determine_killzone(raw_opened, trade_entry.get("instrument"))
+            except ValueError as e:
+                print(f"Error parsing dates in file '{filename}': {e}")
+                return None
+
+        # Currency the P/L is written in, converted to the account's base currency on insert
+        currency = fx.currency_of(trade_entry.get("profit_loss", "")[-1:])
+        if currency:
+            trade_entry["currency"] = currency
+
+        # Keep the P/L as a plain number when it is one; the outcome (win, loss or
+        # break-even) is computed from it in SQL, see utils/outcomes.py
+        profit_loss_cleaned = re.sub(r"[^\d\.\-\+]", "", trade_entry.get("profit_loss", ""))
+        try:
+            float(profit_loss_cleaned)
+            trade_entry["profit_loss"] = profit_loss_cleaned
+        except ValueError:
+            pass
+
+        trade_entry["filename"] = filename
+        trade_entry["parser_version"] = PARSER_VERSION
+
+    except Exception as e:
+        print(f"Error parsing file '{filename}': {e}")
+        return None
+
+    return trade_entry
@@ -0,0 +1,221 @@
+"""
+Re-parse pipeline: bring stored trades up to date with the current note parser.
+
+Every trade records the version of the parser it was imported with (parser_version,
+see utils/parser.py). After the parser changes, `run` finds the trades parsed by an
+older version, re-parses their original notes from the upload archive
+(uploads/Account_<id>/<hash[:2]>/<hash>.md, or the note text stored with the trade when
+the file is gone) in worker processes and writes only the columns whose value changed.
+
+Trades are processed in chunks, one transaction each, and every trade written gets the
+current version, so an interrupted run continues where it stopped when started again.
+Trades whose note is missing or no longer parses keep their version and are reported.
+
+Usage (from app/):
+    python -m utils.reparse status
+    python -m utils.reparse run [--account ID] [--workers N] [--dry-run]
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import fx
+from utils.config import DB_NAME, UPLOAD_DIR
+from utils.parser import PARSER_VERSION, TRADE_FIELDS, parse_markdown_content
+
+# Columns rewritten from a re-parsed note; the filename identifies the note and stays
+PARSED_COLUMNS = [
+    field for field in TRADE_FIELDS if field not in ("filename", "parser_version")
+] + ["profit_loss_original", "fx_rate"]
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+CHUNK_SIZE = 500
+
+
+def archive_path(content_hash, account_id):
+    """
+    Archive path of an imported note, addressed by the hash of its content.
+    """
+    return os.path.join(UPLOAD_DIR, f"Account_{account_id}", content_hash[:2], f"{content_hash}.md")
+
+
+def _parse_note(task):
+    """
+    Parse one note in a worker: (trade_id, path, text, filename) -> (trade_id, fields, problem).
+    The archived file is read when there is one, the stored text otherwise.
+    """
+    trade_id, path, text, filename = task
+    if path is not None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError):
+            pass
+    if not text:
+        return trade_id, None, "missing"
+    trade = parse_markdown_content(text, filename)
+    if not trade:
+        return trade_id, None, "failed"
+    return trade_id, {field: trade.get(field, "") for field in TRADE_FIELDS}, None
+
+
+def _same(stored, parsed):
+    # Rows inserted outside the importer hold NULL where the importer writes ''
+    return (stored if stored is not None else "") == (parsed if parsed is not None else "")
+
+
+def stale(db_name=DB_NAME, account_id=None, version=PARSER_VERSION):
+    """
+    Number of trades parsed by a version older than `version`, as [(version, count)]
+    (None for trades imported before versions were recorded).
+    """
+    query = "SELECT parser_version, COUNT(*) FROM trades WHERE (parser_version IS NULL OR parser_version < ?)"
+    params = [version]
+    if account_id is not None:
+        query += " AND account_id = ?"
+        params.append(account_id)
+    conn = sqlite3.connect(db_name)
+    try:
+        return conn.execute(query + " GROUP BY parser_version ORDER BY parser_version", params).fetchall()
+    finally:
+        conn.close()
+
+
+def reparse(db_name=DB_NAME, account_id=None, converter=None, workers=DEFAULT_WORKERS,
+            chunk_size=CHUNK_SIZE, dry_run=False, on_chunk=None):
+    """
+    Re-parse the trades of a database file whose parser_version is older than the current
+    one and apply the differences. `converter` (an fx.Converter on the main database)
+    converts re-parsed P/L into the account's base currency. With dry_run nothing is
+    written. Returns counts: scanned, updated (trades with a changed value), missing,
+    failed, and changes per column. on_chunk(scanned, updated) is called after each chunk.
+    """
+    converter = converter or fx.Converter(db_name)
+    stats = {"scanned": 0, "updated": 0, "missing": 0, "failed": 0, "columns": {}}
+    executor = None
+    if workers > 1:
+        # Spawned workers only import the parser, never the state of a running service
+        executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    conn = sqlite3.connect(db_name)
+    try:
+        cursor = conn.cursor()
+        last_id = 0
+        while True:
+            query = f"""
+                SELECT id, account_id, filename, content_hash, {', '.join(PARSED_COLUMNS)}
+                FROM trades WHERE (parser_version IS NULL OR parser_version < ?) AND id > ?
+            """
+            params = [PARSER_VERSION, last_id]
+            if account_id is not None:
+                query += " AND account_id = ?"
+                params.append(account_id)
+            query += " ORDER BY id LIMIT ?"
+            params.append(chunk_size)
+
+            rows = cursor.execute(query, params).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            # Notes whose archived file is gone are re-parsed from the text stored with the trade
+            paths = {}
+            for trade_id, trade_account, _, content_hash, *_ in rows:
+                path = archive_path(content_hash, trade_account) if content_hash else None
+                paths[trade_id] = path if path and os.path.exists(path) else None
+            missing = [trade_id for trade_id, path in paths.items() if path is None]
+            texts = {}
+            if missing:
+                texts = dict(cursor.execute(
+                    f"SELECT id, notes FROM trades WHERE id IN ({', '.join('?' for _ in missing)})", missing
+                ).fetchall())
+            tasks = [(row[0], paths[row[0]], texts.get(row[0]), row[2]) for row in rows]
+            if executor is not None:
+                results = executor.map(_parse_note, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+            else:
+                results = map(_parse_note, tasks)
+
+            # One executemany per set of changed columns; unchanged trades only get the version
+            updates = {}
+            stored = {row[0]: row for row in rows}
+            for trade_id, parsed, problem in results:
+                if problem is not None:
+                    stats[problem] += 1
+                    continue
+                row = stored[trade_id]
+                parsed = converter.normalize(parsed, row[1])
+                changed = [
+                    column for column, value in zip(PARSED_COLUMNS, row[4:])
+                    if not _same(value, parsed.get(column))
+                ]
+                for column in changed:
+                    stats["columns"][column] = stats["columns"].get(column, 0) + 1
+                if changed:
+                    stats["updated"] += 1
+                updates.setdefault(tuple(changed), []).append(
+                    [parsed.get(column) for column in changed] + [PARSER_VERSION, trade_id]
+                )
+            if updates and not dry_run:
+                for columns, values in updates.items():
+                    assignments = ", ".join(f"{column} = ?" for column in columns + ("parser_version",))
+                    cursor.executemany(f"UPDATE trades SET {assignments} WHERE id = ?", values)
+                conn.commit()
+            stats["scanned"] += len(rows)
+            if on_chunk is not None:
+                on_chunk(stats["scanned"], stats["updated"])
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return stats
+
+
+def main():
+    from utils import storage
+
+    parser = argparse.ArgumentParser(description="Re-parse trades imported by an older version of the note parser.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Count trades parsed by an older parser version")
+    run = commands.add_parser("run", help="Re-parse their archived notes and update the changed columns")
+    run.add_argument("--account", default=None, help="Only this account id")
+    run.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Parser processes (1 parses in-process)")
+    run.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Trades per transaction")
+    run.add_argument("--dry-run", action="store_true", help="Report the changes without writing them")
+    parser.add_argument("--db", default=DB_NAME, help="Database file (defaults to the configured trades.db)")
+    args = parser.parse_args()
+
+    store = storage.get_storage(args.db, engine="sqlite")
+    if args.command == "status":
+        rows = [row for db_name in store.databases() for row in stale(db_name)]
+        counts = {}
+        for version, count in rows:
+            counts[version] = counts.get(version, 0) + count
+        for version, count in sorted(counts.items(), key=lambda item: item[0] or 0):
+            print(f"Parser version {version if version is not None else 'unknown'}: {count} trade(s)")
+        print(f"All trades are parsed by version {PARSER_VERSION}." if not counts
+              else f"{sum(counts.values())} trade(s) to re-parse with version {PARSER_VERSION}.")
+        return
+
+    converter = fx.Converter(args.db)
+    totals = {"scanned": 0, "updated": 0, "missing": 0, "failed": 0, "columns": {}}
+    for db_name in store.databases(args.account):
+        stats = reparse(db_name, args.account, converter, args.workers, args.chunk_size, args.dry_run)
+        for key in ("scanned", "updated", "missing", "failed"):
+            totals[key] += stats[key]
+        for column, count in stats["columns"].items():
+            totals["columns"][column] = totals["columns"].get(column, 0) + count
+    print(f"{totals['scanned']} trade(s) re-parsed, {totals['updated']} changed"
+          f"{' (dry run, nothing written)' if args.dry_run else ''}.")
+    for column, count in sorted(totals["columns"].items()):
+        print(f"  {column}: {count}")
+    if totals["missing"] or totals["failed"]:
+        print(f"{totals['missing']} trade(s) without a note and {totals['failed']} that no longer parse "
+              "were left unchanged.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Read-only snapshot of trades.db used by the backend for analytics.
+
+The importer writes to the primary database while the stats endpoints read from a copy
+refreshed in the background with the online backup API. Readers open the copy as an
+immutable file, so heavy analytic queries never hold locks on the primary or delay its
+WAL checkpoints, and a long import never stalls the dashboard.
+
+The copy is replaced atomically; its modification time is set to the moment the copy
+started, which is the "as of" time reported to clients. Backend workers share the copy
+and a lock file makes sure only one of them refreshes it at a time.
+"""
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: refreshes are not coordinated between processes
+    fcntl = None
+
+from utils.config import DATA_DIR, DB_NAME
+
+REPLICA_DIR = os.path.join(DATA_DIR, "replica")
+REPLICA_PATH = os.path.join(REPLICA_DIR, "trades.db")
+# Seconds between refreshes; 0 disables the replica and reads go to the primary
+REPLICA_INTERVAL = float(os.environ.get("TRADESTAT_REPLICA_INTERVAL", "30"))
+# Past this lag (e.g. refreshes keep failing) reads fall back to the primary
+REPLICA_MAX_LAG = float(os.environ.get("TRADESTAT_REPLICA_MAX_LAG", str(REPLICA_INTERVAL * 10)))
+
+PRIMARY = "primary"
+REPLICA = "replica"
+
+
+def _primary_mtime(primary):
+    """
+    Last time the primary database changed on disk, including its WAL file.
+    """
+    mtime = 0.0
+    for path in (primary, primary + "-wal"):
+        try:
+            mtime = max(mtime, os.path.getmtime(path))
+        except OSError:
+            pass
+    return mtime
+
+
+class Replica:
+    """
+    A periodically refreshed, read-only copy of the primary database.
+    """
+
+    def __init__(self, primary=DB_NAME, path=REPLICA_PATH, interval=REPLICA_INTERVAL, max_lag=REPLICA_MAX_LAG):
+        self.primary = primary
+        self.path = path
+        self.interval = interval
+        self.max_lag = max_lag
+        self._refreshing = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    def as_of(self):
+        """
+        Time (epoch seconds) of the data in the replica, or None if there is no replica yet.
+        """
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def refresh(self):
+        """
+        Copy the primary into the replica, unless it has not changed since the last copy.
+        Returns True if the replica is up to date afterwards.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lock_file = open(self.path + ".lock", "a")
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # Another worker is refreshing the replica right now
+                    return False
+
+            started = time.time()
+            as_of = self.as_of()
+            if as_of is not None and _primary_mtime(self.primary) < as_of:
+                # Nothing was written since the last copy: the data is current as of now
+                os.utime(self.path, (started, started))
+                return True
+
+            partial = f"{self.path}.{os.getpid()}.part"
+            source = sqlite3.connect(self.primary, timeout=30)
+            target = sqlite3.connect(partial)
+            try:
+                # One step: the copy reads a single consistent snapshot. A stepped copy
+                # would restart every time the importer writes in between steps.
+                source.backup(target, pages=-1)
+            finally:
+                target.close()
+                source.close()
+            os.utime(partial, (started, started))
+            os.replace(partial, self.path)
+            return True
+        except Exception as e:
+            print(f"Error refreshing the analytics replica: {e}")
+            return False
+        finally:
+            lock_file.close()
+
+    def refresh_in_background(self):
+        """
+        Start a refresh on a background thread unless one is already running.
+        """
+        if not self._refreshing.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing.release()
+
+        threading.Thread(target=run, name="replica-refresh", daemon=True).start()
+
+    def choose(self):
+        """
+        Decide where analytics should read from and return (path, source, as_of).
+        A stale replica is still served while a refresh runs in the background.
+        """
+        if not self.enabled:
+            return self.primary, PRIMARY, None
+
+        as_of = self.as_of()
+        lag = None if as_of is None else time.time() - as_of
+        if lag is None or lag >= self.interval:
+            self.refresh_in_background()
+        if lag is None or lag > self.max_lag:
+            return self.primary, PRIMARY, None
+        return self.path, REPLICA, as_of
+
+    def uri(self):
+        # The replica file is only ever replaced, never modified in place, so it can be
+        # opened immutable: no locks, no journal checks
+        return pathlib.Path(self.path).resolve().as_uri() + "?mode=ro&immutable=1"
@@ -0,0 +1,125 @@
+"""
+JSON response layer for the backend: a fast encoder, columnar tables and compression.
+
+- Encoding goes through orjson when it is installed (`pip install orjson`), otherwise
+  through Flask's default encoder. Both produce the same documents.
+- Endpoints returning one object per trade use `table()`. Clients asking for
+  `?format=columnar` get one array per field instead, which avoids repeating every key
+  on every row: {"format": "columnar", "length": n, "data": {field: [...], ...}}.
+- Responses above COMPRESS_MIN_SIZE are compressed with brotli (when the brotli module
+  is installed) or gzip, as negotiated by the client's Accept-Encoding header.
+"""
+import gzip
+import os
+
+from flask import jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COLUMNAR = "columnar"
+# Smaller bodies are sent as they are: compressing them costs more than it saves
+COMPRESS_MIN_SIZE = int(os.environ.get("TRADESTAT_COMPRESS_MIN_SIZE", "1024"))
+# Fast settings: the backend answers the dashboard on every refresh
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider encoding with orjson, keeping the default provider's sorted keys.
+    Falls back to the default encoder for types orjson does not handle the same way.
+    """
+
+    def _orjson(self, obj):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=options)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return self._orjson(obj).decode("utf-8")
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self._app.debug:
+            # Debug mode pretty-prints, which only the default encoder does
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = self._orjson(obj)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def wants_columnar():
+    return request.args.get("format", "").lower() == COLUMNAR
+
+
+def table(fields, rows):
+    """
+    JSON response for a list of rows (tuples in `fields` order): a list of objects by
+    default, one array per field when the client asked for ?format=columnar.
+    """
+    if wants_columnar():
+        columns = list(zip(*rows)) if rows else [() for _ in fields]
+        return jsonify({
+            "format": COLUMNAR,
+            "length": len(rows),
+            "data": {field: list(column) for field, column in zip(fields, columns)},
+        })
+    return jsonify([dict(zip(fields, row)) for row in rows])
+
+
+def compress(response):
+    """
+    Compress a JSON response with the best encoding the client accepts.
+    """
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or not response.is_json
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    encoding = request.accept_encodings.best_match(offered)
+    if encoding == "br":
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return response
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    """
+    Use the fast encoder for jsonify and compress JSON responses of a Flask app.
+    """
+    app.json = FastJSONProvider(app)
+    app.after_request(compress)
+
@@ -0,0 +1,143 @@
+"""
+Full-text search over the markdown notes stored with each trade (SQLite FTS5).
+
+trades_fts is an external-content index over trades.notes: the text is stored once in
+the trades table and triggers keep the index in sync on insert, update and delete.
+"""
+import os
+import re
+import sqlite3
+
+from utils import outcomes
+
+# Index columns: notes first, so snippet() and highlight() refer to column 0
+FTS_TABLE = """
+    CREATE VIRTUAL TABLE trades_fts USING fts5(
+        notes,
+        content='trades',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trades_fts_insert AFTER INSERT ON trades
+    WHEN new.notes IS NOT NULL BEGIN
+        INSERT INTO trades_fts(rowid, notes) VALUES (new.id, new.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trades_fts_delete AFTER DELETE ON trades
+    WHEN old.notes IS NOT NULL BEGIN
+        INSERT INTO trades_fts(trades_fts, rowid, notes) VALUES ('delete', old.id, old.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trades_fts_update AFTER UPDATE OF notes ON trades BEGIN
+        INSERT INTO trades_fts(trades_fts, rowid, notes)
+            SELECT 'delete', old.id, old.notes WHERE old.notes IS NOT NULL;
+        INSERT INTO trades_fts(rowid, notes)
+            SELECT new.id, new.notes WHERE new.notes IS NOT NULL;
+    END
+    """,
+]
+
+# 'dd/mm/yyyy HH:MM' -> 'yyyy-mm-dd', comparable as text
+OPENED_DATE = "substr(t.opened, 7, 4) || '-' || substr(t.opened, 4, 2) || '-' || substr(t.opened, 1, 2)"
+
+TOKEN = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def ensure_schema(cursor):
+    """
+    Create the FTS index and its triggers, indexing existing notes the first time.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trades_fts'")
+    created = cursor.fetchone() is None
+    if created:
+        cursor.execute(FTS_TABLE)
+    for trigger in FTS_TRIGGERS:
+        cursor.execute(trigger)
+    if created:
+        cursor.execute("INSERT INTO trades_fts(trades_fts) VALUES ('rebuild')")
+
+
+def build_match_query(text):
+    """
+    Turn user input into a safe FTS5 query: every word (or "quoted phrase") must match,
+    and a trailing * on a word searches by prefix. FTS5 operators are not interpreted.
+    """
+    terms = []
+    for phrase, word in TOKEN.findall(text or ""):
+        prefix = False
+        if word:
+            prefix = word.endswith("*")
+            phrase = word.rstrip("*")
+        phrase = phrase.replace('"', "").strip()
+        if phrase:
+            terms.append(f'"{phrase}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def search_trades(conn, text, account_id=None, date_from=None, date_to=None,
+                  limit=20, offset=0, start_mark="<mark>", end_mark="</mark>"):
+    """
+    Return trades whose notes match the query, best matches first (bm25), with a
+    highlighted snippet. Dates are 'yyyy-mm-dd' bounds on the opening date, inclusive.
+    """
+    match = build_match_query(text)
+    if not match:
+        return []
+
+    query = f"""
+        SELECT t.id, t.account_id, t.filename, t.opened, t.instrument, t.strategy_used,
+               {outcomes.expression("t")} AS trade_outcome, t.profit_loss,
+               snippet(trades_fts, 0, ?, ?, '…', 16) AS snippet,
+               bm25(trades_fts) AS rank
+        FROM trades_fts
+        JOIN trades t ON t.id = trades_fts.rowid
+        WHERE trades_fts MATCH ?
+    """
+    params = [start_mark, end_mark, match]
+    if account_id is not None:
+        query += " AND t.account_id = ?"
+        params.append(account_id)
+    if date_from:
+        query += f" AND {OPENED_DATE} >= ?"
+        params.append(date_from)
+    if date_to:
+        query += f" AND {OPENED_DATE} <= ?"
+        params.append(date_to)
+    query += " ORDER BY rank LIMIT ? OFFSET ?"
+    params.extend([limit, offset])
+
+    columns = ["id", "account_id", "filename", "opened", "instrument", "strategy_used",
+               "trade_outcome", "profit_loss", "snippet", "rank"]
+    return [dict(zip(columns, row)) for row in conn.execute(query, params).fetchall()]
+
+
+def backfill_notes(db_name, upload_dir):
+    """
+    Store the note text of trades imported before notes were kept, reading it from the
+    content-addressed archive (uploads/Account_<id>/<hash[:2]>/<hash>.md).
+    Returns the number of trades updated.
+    """
+    conn = sqlite3.connect(db_name)
+    updated = 0
+    try:
+        rows = conn.execute(
+            "SELECT id, account_id, content_hash FROM trades WHERE notes IS NULL AND content_hash IS NOT NULL"
+        ).fetchall()
+        for trade_id, account_id, content_hash in rows:
+            path = os.path.join(upload_dir, f"Account_{account_id}", content_hash[:2], f"{content_hash}.md")
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    notes = f.read()
+            except (OSError, UnicodeDecodeError):
+                continue
+            conn.execute("UPDATE trades SET notes = ? WHERE id = ?", (notes, trade_id))
+            updated += 1
+        conn.commit()
+    finally:
+        conn.close()
+    return updated
@@ -0,0 +1,101 @@
+"""
+Running accumulators for per-trade series whose size must not grow with the account.
+
+Endpoints returning one entry per trade read their rows in chunks (storage.stream) and
+feed them to these accumulators, which keep at most `max_points` entries
+(TRADESTAT_MAX_POINTS, 10000 by default). Accounts below the ceiling get every trade;
+larger ones get a series reduced in one pass, without knowing the row count in advance:
+when the buffer fills up, neighbouring entries are merged (or every other one dropped)
+and the stride doubles, so the entries stay evenly spaced over the whole history.
+"""
+import os
+
+MAX_POINTS = int(os.environ.get("TRADESTAT_MAX_POINTS", "10000"))
+
+
+def max_points(requested=None):
+    """
+    Number of points a response may hold: the client's `max_points`, capped by the ceiling.
+    """
+    try:
+        requested = int(requested)
+    except (TypeError, ValueError):
+        return MAX_POINTS
+    return min(max(requested, 2), MAX_POINTS)
+
+
+class EquityCurve:
+    """
+    Cumulative P/L of trades added in date order. Each point is (date, profit_loss,
+    cumulative_pnl, trades, outcome): with stride 1 a point is one trade, otherwise it
+    covers `trades` consecutive trades, with their summed P/L and the date and cumulative
+    P/L of the last one, so the curve stays exact at every point. Only single-trade
+    points keep the outcome given with the trade (None for merged ones).
+    """
+
+    def __init__(self, max_points=MAX_POINTS):
+        self.max_points = max(max_points, 2)
+        self.stride = 1
+        self.total = 0.0
+        self._points = []
+        self._bucket = None
+
+    def add(self, date, profit_loss, outcome=None):
+        self.total += profit_loss
+        if self._bucket is None:
+            self._bucket = [date, 0.0, 0.0, 0, outcome]
+        else:
+            self._bucket[4] = None
+        bucket = self._bucket
+        bucket[0] = date
+        bucket[1] += profit_loss
+        bucket[2] = self.total
+        bucket[3] += 1
+        if bucket[3] >= self.stride:
+            self._points.append(bucket)
+            self._bucket = None
+            if len(self._points) >= self.max_points:
+                self._merge()
+
+    def _merge(self):
+        points = self._points
+        merged = []
+        for first, second in zip(points[0::2], points[1::2]):
+            merged.append([second[0], first[1] + second[1], second[2], first[3] + second[3], None])
+        if len(points) % 2:
+            # Half of a bucket at the new stride: it keeps filling up
+            self._bucket = points[-1]
+        self._points = merged
+        self.stride *= 2
+
+    def points(self):
+        """
+        The points as tuples, including the partly filled last bucket.
+        """
+        points = self._points + ([self._bucket] if self._bucket is not None else [])
+        return [tuple(point) for point in points]
+
+
+class Sample:
+    """
+    Every `stride`-th row added, at most max_points of them. When the sample is full,
+    every other kept row is dropped and the stride doubles.
+    """
+
+    def __init__(self, max_points=MAX_POINTS):
+        self.max_points = max(max_points, 2)
+        self.stride = 1
+        self.rows = []
+        self._seen = 0
+
+    def add(self, row):
+        if self._seen % self.stride == 0:
+            self.rows.append(row)
+            if len(self.rows) >= self.max_points:
+                self.rows = self.rows[::2]
+                self.stride *= 2
+        self._seen += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.add(row)
@@ -0,0 +1,201 @@
+"""
+Production serving mode: each service runs behind waitress in one or more worker
+processes that share a listening socket, supervised by the launcher (POSIX only).
+
+Workers are started as `python -m utils.serving <service> --fd N --threads T` from the
+app directory. They import (preload) the service module before accepting connections.
+"""
+import argparse
+import importlib
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+from utils.config import BACKEND_PORT, DASHBOARD_PORT, IMPORTER_PORT
+
+# Service name -> module, WSGI attribute, port and health endpoint
+SERVICES = {
+    "backend": {"module": "app", "attr": "app", "port": BACKEND_PORT, "health": "/stats/health"},
+    "dashboard": {"module": "dashboard", "attr": "server", "port": DASHBOARD_PORT, "health": "/health"},
+    "importer": {"module": "web_importer", "attr": "app", "port": IMPORTER_PORT, "health": "/health"},
+}
+
+HEALTH_INTERVAL = float(os.environ.get("TRADESTAT_HEALTH_INTERVAL", "10"))
+HEALTH_TIMEOUT = float(os.environ.get("TRADESTAT_HEALTH_TIMEOUT", "5"))
+# Consecutive failed health checks before a service's workers are restarted
+HEALTH_FAILURES = int(os.environ.get("TRADESTAT_HEALTH_FAILURES", "3"))
+# Seconds a new worker gets to import its module before health checks count
+STARTUP_GRACE = float(os.environ.get("TRADESTAT_STARTUP_GRACE", "30"))
+SHUTDOWN_TIMEOUT = float(os.environ.get("TRADESTAT_SHUTDOWN_TIMEOUT", "15"))
+RESTART_BACKOFF_MAX = 30.0
+
+
+def service_setting(service, name, default):
+    """
+    Read a per-service integer setting such as TRADESTAT_BACKEND_WORKERS.
+    """
+    return int(os.environ.get(f"TRADESTAT_{service.upper()}_{name}", default))
+
+
+def _default_workers(service):
+    # The importer runs its background jobs in-process, so it keeps a single worker
+    return 1 if service == "importer" else min(4, os.cpu_count() or 1)
+
+
+class Service:
+    """
+    A supervised service: a listening socket and the worker processes serving it.
+    """
+
+    def __init__(self, name, app_dir):
+        definition = SERVICES[name]
+        self.name = name
+        self.app_dir = app_dir
+        self.port = definition["port"]
+        self.health_url = f"http://127.0.0.1:{self.port}{definition['health']}"
+        self.workers = service_setting(name, "WORKERS", _default_workers(name))
+        self.threads = service_setting(name, "THREADS", 8)
+        self.processes = []
+        self.failures = 0
+        self.restarts = 0
+        self.started_at = 0.0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("0.0.0.0", self.port))
+        self.sock.listen(1024)
+        self.sock.set_inheritable(True)
+
+    def _spawn(self):
+        command = [
+            sys.executable, "-m", "utils.serving", self.name,
+            "--fd", str(self.sock.fileno()), "--threads", str(self.threads),
+        ]
+        return subprocess.Popen(command, cwd=self.app_dir, pass_fds=(self.sock.fileno(),))
+
+    def start(self):
+        self.processes = [self._spawn() for _ in range(self.workers)]
+        self.started_at = time.monotonic()
+        self.failures = 0
+        print(f"[{self.name}] {self.workers} worker(s) x {self.threads} thread(s) on port {self.port}")
+
+    def reap(self):
+        """
+        Replace workers that exited, backing off when a service keeps crashing.
+        """
+        for i, process in enumerate(self.processes):
+            code = process.poll()
+            if code is not None:
+                self.restarts += 1
+                delay = min(RESTART_BACKOFF_MAX, 0.5 * self.restarts)
+                print(f"[{self.name}] worker {process.pid} exited with code {code}, restarting in {delay:.1f}s")
+                time.sleep(delay)
+                self.processes[i] = self._spawn()
+                self.started_at = time.monotonic()
+
+    def check_health(self):
+        """
+        Probe the health endpoint and restart all workers after repeated failures.
+        """
+        if time.monotonic() - self.started_at < STARTUP_GRACE:
+            return
+        try:
+            response = requests.get(self.health_url, timeout=HEALTH_TIMEOUT)
+            response.raise_for_status()
+            self.failures = 0
+            self.restarts = 0
+        except requests.exceptions.RequestException as e:
+            self.failures += 1
+            print(f"[{self.name}] health check failed ({self.failures}/{HEALTH_FAILURES}): {e}")
+            if self.failures >= HEALTH_FAILURES:
+                print(f"[{self.name}] unhealthy, restarting workers")
+                self.stop()
+                self.start()
+
+    def stop(self, timeout=SHUTDOWN_TIMEOUT):
+        """
+        Ask workers to finish in-flight requests and exit, killing those that do not.
+        """
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            try:
+                process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                print(f"[{self.name}] worker {process.pid} did not stop in time, killing it")
+                process.kill()
+                process.wait()
+        self.processes = []
+
+
+def supervise(service_names, app_dir):
+    """
+    Start every service and keep it running until SIGINT/SIGTERM, then shut down gracefully.
+    """
+    services = [Service(name, app_dir) for name in service_names]
+    stopping = []
+
+    def request_stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    for service in services:
+        service.start()
+
+    next_health_check = time.monotonic() + HEALTH_INTERVAL
+    try:
+        while not stopping:
+            time.sleep(0.5)
+            for service in services:
+                service.reap()
+            if time.monotonic() >= next_health_check:
+                for service in services:
+                    service.check_health()
+                next_health_check = time.monotonic() + HEALTH_INTERVAL
+    finally:
+        print("Shutting down services...")
+        for service in services:
+            service.stop()
+            service.sock.close()
+
+
+def run_worker(service_name, fd, threads):
+    """
+    Serve one service from an inherited listening socket until terminated.
+    """
+    from waitress import create_server
+
+    definition = SERVICES[service_name]
+    module = importlib.import_module(definition["module"])
+    wsgi_app = getattr(module, definition["attr"])
+
+    sock = socket.socket(fileno=fd)
+    server = create_server(wsgi_app, sockets=[sock], threads=threads, ident=f"tradestat-{service_name}")
+
+    def graceful_exit(signum, frame):
+        # waitress closes its listener and drains in-flight requests on SystemExit
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, graceful_exit)
+    server.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a TradeStatEngine service worker.")
+    parser.add_argument("service", choices=sorted(SERVICES))
+    parser.add_argument("--fd", type=int, required=True, help="Inherited listening socket")
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    run_worker(args.service, args.fd, args.threads)
+
+
+if __name__ == "__main__":
+    main()
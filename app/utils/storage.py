@@ -0,0 +1,713 @@
+"""
+Storage backends shared by the backend API, the importer and the database utilities.
+
+SQLite (trades.db) is always the primary store: every write, the importer's duplicate
+checks and full-text search go through it. Analytic reads (the /stats/* queries) go
+through `analytics()`, which each backend may serve from a different engine:
+
+- "sqlite" (default): the SQLite primary, or its read-only replica (see utils/replica.py).
+- "duckdb": an embedded DuckDB columnar copy of the trades, refreshed from the primary,
+  where grouped aggregations over millions of trades run vectorized. Needs
+  `pip install duckdb`.
+
+Pick the engine with TRADESTAT_STORAGE. Analytic SQL must stay portable between the two
+engines: `?` parameters, CAST(... AS DOUBLE) rather than FLOAT, no SQLite-only functions.
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from utils import cube, instrumentation, leaderboard, outcomes
+from utils.config import DATA_DIR, DB_NAME
+
+STORAGE_ENGINE = os.environ.get("TRADESTAT_STORAGE", "sqlite").lower()
+
+DUCKDB_DIR = os.path.join(DATA_DIR, "analytics")
+DUCKDB_PATH = os.path.join(DUCKDB_DIR, "trades.duckdb")
+# Seconds between refreshes of the DuckDB copy
+DUCKDB_INTERVAL = float(os.environ.get("TRADESTAT_DUCKDB_INTERVAL", "30"))
+DUCKDB_LOAD_CHUNK = 100000
+# Rows fetched at a time by streamed analytic reads: the most rows of a result held in memory
+STREAM_CHUNK = int(os.environ.get("TRADESTAT_STREAM_CHUNK", "2000"))
+
+# "account": one trades file per account, "<n>": n files shared by groups of accounts
+SHARDING = os.environ.get("TRADESTAT_SHARDING", "off")
+SHARD_DIR = os.path.join(DATA_DIR, "shards")
+SHARD_KEY = re.compile(r"^[A-Za-z0-9_-]+$")
+# Tables that live in the shards; statements not using them run on the main database alone
+SHARDED_TABLES = re.compile(
+    r"\b(trades|trade_cube|trade_ranks|trades_fts|break_even_thresholds)\b", re.IGNORECASE
+)
+
+# Columns copied to the analytic engine. Notes and hashes are only needed by the primary.
+ANALYTIC_COLUMNS = [
+    "account_id", "filename", "position_size", "opened", "closed", "pips_gained_lost",
+    "profit_loss", "risk_reward", "strategy_used", "open_day", "open_time",
+    "open_month", "trade_duration_minutes", "killzone",
+    "time_writing", "instrument", "profit_loss_original",
+]
+
+
+def _remove_database(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+class SQLiteStorage:
+    """
+    The default backend: everything runs on SQLite, analytics optionally on a replica.
+    """
+
+    engine = "sqlite"
+    sharded = False
+
+    def __init__(self, db_name=DB_NAME, replica=None):
+        self.db_name = db_name
+        self.replica = replica
+        # Where the last analytic read of this thread came from, for freshness reporting
+        self._last_read = threading.local()
+
+    def freshness(self):
+        """
+        Return (source, as_of) of the last analytic read made by the calling thread.
+        """
+        return getattr(self._last_read, "source", None), getattr(self._last_read, "as_of", None)
+
+    def _record_read(self, source, as_of):
+        self._last_read.source = source
+        self._last_read.as_of = as_of
+
+    def connect(self, account_id=None, **kwargs):
+        """
+        Open a connection to the primary database (the caller closes it). `account_id`
+        selects the database holding that account's trades, which here is the primary too.
+        """
+        return sqlite3.connect(self.db_name, **kwargs)
+
+    def connect_all(self, **kwargs):
+        """
+        Open a connection that sees the accounts and the trades of every account.
+        """
+        return self.connect(**kwargs)
+
+    def connect_each(self, **kwargs):
+        """
+        Open one connection per database holding trades (here only the primary), for
+        reads across all accounts whose results are merged in Python.
+        """
+        return [self.connect(**kwargs)]
+
+    def databases(self, account_id=None):
+        """
+        Database files holding the trades of an account (or of all accounts), for tools
+        that work on one file at a time (backfills, maintenance).
+        """
+        return [self.db_name]
+
+    def drop_account(self, account_id):
+        """
+        Delete every trade of an account and return how many there were.
+        """
+        return self.execute("DELETE FROM trades WHERE account_id = ?", (account_id,), account_id)
+
+    @contextmanager
+    def transaction(self, account_id=None, **kwargs):
+        """
+        Yield a connection (see connect); commit on success, roll back on error, always close.
+        """
+        conn = self.connect(account_id, **kwargs)
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def query(self, sql, params=(), account_id=None):
+        """
+        Fetch all rows of a query (always current): on the account's database, or on
+        all accounts when account_id is None.
+        """
+        conn = self.connect(account_id) if account_id is not None else self.connect_all()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def query_each(self, sql, params=(), account_id=None):
+        """
+        Fetch all rows of a query run on every database holding the trades of an account
+        (or of all accounts), concatenated: aggregates come back once per database.
+        """
+        return self.query(sql, params, account_id)
+
+    def execute(self, sql, params=(), account_id=None):
+        """
+        Run one write statement in its own transaction; return the rowcount.
+        Trades are written with their account_id, everything else without.
+        """
+        with self.transaction(account_id) as conn:
+            return conn.execute(sql, params).rowcount
+
+    def execute_many(self, sql, seq_of_params, account_id=None):
+        """
+        Run a write statement for every parameter set in one transaction; return the rowcount.
+        """
+        with self.transaction(account_id) as conn:
+            return conn.executemany(sql, seq_of_params).rowcount
+
+    def analytics_connection(self, account_id=None):
+        """
+        Open a SQLite read connection for analytics: the replica when it is fresh
+        enough, otherwise the primary. Records the source and as-of time of the data.
+        """
+        if self.replica is None:
+            self._record_read("primary", None)
+            return instrumentation.connect(self.db_name)
+        path, source, as_of = self.replica.choose()
+        self._record_read(source, as_of)
+        if source == "replica":
+            return instrumentation.connect(self.replica.uri(), uri=True)
+        return instrumentation.connect(self.db_name)
+
+    def analytics_connections(self, account_id=None):
+        """
+        Read connections covering an account (or all accounts), one per database, for
+        queries that cannot run over attached databases (full-text search, aggregates
+        over more shards than SQLite can attach).
+        """
+        return [self.analytics_connection(account_id)]
+
+    def analytics(self, sql, params=(), account_id=None):
+        """
+        Run an analytic (read-only, portable) query and fetch all rows. Passing the
+        account_id the query filters on lets sharded storage read only that account.
+        """
+        conn = self.analytics_connection(account_id)
+        try:
+            return instrumentation.fetch_all(conn, sql, params)
+        finally:
+            conn.close()
+
+    def stream(self, sql, params=(), account_id=None, chunk_size=None):
+        """
+        Run an analytic query like analytics() but yield its rows in chunks of at most
+        `chunk_size` (STREAM_CHUNK by default), for aggregations over whole accounts.
+        """
+        conn = self.analytics_connection(account_id)
+        try:
+            yield from instrumentation.fetch_chunks(conn, sql, params, chunk_size or STREAM_CHUNK)
+        finally:
+            conn.close()
+
+
+class DuckDBStorage(SQLiteStorage):
+    """
+    SQLite primary for writes, DuckDB columnar copy for analytic queries.
+
+    The copy is rebuilt in the background when the primary changed and the copy is older
+    than the refresh interval; until the first copy exists, analytics run on SQLite.
+    """
+
+    engine = "duckdb"
+
+    def __init__(self, db_name=DB_NAME, replica=None, path=DUCKDB_PATH, interval=DUCKDB_INTERVAL):
+        super().__init__(db_name, replica)
+        import duckdb  # noqa: F401  (fail early with a clear error when it is missing)
+
+        self.path = path
+        self.interval = interval
+        self._refreshing = threading.Lock()
+        self._conn_lock = threading.Lock()
+        self._conn = None
+        self._conn_as_of = None
+
+    def as_of(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def refresh(self):
+        """
+        Rebuild the DuckDB copy from the primary and swap it in atomically.
+        """
+        import duckdb
+
+        started = time.time()
+        as_of = self.as_of()
+        primary_mtime = max(
+            (os.path.getmtime(p) for p in (self.db_name, self.db_name + "-wal") if os.path.exists(p)),
+            default=0.0,
+        )
+        if as_of is not None and primary_mtime < as_of:
+            os.utime(self.path, (started, started))
+            return
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        partial = f"{self.path}.{os.getpid()}.part"
+        if os.path.exists(partial):
+            os.remove(partial)
+        source = sqlite3.connect(self.db_name, timeout=30)
+        target = duckdb.connect(partial)
+        try:
+            _copy_to_duckdb(source, target)
+            target.execute("CHECKPOINT")
+        finally:
+            target.close()
+            source.close()
+        os.utime(partial, (started, started))
+        os.replace(partial, self.path)
+
+    def refresh_in_background(self):
+        if not self._refreshing.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing the DuckDB analytics copy: {e}")
+            finally:
+                self._refreshing.release()
+
+        threading.Thread(target=run, name="duckdb-refresh", daemon=True).start()
+
+    def _duckdb_connection(self, as_of):
+        """
+        Shared read-only connection to the current copy, reopened when the copy is replaced.
+        """
+        import duckdb
+
+        with self._conn_lock:
+            if self._conn is None or self._conn_as_of != as_of:
+                # Connections opened on the replaced file keep reading its old contents
+                self._conn = duckdb.connect(self.path, read_only=True)
+                self._conn_as_of = as_of
+            return self._conn.cursor()
+
+    def analytics(self, sql, params=(), account_id=None):
+        as_of = self.as_of()
+        if as_of is None or time.time() - as_of >= self.interval:
+            self.refresh_in_background()
+        if as_of is None:
+            return super().analytics(sql, params, account_id)
+
+        cursor = self._duckdb_connection(as_of)
+        try:
+            rows = cursor.execute(sql, list(params)).fetchall()
+        finally:
+            cursor.close()
+        self._record_read("duckdb", as_of)
+        return rows
+
+    def stream(self, sql, params=(), account_id=None, chunk_size=None):
+        as_of = self.as_of()
+        if as_of is None or time.time() - as_of >= self.interval:
+            self.refresh_in_background()
+        if as_of is None:
+            yield from super().stream(sql, params, account_id, chunk_size)
+            return
+
+        cursor = self._duckdb_connection(as_of)
+        self._record_read("duckdb", as_of)
+        try:
+            cursor.execute(sql, list(params))
+            while True:
+                rows = cursor.fetchmany(chunk_size or STREAM_CHUNK)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+class ShardedStorage(SQLiteStorage):
+    """
+    Trades split into one SQLite file per account (or per group of accounts) under
+    SHARD_DIR, while accounts and jobs stay in the main database.
+
+    Per-account reads and writes open only that account's small file. Reads across all
+    accounts run on each shard in turn (query_each, connect_each, analytics_connections)
+    and are merged by the caller, since SQLite attaches at most 10 databases. connect_all
+    still opens the main database with the shards ATTACHed and temporary `trades`,
+    `trade_cube` and `trade_ranks` views over them, for ad-hoc queries over a few shards.
+    Trade ids are unique within a shard only.
+    """
+
+    sharded = True
+
+    def __init__(self, db_name=DB_NAME, replica=None, shard_dir=SHARD_DIR, groups=None):
+        super().__init__(db_name, replica)
+        self.shard_dir = shard_dir
+        self.groups = groups
+
+    def shard_name(self, account_id):
+        account_id = str(account_id).strip()
+        if self.groups:
+            number = int(account_id) if account_id.isdigit() else zlib.crc32(account_id.encode())
+            return f"group_{number % self.groups}"
+        if not SHARD_KEY.match(account_id):
+            raise ValueError(f"Invalid account id for a shard file name: {account_id!r}")
+        return f"account_{account_id}"
+
+    def shard_path(self, account_id):
+        return os.path.join(self.shard_dir, self.shard_name(account_id) + ".db")
+
+    def shard_paths(self):
+        try:
+            names = sorted(name for name in os.listdir(self.shard_dir) if name.endswith(".db"))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.shard_dir, name) for name in names]
+
+    def init_shard(self, path):
+        """
+        Create (or upgrade) the trades schema of a shard file.
+        """
+        from utils.database_utils import DatabaseManager
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=5)
+        try:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("PRAGMA journal_mode = WAL")
+            DatabaseManager.create_trades_schema(conn.cursor())
+            conn.commit()
+        finally:
+            conn.close()
+
+    def prepare_shards(self):
+        """
+        Apply schema additions to every existing shard.
+        """
+        for path in self.shard_paths():
+            self.init_shard(path)
+
+    def connect(self, account_id=None, **kwargs):
+        if account_id is None:
+            return sqlite3.connect(self.db_name, **kwargs)
+        path = self.shard_path(account_id)
+        if not os.path.exists(path):
+            self.init_shard(path)
+        return sqlite3.connect(path, **kwargs)
+
+    def _attach_shards(self, conn):
+        """
+        Attach every shard to a connection on the main database and create temporary
+        views over their trades, cube, leaderboard and break-even threshold tables.
+        """
+        paths = self.shard_paths()
+        if not paths:
+            return conn
+        try:
+            limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        except AttributeError:  # Python < 3.11
+            limit = 10
+        if len(paths) > limit:
+            conn.close()
+            raise sqlite3.OperationalError(
+                f"{len(paths)} shards exceed SQLite's limit of {limit} attached databases; "
+                f"group accounts with TRADESTAT_SHARDING=<number of groups>"
+            )
+        for i, path in enumerate(paths):
+            conn.execute(f"ATTACH DATABASE ? AS shard{i}", (path,))
+        for table in ("trades", cube.CUBE_TABLE, leaderboard.RANK_TABLE, outcomes.THRESHOLD_TABLE):
+            columns = ", ".join(row[1] for row in conn.execute(f"PRAGMA shard0.table_info({table})"))
+            union = " UNION ALL ".join(f"SELECT {columns} FROM shard{i}.{table}" for i in range(len(paths)))
+            conn.execute(f"CREATE TEMP VIEW {table} AS {union}")
+        return conn
+
+    def connect_all(self, **kwargs):
+        return self._attach_shards(sqlite3.connect(self.db_name, **kwargs))
+
+    def connect_each(self, **kwargs):
+        return [sqlite3.connect(path, **kwargs) for path in self.shard_paths()]
+
+    def query(self, sql, params=(), account_id=None):
+        if account_id is None and not SHARDED_TABLES.search(sql):
+            # e.g. the accounts list: no need to attach the shards
+            conn = self.connect()
+            try:
+                return conn.execute(sql, params).fetchall()
+            finally:
+                conn.close()
+        return super().query(sql, params, account_id)
+
+    def query_each(self, sql, params=(), account_id=None):
+        if account_id is not None or not SHARDED_TABLES.search(sql):
+            return self.query(sql, params, account_id)
+        rows = []
+        for conn in self.connect_each():
+            try:
+                rows.extend(conn.execute(sql, params).fetchall())
+            finally:
+                conn.close()
+        return rows
+
+    def databases(self, account_id=None):
+        if account_id is not None:
+            path = self.shard_path(account_id)
+            return [path] if os.path.exists(path) else []
+        return [self.db_name] + self.shard_paths()
+
+    def drop_account(self, account_id):
+        path = self.shard_path(account_id)
+        if not os.path.exists(path):
+            return 0
+        if self.groups:
+            # Other accounts share the file
+            return super().drop_account(account_id)
+        conn = sqlite3.connect(path)
+        try:
+            count = conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+        finally:
+            conn.close()
+        _remove_database(path)
+        return count
+
+    def drop_shards(self):
+        """
+        Remove every shard file (all trades of all accounts).
+        """
+        for path in self.shard_paths():
+            _remove_database(path)
+
+    def analytics_connection(self, account_id=None):
+        self._record_read("shard" if account_id is not None else "primary", None)
+        if account_id is None:
+            return self._attach_shards(instrumentation.connect(self.db_name))
+        try:
+            path = self.shard_path(account_id)
+        except ValueError:
+            path = None
+        if path is None or not os.path.exists(path):
+            # Unknown account: read an empty schema rather than creating a file
+            from utils.database_utils import DatabaseManager
+
+            conn = instrumentation.connect(":memory:")
+            DatabaseManager.create_trades_schema(conn.cursor())
+            return conn
+        return instrumentation.connect(path)
+
+    def analytics(self, sql, params=(), account_id=None):
+        if account_id is None and not SHARDED_TABLES.search(sql):
+            self._record_read("primary", None)
+            conn = instrumentation.connect(self.db_name)
+            try:
+                return instrumentation.fetch_all(conn, sql, params)
+            finally:
+                conn.close()
+        return super().analytics(sql, params, account_id)
+
+    def stream(self, sql, params=(), account_id=None, chunk_size=None):
+        if account_id is None and not SHARDED_TABLES.search(sql):
+            self._record_read("primary", None)
+            conn = instrumentation.connect(self.db_name)
+            try:
+                yield from instrumentation.fetch_chunks(conn, sql, params, chunk_size or STREAM_CHUNK)
+            finally:
+                conn.close()
+            return
+        yield from super().stream(sql, params, account_id, chunk_size)
+
+    def analytics_connections(self, account_id=None):
+        if account_id is not None:
+            return [self.analytics_connection(account_id)]
+        self._record_read("primary", None)
+        return [instrumentation.connect(path) for path in self.shard_paths()]
+
+
+def _copy_to_duckdb(source, target):
+    """
+    Load accounts, trades, the analytics cube and the break-even thresholds from a SQLite
+    connection into an empty DuckDB database.
+    Text that SQLite would read as 0 in numeric casts ('' or other junk) becomes NULL,
+    so the same portable SQL gives the same answers on both engines.
+    """
+    import pandas as pd
+
+    target.execute("CREATE TABLE accounts (id BIGINT, name VARCHAR, type VARCHAR, base_currency VARCHAR)")
+    accounts = pd.DataFrame(
+        source.execute("SELECT id, name, type, base_currency FROM accounts").fetchall(),
+        columns=["id", "name", "type", "base_currency"], dtype="object"
+    )
+    target.register("accounts_chunk", accounts)
+    target.execute("INSERT INTO accounts SELECT * FROM accounts_chunk")
+    target.unregister("accounts_chunk")
+
+    text_columns = [c for c in ANALYTIC_COLUMNS if c != "trade_duration_minutes"]
+    target.execute(
+        "CREATE TABLE trades (id BIGINT, "
+        + ", ".join(f"{c} {'DOUBLE' if c == 'trade_duration_minutes' else 'VARCHAR'}" for c in ANALYTIC_COLUMNS)
+        + ")"
+    )
+    cursor = source.execute(
+        "SELECT id, " + ", ".join(f"CAST({c} AS TEXT)" for c in ANALYTIC_COLUMNS) + " FROM trades ORDER BY id"
+    )
+    select = ", ".join(
+        ["id"] + [c if c in text_columns else f"TRY_CAST({c} AS DOUBLE)" for c in ANALYTIC_COLUMNS]
+    )
+    while True:
+        rows = cursor.fetchmany(DUCKDB_LOAD_CHUNK)
+        if not rows:
+            break
+        chunk = pd.DataFrame(rows, columns=["id"] + ANALYTIC_COLUMNS, dtype="object")
+        target.register("trades_chunk", chunk)
+        target.execute(f"INSERT INTO trades SELECT {select} FROM trades_chunk")
+        target.unregister("trades_chunk")
+
+    for column in ("profit_loss", "risk_reward", "profit_loss_original"):
+        target.execute(
+            f"UPDATE trades SET {column} = NULL "
+            f"WHERE {column} <> '#' AND TRY_CAST({column} AS DOUBLE) IS NULL"
+        )
+
+    # The cube is small (one row per combination): copy it as it is
+    keys = [column for column, _ in cube.DIMENSIONS.values()]
+    target.execute(
+        f"CREATE TABLE {cube.CUBE_TABLE} ("
+        + ", ".join(f"{c} {'INTEGER' if c == 'hour' else 'VARCHAR'}" for c in keys) + ", "
+        + ", ".join(f"{m} {'DOUBLE' if m.endswith('_sum') else 'BIGINT'}" for m in cube.MEASURES)
+        + ")"
+    )
+    columns = keys + list(cube.MEASURES)
+    cells = pd.DataFrame(
+        source.execute(f"SELECT {', '.join(columns)} FROM {cube.CUBE_TABLE}").fetchall(), columns=columns
+    )
+    target.register("cube_cells", cells)
+    target.execute(f"INSERT INTO {cube.CUBE_TABLE} SELECT * FROM cube_cells")
+    target.unregister("cube_cells")
+
+    target.execute(f"CREATE TABLE {outcomes.THRESHOLD_TABLE} (account_id VARCHAR, threshold DOUBLE)")
+    thresholds = pd.DataFrame(
+        source.execute(f"SELECT account_id, threshold FROM {outcomes.THRESHOLD_TABLE}").fetchall(),
+        columns=["account_id", "threshold"]
+    )
+    target.register("thresholds_chunk", thresholds)
+    target.execute(f"INSERT INTO {outcomes.THRESHOLD_TABLE} SELECT * FROM thresholds_chunk")
+    target.unregister("thresholds_chunk")
+
+    target.execute(leaderboard.DUCKDB_VIEW)
+
+
+def get_storage(db_name=DB_NAME, replica=None, engine=None, sharding=None):
+    """
+    Return the storage backend selected by TRADESTAT_STORAGE (or `engine`) and
+    TRADESTAT_SHARDING (or `sharding`).
+    """
+    engine = (engine or STORAGE_ENGINE).lower()
+    sharding = (SHARDING if sharding is None else sharding).strip().lower()
+    if sharding not in ("", "off", "none", "0"):
+        if engine != "sqlite":
+            print(f"The {engine} engine does not support sharding, using sqlite shards.")
+        groups = int(sharding) if sharding.isdigit() else None
+        if sharding != "account" and groups is None:
+            print(f"Unknown sharding '{sharding}', using one shard per account.")
+        shard_dir = os.path.join(os.path.dirname(os.path.abspath(db_name)), "shards")
+        return ShardedStorage(db_name, replica, shard_dir, groups)
+    if engine == "duckdb":
+        return DuckDBStorage(db_name, replica)
+    if engine != "sqlite":
+        print(f"Unknown storage engine '{engine}', using sqlite.")
+    return SQLiteStorage(db_name, replica)
+
+
+def shard_database(store):
+    """
+    Move the trades of the main database into per-account shards, keeping their ids.
+    Run it once, before importing with sharding enabled. Returns {shard: trades moved}.
+    """
+    moved = {}
+    conn = sqlite3.connect(store.db_name, timeout=30)
+    try:
+        columns = ", ".join(row[1] for row in conn.execute("PRAGMA main.table_info(trades)"))
+        accounts = [row[0] for row in conn.execute("SELECT DISTINCT account_id FROM main.trades")]
+        for account_id in accounts:
+            path = store.shard_path(account_id)
+            store.init_shard(path)
+            conn.execute("ATTACH DATABASE ? AS shard", (path,))
+            try:
+                count = conn.execute(
+                    f"INSERT INTO shard.trades ({columns}) SELECT {columns} FROM main.trades WHERE account_id = ?",
+                    (account_id,)
+                ).rowcount
+                conn.execute("DELETE FROM main.trades WHERE account_id = ?", (account_id,))
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute("DETACH DATABASE shard")
+            name = os.path.basename(path)
+            moved[name] = moved.get(name, 0) + count
+    finally:
+        conn.close()
+    return moved
+
+
+def unshard_database(store):
+    """
+    Move the trades of every shard back into the main database and remove the shard
+    files. Trades get new ids. Returns {shard: trades moved}.
+    """
+    moved = {}
+    conn = sqlite3.connect(store.db_name, timeout=30)
+    try:
+        columns = ", ".join(row[1] for row in conn.execute("PRAGMA main.table_info(trades)") if row[1] != "id")
+        for path in store.shard_paths():
+            conn.execute("ATTACH DATABASE ? AS shard", (path,))
+            try:
+                count = conn.execute(
+                    f"INSERT INTO main.trades ({columns}) SELECT {columns} FROM shard.trades ORDER BY id"
+                ).rowcount
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute("DETACH DATABASE shard")
+            _remove_database(path)
+            moved[os.path.basename(path)] = count
+    finally:
+        conn.close()
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move trades between the main database and account shards.")
+    parser.add_argument("action", choices=["shard", "unshard", "list"])
+    parser.add_argument("--db", default=DB_NAME, help="Database file (defaults to the configured trades.db)")
+    parser.add_argument("--sharding", default=None,
+                        help="'account' or a number of account groups (defaults to TRADESTAT_SHARDING, else 'account')")
+    args = parser.parse_args()
+
+    sharding = args.sharding or (SHARDING if SHARDING.lower() not in ("", "off", "none", "0") else "account")
+    store = get_storage(args.db, engine="sqlite", sharding=sharding)
+    if args.action == "shard":
+        result = shard_database(store)
+    elif args.action == "unshard":
+        result = unshard_database(store)
+    else:
+        result = {}
+        for path in store.shard_paths():
+            conn = sqlite3.connect(path)
+            try:
+                result[os.path.basename(path)] = conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+            finally:
+                conn.close()
+    for name, count in result.items():
+        print(f"{name}: {count} trade(s)")
+    print(f"{len(result)} shard(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,85 @@
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, Request, Response, jsonify, request, render_template
+import hashlib
+import io
+import json
 import os
-import sqlite3
-import re
-import pytz
 import shutil
+import sqlite3
+import tempfile
+import uuid
 import requests
-from datetime import datetime
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 
-# Define paths
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-DB_NAME = os.path.join(DATA_DIR, "trades.db")
-UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
+from utils import fx, jobs, reparse, storage
+from utils.config import BACKEND_TIMEOUT, BACKEND_URL, DB_NAME, IMPORTER_PORT, UPLOAD_DIR
+from utils.killzones import backfill_killzones
+from utils.parser import PARSER_VERSION, TRADE_FIELDS, parse_markdown_content
+
 ALLOWED_EXTENSIONS = {'md'}
+# Upload limits: a whole request, and a single markdown note buffered in memory
+MAX_CONTENT_LENGTH = int(os.environ.get("TRADESTAT_MAX_UPLOAD_MB", "16")) * 1024 * 1024
+MAX_FILE_SIZE = int(os.environ.get("TRADESTAT_MAX_FILE_KB", "1024")) * 1024
+READ_CHUNK_SIZE = 64 * 1024
+# Asynchronous uploads are staged here until their import job has processed them
+SPOOL_DIR = os.path.join(UPLOAD_DIR, "incoming")
+# Job kinds clients may submit with POST /jobs. import_upload is only queued by the
+# upload endpoint, with a spool folder it created itself.
+PUBLIC_JOB_KINDS = ("reclassify_killzones", "reconvert_currency", "reparse_trades")
+# Progress streams poll the job this often, and end after a while so the client
+# reconnects instead of holding a request thread for the whole import
+EVENTS_POLL_INTERVAL = 0.5
+EVENTS_MAX_SECONDS = 30
+EVENTS_RETRY_MS = 1000
 
 # Ensure directories exist
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+
+class BoundedBuffer(io.BytesIO):
+    """
+    In-memory upload buffer that refuses to grow past a fixed size.
+    """
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+
+    def write(self, data):
+        if self.tell() + len(data) > self.limit:
+            raise RequestEntityTooLarge(f"Each file must be at most {self.limit // 1024} KB")
+        return super().write(data)
+
+
+class InMemoryUploadRequest(Request):
+    """
+    Request that buffers uploaded files in bounded memory instead of temporary files.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return BoundedBuffer(MAX_FILE_SIZE)
+
+
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
 app.config['UPLOAD_FOLDER'] = UPLOAD_DIR
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+
+# Writes and duplicate checks always go to the SQLite primary
+store = storage.get_storage(DB_NAME)
+
+# Background jobs (bulk imports, reclassification, rebuilds) run in this process
+job_queue = jobs.JobQueue(
+    DB_NAME,
+    workers=int(os.environ.get("TRADESTAT_JOB_WORKERS", "2")),
+    bulk_workers=int(os.environ.get("TRADESTAT_BULK_JOB_WORKERS", "1")),
+)
 
 # ------------------------------------------------------------------------------
 # Helper function to fetch data from the backend (e.g. the list of accounts)
 def fetch_data(endpoint, params=None):
     try:
-        response = requests.get(f"http://127.0.0.1:5000{endpoint}", params=params)
+        response = requests.get(f"{BACKEND_URL}{endpoint}", params=params, timeout=BACKEND_TIMEOUT)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -37,101 +91,40 @@ def allowed_file(filename):
 
 # Parse Markdown File
 def parse_markdown_file(file_path):
-    trade_entry = {}
     try:
         with open(file_path, "r", encoding="utf-8") as file:
             content = file.read()
-
-        # Define regex patterns for each field
-        fields = {
-            "position_size": r"Position\s*Size:\s*[\*_~]*([\d\.]+)[\*_~]*",
-            "opened": r"Opened:\s*[\*_~]*(\d{2}/\d{2}/\d{4} \d{2}:\d{2})[\*_~]*",
-            "closed": r"Closed:\s*[\*_~]*(\d{2}/\d{2}/\d{4} \d{2}:\d{2})[\*_~]*",
-            "pips_gained_lost": r"Pips\s*Gained/Lost:\s*[\*_~]*([+-]?\d+)[\*_~]*",
-            "profit_loss": r"Profit/Loss:\s*[\*_~]*([+-]?\d+(?:\.\d+)?[€$])[\*_~]*",
-            "risk_reward": r"R/R:\s*[\*_~]*([\d\.]+)[\*_~]*",
-            "strategy_used": r"Strategy\s*[Uu]sed:\s*[\*_~]*([^\n\*_~]+)[\*_~]*",
-        }
-
-        for key, pattern in fields.items():
-            match = re.search(pattern, content, re.IGNORECASE)
-            if match:
-                trade_entry[key] = match.group(1).strip()
-
-        # Extract the first occurrence of the time of writing
-        time_writing_match = re.search(r"Time writing:\s*(\d{2}:\d{2}) (\d{2}/\d{2}/\d{4})", content)
-        if time_writing_match:
-            raw_time = f"{time_writing_match.group(2)} {time_writing_match.group(1)}"
-            # Parse into datetime and reformat as the other dates
-            dt = datetime.strptime(raw_time, "%d/%m/%Y %H:%M")
-            formatted_time_writing = dt.strftime("%d/%m/%Y %H:%M")
-            trade_entry["time_writing"] = formatted_time_writing
-
-        # Parse opened and closed timestamps
-        raw_opened = trade_entry.get("opened", "").strip()
-        raw_closed = trade_entry.get("closed", "").strip()
-        if raw_opened and raw_closed:
-            try:
-                opened_time = datetime.strptime(raw_opened, "%d/%m/%Y %H:%M")
-                closed_time = datetime.strptime(raw_closed, "%d/%m/%Y %H:%M")
-                trade_entry["trade_duration_minutes"] = max(0, (closed_time - opened_time).total_seconds() // 60)
-                trade_entry["open_day"] = opened_time.strftime("%A")
-                trade_entry["open_time"] = opened_time.strftime("%H:%M")
-                trade_entry["open_month"] = opened_time.strftime("%B")
-                trade_entry["killzone"] = determine_killzone(raw_opened)
-            except ValueError as e:
-                print(f"Error parsing dates in file '{file_path}': {e}")
-                return None
-
-        # Determine trade outcome
-        profit_loss_cleaned = re.sub(r"[^\d\.\-\+]", "", trade_entry.get("profit_loss", ""))
-        try:
-            profit_loss_value = float(profit_loss_cleaned)
-            trade_entry["profit_loss"] = profit_loss_cleaned
-            if profit_loss_value > 0.5:
-                trade_entry["trade_outcome"] = "Win"
-            elif abs(profit_loss_value) < 0.5:
-                trade_entry["trade_outcome"] = "Break-even"
-            else:
-                trade_entry["trade_outcome"] = "Loss"
-        except ValueError:
-            trade_entry["trade_outcome"] = "Unknown"
-
-        trade_entry["filename"] = os.path.basename(file_path)
-
     except Exception as e:
-        print(f"Error parsing file '{file_path}': {e}")
+        print(f"Error reading file '{file_path}': {e}")
         return None
+    return parse_markdown_content(content, os.path.basename(file_path))
 
-    return trade_entry
+# Results of insert_trade_into_db
+INSERTED = "inserted"
+DUPLICATE = "duplicate"
+CONFLICT = "conflict"
+FAILED = "failed"
 
-# Determine Killzone
-def determine_killzone(opened_time):
+# Look up a previously imported file by the hash of its content
+def find_imported_file(content_hash):
     try:
-        rome_tz = pytz.timezone("Europe/Rome")
-        opened_time = datetime.strptime(opened_time.strip(), "%d/%m/%Y %H:%M").astimezone(rome_tz)
-        hour = opened_time.hour
-        if 2 <= hour < 5:
-            return "London"
-        elif 7 <= hour < 10:
-            return "New York"
-        return "Other"
+        rows = store.query_each("SELECT id, account_id, filename FROM trades WHERE content_hash = ?", (content_hash,))
+        return rows[0] if rows else None
     except Exception as e:
-        print(f"Error determining killzone: {e}")
-        return "Unknown"
+        print(f"Error looking up content hash: {e}")
+        return None
 
-# Insert Trade into Database
-def insert_trade_into_db(trade_entry, account_id):
+# Insert Trade into Database (trade_entry already converted with fx.Converter.normalize)
+def insert_trade_into_db(trade_entry, account_id, content_hash=None):
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
         query = """
             INSERT INTO trades (
                 account_id, filename, position_size, opened, closed, 
                 pips_gained_lost, profit_loss, risk_reward, strategy_used,
-                open_day, open_time, trade_outcome, open_month, 
-                trade_duration_minutes, killzone, time_writing
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                open_day, open_time, open_month, 
+                trade_duration_minutes, killzone, time_writing, instrument,
+                content_hash, notes, currency, profit_loss_original, fx_rate, parser_version
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
         values = (
             account_id,
@@ -145,30 +138,316 @@ def insert_trade_into_db(trade_entry, account_id):
             trade_entry.get("strategy_used"),
             trade_entry.get("open_day"),
             trade_entry.get("open_time"),
-            trade_entry.get("trade_outcome"),
             trade_entry.get("open_month"),
             trade_entry.get("trade_duration_minutes"),
             trade_entry.get("killzone"),
             trade_entry.get("time_writing"),
+            trade_entry.get("instrument"),
+            content_hash,
+            trade_entry.get("notes"),
+            trade_entry.get("currency"),
+            trade_entry.get("profit_loss_original"),
+            trade_entry.get("fx_rate"),
+            trade_entry.get("parser_version") or PARSER_VERSION,
         )
-        cursor.execute(query, values)
-        conn.commit()
-        conn.close()
-        return True
-    except sqlite3.IntegrityError:
-        return False
+        store.execute(query, values, account_id)
+        return INSERTED
+    except sqlite3.IntegrityError as e:
+        # Either the same content was imported concurrently, or another note has this name
+        return DUPLICATE if "content_hash" in str(e) else CONFLICT
     except Exception as e:
         print(f"Error inserting trade into database: {e}")
-        return False
+        return FAILED
+
+# Read an uploaded file in chunks, hashing it on the way
+def read_upload(file):
+    digest = hashlib.sha256()
+    chunks = []
+    while True:
+        chunk = file.stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
 
-# Move Processed File to Account-Specific Folder
-def move_processed_file(file_path, account_id):
+# Write a processed file once, directly into its final archive location
+def archive_processed_file(data, content_hash, account_id):
     try:
-        account_folder = os.path.join(UPLOAD_DIR, f"Account_{account_id}")
-        os.makedirs(account_folder, exist_ok=True)
-        shutil.move(file_path, account_folder)
+        final_path = reparse.archive_path(content_hash, account_id)
+        if os.path.exists(final_path):
+            return final_path
+        folder = os.path.dirname(final_path)
+        os.makedirs(folder, exist_ok=True)
+        # Write next to the final path and rename, so a crash never leaves a truncated archive
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, final_path)
+        return final_path
     except Exception as e:
-        print(f"Error moving processed file: {e}")
+        print(f"Error archiving processed file: {e}")
+        return None
+
+# Parse, insert and archive one uploaded note; returns (response data, HTTP status).
+# The converter (fx.Converter) is shared by all the notes of an upload or job.
+def import_upload(data, content_hash, filename, account_id, converter):
+    # Identical content was already imported: skip parsing and inserting entirely
+    existing = find_imported_file(content_hash)
+    if existing:
+        return {
+            "message": f"Identical file already imported as '{existing[2]}' "
+                       f"(trade {existing[0]}, account {existing[1]})",
+            "status": "duplicate"
+        }, 200
+
+    try:
+        content = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"error": "File is not valid UTF-8 text", "status": "error"}, 400
+    trade_entry = parse_markdown_content(content, filename)
+
+    # Ensure trade_entry includes all expected keys, even if empty
+    parsed_data = {key: (trade_entry or {}).get(key, "") for key in TRADE_FIELDS}
+
+    # Include extracted values in the JSON response
+    response_data = {
+        "parsed_data": parsed_data,
+        "message": "",
+        "status": "success"
+    }
+
+    if not trade_entry:
+        response_data["message"] = "Failed to parse the file"
+        response_data["status"] = "error"
+        return response_data, 500
+    if not account_id:
+        response_data["message"] = "Account ID is required"
+        response_data["status"] = "error"
+        return response_data, 400
+
+    # The full note text is stored for full-text search, but not echoed back
+    trade = converter.normalize(dict(parsed_data, notes=content), account_id)
+    result = insert_trade_into_db(trade, account_id, content_hash)
+    if result == INSERTED:
+        archive_processed_file(data, content_hash, account_id)
+        response_data["message"] = "File uploaded and trade saved successfully"
+        if fx.unconverted(trade):
+            # Saved without a P/L until `fx convert` runs with a rate for its date
+            response_data["unconverted"] = {
+                "profit_loss": trade["profit_loss_original"],
+                "currency": trade["currency"],
+            }
+            response_data["message"] += (
+                f"; its {trade['currency']} P/L is left out of the P/L totals until a rate is loaded"
+            )
+        return response_data, 200
+    elif result == DUPLICATE:
+        response_data["message"] = "Identical file already imported"
+        response_data["status"] = "duplicate"
+        return response_data, 200
+    elif result == CONFLICT:
+        response_data["message"] = (
+            f"A different note named '{filename}' is already imported; rename the file to import it"
+        )
+        response_data["status"] = "conflict"
+        return response_data, 409
+    else:
+        response_data["message"] = "Failed to save trade to database"
+        response_data["status"] = "error"
+        return response_data, 500
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify({
+        "error": e.description or f"Upload exceeds the {MAX_CONTENT_LENGTH // (1024 * 1024)} MB limit",
+        "status": "error"
+    }), 413
+
+# ------------------------------------------------------------------------------
+# Background jobs
+# Run `process(db_name, account_id, on_chunk)` -> rows updated over every database file
+# holding the account's trades (a single one unless they are sharded), reporting
+# progress against the account's trade count
+def run_per_database(context, account_id, process):
+    if account_id is None:
+        total = sum(row[0] for row in store.query_each("SELECT COUNT(*) FROM trades"))
+    else:
+        total = store.query("SELECT COUNT(*) FROM trades WHERE account_id = ?", (account_id,), account_id)[0][0]
+    context.checkpoint(progress=0, total=total)
+
+    totals = {"scanned": 0, "updated": 0}
+    for db_name in store.databases(account_id):
+        current = {"scanned": 0}
+
+        def report(scanned, updated):
+            current["scanned"] = scanned
+            context.checkpoint(progress=totals["scanned"] + scanned, updated=totals["updated"] + updated)
+        totals["updated"] += process(db_name, account_id, report)
+        totals["scanned"] += current["scanned"]
+    return {"updated": totals["updated"]}
+
+def reclassify_killzones_job(context, payload):
+    return run_per_database(
+        context, payload.get("account_id"),
+        lambda db_name, account_id, report: backfill_killzones(db_name, account_id, chunk_size=2000, on_chunk=report)
+    )
+
+job_queue.register("reclassify_killzones", reclassify_killzones_job)
+
+def reconvert_currency_job(context, payload):
+    # Rates and base currencies live in the main database, trades possibly in shards
+    rates = fx.RateTable.load(store.db_name)
+    currencies = fx.base_currencies(store.db_name)
+    return run_per_database(
+        context, payload.get("account_id"),
+        lambda db_name, account_id, report: fx.reconvert(db_name, rates, currencies, account_id, on_chunk=report)
+    )
+
+job_queue.register("reconvert_currency", reconvert_currency_job)
+
+# Parser processes of a reparse_trades job: an integer (ValueError otherwise), from 1
+# to reparse.DEFAULT_WORKERS so a request cannot start any number of processes
+def reparse_workers(value):
+    return min(max(int(str(value)), 1), reparse.DEFAULT_WORKERS)
+
+def reparse_trades_job(context, payload):
+    account_id = payload.get("account_id")
+    # Only trades parsed by an older parser version are processed
+    total = sum(count for db_name in store.databases(account_id) for _, count in reparse.stale(db_name, account_id))
+    context.checkpoint(progress=0, total=total)
+
+    converter = fx.Converter(store.db_name)
+    workers = reparse_workers(payload.get("workers", reparse.DEFAULT_WORKERS))
+    totals = {"scanned": 0, "updated": 0, "missing": 0, "failed": 0}
+    for db_name in store.databases(account_id):
+        def report(scanned, updated):
+            context.checkpoint(progress=totals["scanned"] + scanned, updated=totals["updated"] + updated)
+        stats = reparse.reparse(db_name, account_id, converter, workers, on_chunk=report)
+        for key in totals:
+            totals[key] += stats[key]
+    return totals
+
+job_queue.register("reparse_trades", reparse_trades_job)
+
+# Staging folder of an upload from its name (a uuid), or None unless it resolves to a
+# folder directly inside SPOOL_DIR
+def spool_path(name):
+    root = os.path.realpath(SPOOL_DIR)
+    path = os.path.realpath(os.path.join(root, str(name)))
+    return path if os.path.dirname(path) == root else None
+
+def import_upload_job(context, payload):
+    spool, files, account_id = spool_path(payload["spool"]), payload["files"], payload["account_id"]
+    if spool is None:
+        raise ValueError("The upload spool must be a folder inside the importer's spool directory")
+    counts = {"parsed": 0, "inserted": 0, "duplicates": 0, "rejected": 0, "unconverted": 0}
+    results = []
+    converter = fx.Converter(store.db_name)
+    context.checkpoint(progress=0, total=len(files), **counts)
+    try:
+        for index, filename in enumerate(files):
+            with open(os.path.join(spool, f"{index}.md"), "rb") as f:
+                data = f.read()
+            response_data, status_code = import_upload(
+                data, hashlib.sha256(data).hexdigest(), filename, account_id, converter
+            )
+            status = response_data["status"]
+            if response_data.get("parsed_data", {}).get("filename"):
+                counts["parsed"] += 1
+            if status == "success":
+                counts["inserted"] += 1
+                counts["unconverted"] += "unconverted" in response_data
+            elif status == "duplicate":
+                counts["duplicates"] += 1
+            else:
+                counts["rejected"] += 1
+            results.append({
+                "filename": filename,
+                "status": status,
+                "message": response_data.get("message") or response_data.get("error", ""),
+            })
+            if "unconverted" in response_data:
+                results[-1]["unconverted"] = response_data["unconverted"]
+            context.checkpoint(progress=index + 1, **counts)
+    finally:
+        # Only a finished, failed or cancelled job gets here. A job interrupted by a
+        # restart is queued again with its files and re-imports them from the first one:
+        # those already inserted are then recognised as duplicates.
+        spool = spool_path(payload["spool"])
+        if spool is not None:
+            shutil.rmtree(spool, ignore_errors=True)
+    return dict(counts, files=results)
+
+job_queue.register("import_upload", import_upload_job)
+
+@app.before_request
+def start_job_workers():
+    # Workers start with the first request, which also resumes jobs queued before a restart
+    job_queue.start()
+
+@app.route('/jobs', methods=['GET', 'POST'])
+def job_list():
+    if request.method == 'GET':
+        try:
+            limit = int(request.args.get("limit", 50))
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        return jsonify(job_queue.list(request.args.get("status"), limit))
+
+    data = request.get_json(silent=True) or {}
+    kind = data.get("kind")
+    if kind not in PUBLIC_JOB_KINDS:
+        return jsonify({"error": f"Unknown job kind '{kind}'", "kinds": sorted(PUBLIC_JOB_KINDS)}), 400
+    try:
+        priority = int(data.get("priority", jobs.PRIORITY_BULK))
+    except (TypeError, ValueError):
+        return jsonify({"error": "priority must be an integer"}), 400
+    payload = data.get("payload")
+    if kind == "reparse_trades" and isinstance(payload, dict) and "workers" in payload:
+        try:
+            reparse_workers(payload["workers"])
+        except ValueError:
+            return jsonify({"error": "workers must be an integer"}), 400
+    job_id = job_queue.submit(kind, payload, priority)
+    return jsonify(job_queue.get(job_id)), 202
+
+@app.route('/jobs/<int:job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+def job_cancel(job_id):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<int:job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Stream the progress of a job as Server-Sent Events: a "progress" event each time it
+    changes and a "done" event when it finishes. The stream ends after EVENTS_MAX_SECONDS;
+    EventSource clients reconnect by themselves and get the current state again.
+    """
+    if job_queue.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def stream():
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        for job in job_queue.watch(job_id, EVENTS_POLL_INTERVAL, EVENTS_MAX_SECONDS):
+            event = "done" if job["status"] in jobs.FINISHED_STATES else "progress"
+            yield f"event: {event}\ndata: {json.dumps(job)}\n\n"
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    return jsonify({"status": "OK"})
 
 @app.route('/upload', methods=['GET', 'POST'])
 def upload_file():
@@ -181,6 +460,8 @@ def upload_file():
         return render_template('upload.html', accounts=accounts)
 
     if request.method == 'POST':
+        if request.args.get('async') == '1':
+            return upload_files_async()
         if 'file' not in request.files:
             return jsonify({"error": "No file part in the request"}), 400
         file = request.files['file']
@@ -188,47 +469,48 @@ def upload_file():
             return jsonify({"error": "No file selected"}), 400
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
-            trade_entry = parse_markdown_file(file_path)
-
-            # Ensure trade_entry includes all expected keys, even if empty
-            expected_keys = [
-                "position_size", "opened", "closed", "pips_gained_lost",
-                "profit_loss", "risk_reward", "strategy_used", "open_day",
-                "open_time", "trade_outcome", "open_month",
-                "trade_duration_minutes", "killzone", "time_writing", "filename"
-            ]
-            trade_entry = {key: trade_entry.get(key, "") for key in expected_keys}
-
-            # Include extracted values in the JSON response
-            response_data = {
-                "parsed_data": trade_entry,
-                "message": "",
-                "status": "success"
-            }
-
-            if trade_entry:
-                account_id = request.form.get("account_id")
-                if not account_id:
-                    response_data["message"] = "Account ID is required"
-                    response_data["status"] = "error"
-                    return jsonify(response_data), 400
-
-                if insert_trade_into_db(trade_entry, account_id):
-                    move_processed_file(file_path, account_id)
-                    response_data["message"] = "File uploaded and trade saved successfully"
-                    return jsonify(response_data), 200
-                else:
-                    response_data["message"] = "Failed to save trade to database"
-                    response_data["status"] = "error"
-                    return jsonify(response_data), 500
-            else:
-                response_data["message"] = "Failed to parse the file"
-                response_data["status"] = "error"
-                return jsonify(response_data), 500
+            data, content_hash = read_upload(file)
+            response_data, status_code = import_upload(
+                data, content_hash, filename, request.form.get("account_id"), fx.Converter(store.db_name)
+            )
+            return jsonify(response_data), status_code
         return jsonify({"error": "Invalid file format"}), 400
 
+# Stage the uploaded files and import them in a background job
+def upload_files_async():
+    account_id = request.form.get("account_id")
+    if not account_id:
+        return jsonify({"error": "Account ID is required", "status": "error"}), 400
+    uploads = [f for f in request.files.getlist('file') if f.filename]
+    if not uploads:
+        return jsonify({"error": "No file selected"}), 400
+
+    spool_name = uuid.uuid4().hex
+    spool = os.path.join(SPOOL_DIR, spool_name)
+    os.makedirs(spool)
+    files, skipped = [], []
+    for file in uploads:
+        if not allowed_file(file.filename):
+            skipped.append(file.filename)
+            continue
+        # Files are stored by position: several uploads may share a name
+        file.save(os.path.join(spool, f"{len(files)}.md"))
+        files.append(secure_filename(file.filename))
+    if not files:
+        shutil.rmtree(spool, ignore_errors=True)
+        return jsonify({"error": "Invalid file format", "skipped": skipped}), 400
+
+    job_id = job_queue.submit(
+        "import_upload", {"spool": spool_name, "files": files, "account_id": account_id}, jobs.PRIORITY_NORMAL
+    )
+    return jsonify({
+        "job_id": job_id,
+        "files": len(files),
+        "skipped": skipped,
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events",
+    }), 202
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5050, debug=False)
+    app.run(host='0.0.0.0', port=IMPORTER_PORT, debug=False)
 
@@ -0,0 +1,43 @@
+"""
+Compare two benchmark reports produced by run_benchmarks.py.
+
+Usage:
+    python benchmarks/compare.py before.json after.json [--threshold 10]
+"""
+import argparse
+import json
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--metric", default="median_ms")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Percentage change flagged as a regression or improvement")
+    args = parser.parse_args()
+
+    before, after = load_results(args.before), load_results(args.after)
+    print(f"{'benchmark':<55} {'before':>12} {'after':>12} {'change':>9}")
+    for name in sorted(set(before) | set(after)):
+        if name not in before or name not in after:
+            state = "added" if name in after else "removed"
+            print(f"{name:<55} {state:>35}")
+            continue
+        old, new = before[name][args.metric], after[name][args.metric]
+        change = ((new - old) / old * 100) if old else 0.0
+        flag = ""
+        if change >= args.threshold:
+            flag = "  slower"
+        elif change <= -args.threshold:
+            flag = "  faster"
+        print(f"{name:<55} {old:>12.3f} {new:>12.3f} {change:>8.1f}%{flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Deterministic synthetic trade-journal generator for the benchmark suite.
+
+It produces markdown notes in the format parsed by web_importer.parse_markdown_file
+and populated trades.db files with the same derived columns the importer stores.
+The same seed always yields the same trades, so timings are comparable across commits.
+
+Usage:
+    python benchmarks/generate_journal.py markdown OUT_DIR N [--seed 42]
+    python benchmarks/generate_journal.py database DB_PATH N [--accounts 20] [--seed 42]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app"))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from utils import fx, killzones, parser  # noqa: E402
+from utils import database_utils  # noqa: E402
+
+DATE_FORMAT = "%d/%m/%Y %H:%M"
+INSTRUMENTS = ["EURUSD", "GBPUSD", "USDJPY", "XAUUSD", "NAS100", "US30"]
+STRATEGIES = ["Breaker Block", "Order Block", "FVG Retest", "Liquidity Sweep", "Silver Bullet"]
+LESSONS = [
+    "Stick to the plan, avoid FOMO entries.",
+    "Moved the stop loss too early, trust the setup.",
+    "Waited for confirmation and the entry was clean.",
+    "Overtraded after a loss, revenge trading again.",
+    "Took partials at the first target as planned.",
+]
+START_DATE = datetime(2020, 1, 1)
+INSERT_BATCH = 10000
+
+
+def synthetic_trades(n, seed=42, accounts=1):
+    """
+    Yield n raw trades as dictionaries of the fields written in a journal note.
+    """
+    rng = random.Random(seed)
+    for i in range(n):
+        opened = START_DATE + timedelta(minutes=rng.randrange(0, 5 * 365 * 24 * 60))
+        closed = opened + timedelta(minutes=rng.randrange(1, 8 * 60))
+        pips = rng.randint(-80, 120)
+        profit_loss = round(rng.gauss(15, 120), 2)
+        yield {
+            "index": i,
+            "account_id": str(rng.randrange(accounts) + 1),
+            "filename": f"trade_{seed}_{i:07d}.md",
+            "instrument": rng.choice(INSTRUMENTS),
+            "position_size": f"{rng.choice([0.1, 0.25, 0.5, 1.0, 2.0]):.2f}",
+            "opened": opened.strftime(DATE_FORMAT),
+            "closed": closed.strftime(DATE_FORMAT),
+            "pips_gained_lost": f"{pips:+d}",
+            "profit_loss": f"{profit_loss:.2f}",
+            "currency": "€" if rng.random() < 0.8 else "$",
+            "risk_reward": f"{rng.uniform(0.3, 5.0):.1f}",
+            "strategy_used": rng.choice(STRATEGIES),
+            "time_writing": (opened - timedelta(minutes=rng.randrange(1, 30))).strftime(DATE_FORMAT),
+        }
+
+
+def render_markdown(trade):
+    """
+    Render a raw trade as a journal note following the repository template.
+    """
+    writing_time, writing_date = trade["time_writing"][11:], trade["time_writing"][:10]
+    return (
+        f"- Time writing: {writing_time} {writing_date}\n"
+        f"- Instrument: {trade['instrument']}\n"
+        f"- Position Size: {trade['position_size']}\n"
+        f"- Opened: {trade['opened']}\n"
+        f"- Closed: {trade['closed']}\n"
+        f"- Record link:\n\n"
+        f"## Trade Details\n\n"
+        f"- Order Type: {'Buy' if trade['index'] % 2 else 'Sell'}\n"
+        f"- Pips Gained/Lost: {trade['pips_gained_lost']}\n"
+        f"- Profit/Loss: {trade['profit_loss']}{trade['currency']}\n"
+        f"- R/R: {trade['risk_reward']}\n\n"
+        f"## Strategy\n\n"
+        f"- Strategy Used: {trade['strategy_used']}\n"
+        f"- Reason for Entry:\n"
+        f"    - Synthetic benchmark trade number {trade['index']}.\n\n"
+        f"## Summary and Reflection\n\n"
+        f"Time writing: {writing_time} {writing_date}\n\n"
+        f"- Lessons Learned:\n"
+        f"    - {LESSONS[trade['index'] % len(LESSONS)]}\n"
+    )
+
+
+def generate_markdown_files(out_dir, n, seed=42):
+    """
+    Write n journal notes into out_dir and return their paths.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for trade in synthetic_trades(n, seed):
+        path = os.path.join(out_dir, trade["filename"])
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(render_markdown(trade))
+        paths.append(path)
+    return paths
+
+
+def _database_rows(trades):
+    """
+    Derive the stored columns for a batch of raw trades, as the importer would.
+    """
+    labels = killzones.classify_killzones(
+        [trade["opened"] for trade in trades], [trade["instrument"] for trade in trades]
+    )
+    rows = []
+    for trade, killzone in zip(trades, labels):
+        # No rates are loaded: P/L in another currency is stored as NULL, as the importer does
+        currency = fx.currency_of(trade["currency"])
+        converted = currency == fx.DEFAULT_BASE_CURRENCY
+        opened = datetime.strptime(trade["opened"], DATE_FORMAT)
+        closed = datetime.strptime(trade["closed"], DATE_FORMAT)
+        rows.append((
+            trade["account_id"],
+            trade["filename"],
+            trade["position_size"],
+            trade["opened"],
+            trade["closed"],
+            trade["pips_gained_lost"],
+            trade["profit_loss"] if converted else None,
+            trade["risk_reward"],
+            trade["strategy_used"],
+            opened.strftime("%A"),
+            opened.strftime("%H:%M"),
+            opened.strftime("%B"),
+            max(0, (closed - opened).total_seconds() // 60),
+            killzone,
+            trade["time_writing"],
+            trade["instrument"],
+            render_markdown(trade),
+            currency,
+            trade["profit_loss"],
+            1.0 if converted else None,
+            parser.PARSER_VERSION,
+        ))
+    return rows
+
+
+def generate_database(db_path, n, accounts=20, seed=42):
+    """
+    Create a trades database at db_path holding n trades spread over the given number of accounts.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    previous = database_utils.DB_NAME, database_utils.DATA_DIR
+    database_utils.DB_NAME = db_path
+    database_utils.DATA_DIR = os.path.dirname(os.path.abspath(db_path))
+    try:
+        database_utils.DatabaseManager.setup_database()
+    finally:
+        database_utils.DB_NAME, database_utils.DATA_DIR = previous
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO accounts (name, type) VALUES (?, ?)",
+            [(f"Account {i + 1}", "Real" if i % 2 == 0 else "Paper") for i in range(accounts)],
+        )
+        batch = []
+        for trade in synthetic_trades(n, seed, accounts):
+            batch.append(trade)
+            if len(batch) >= INSERT_BATCH:
+                _insert_rows(cursor, _database_rows(batch))
+                batch = []
+        if batch:
+            _insert_rows(cursor, _database_rows(batch))
+        conn.commit()
+    finally:
+        conn.close()
+    return db_path
+
+
+def _insert_rows(cursor, rows):
+    cursor.executemany("""
+        INSERT INTO trades (
+            account_id, filename, position_size, opened, closed,
+            pips_gained_lost, profit_loss, risk_reward, strategy_used,
+            open_day, open_time, open_month,
+            trade_duration_minutes, killzone, time_writing, instrument, notes,
+            currency, profit_loss_original, fx_rate, parser_version
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic trade journals.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    markdown = subparsers.add_parser("markdown", help="Write N markdown journal notes")
+    markdown.add_argument("out_dir")
+    markdown.add_argument("n", type=int)
+    markdown.add_argument("--seed", type=int, default=42)
+
+    database = subparsers.add_parser("database", help="Create a populated trades.db")
+    database.add_argument("db_path")
+    database.add_argument("n", type=int)
+    database.add_argument("--accounts", type=int, default=20)
+    database.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+    if args.command == "markdown":
+        paths = generate_markdown_files(args.out_dir, args.n, args.seed)
+        print(f"Wrote {len(paths)} journal notes to '{args.out_dir}'.")
+    else:
+        generate_database(args.db_path, args.n, args.accounts, args.seed)
+        print(f"Database '{args.db_path}' populated with {args.n} trades.")
+
+
+if __name__ == "__main__":
+    main()
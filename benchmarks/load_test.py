@@ -0,0 +1,527 @@
+"""
+Load test for the three services: backend API, dashboard and web importer.
+
+It starts the services locally against a generated database, then runs a number of
+simulated users for a fixed time. Each user repeatedly picks a scenario from the mix:
+
+    refresh  load the dashboard page and run every callback of the page
+    switch   select another account (the callbacks depending on the account)
+    upload   import a new journal note through the importer
+    api      call one /stats endpoint of the backend directly
+
+Users are asyncio tasks keeping one HTTP/1.1 connection per service, so hundreds of
+them run from a single process. Requests finished during the warm-up are not counted.
+The report gives, per endpoint and per scenario, the request count, throughput, error
+rate and p50/p95/p99 latency. Its "results" section has the same layout as the
+run_benchmarks.py reports, so two runs can be compared with compare.py
+(`--metric p95_ms`). With the same options and seed every user follows the same
+scenario sequence, which keeps runs comparable.
+
+Usage:
+    python benchmarks/load_test.py --users 20 --duration 60 --mix refresh=5,switch=3,upload=1,api=1
+    python benchmarks/load_test.py --users 50 --production --output after.json
+    python benchmarks/load_test.py --no-start --dashboard-url http://127.0.0.1:8050 ...
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+import uuid
+
+from generate_journal import APP_DIR, database_utils, render_markdown, synthetic_trades
+from run_benchmarks import STATS_ENDPOINTS, cached_database, git_revision
+from startup_report import SERVICES
+
+PORTS = {"backend": 25000, "dashboard": 28050, "importer": 25050}
+SCENARIOS = ("refresh", "switch", "upload", "api")
+DEFAULT_MIX = "refresh=5,switch=3,upload=1,api=1"
+
+# Values the browser sends for dashboard inputs that are not the account
+INITIAL_VALUES = {
+    ("url", "pathname"): "/",
+    ("time-writing-toggle", "value"): False,
+    ("notes-search", "value"): None,
+}
+ACCOUNT_INPUT = ("account-dropdown", "value")
+
+
+class HTTPError(Exception):
+    """
+    Raised for a response with an error status.
+    """
+
+
+class Connection:
+    """
+    Minimal keep-alive HTTP/1.1 client on asyncio streams (no third-party dependency).
+    """
+
+    def __init__(self, base_url, timeout):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b"", headers=None):
+        """
+        Send a request and return (status, body). The connection is reopened when the
+        server closed it.
+        """
+        return await asyncio.wait_for(self._request(method, path, body, headers or {}), self.timeout)
+
+    async def _request(self, method, path, body, headers):
+        for attempt in range(2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+                reused = False
+            else:
+                reused = True
+            lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                     f"Content-Length: {len(body)}", "Accept-Encoding: identity"]
+            lines += [f"{name}: {value}" for name, value in headers.items()]
+            self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+            try:
+                await self.writer.drain()
+                return await self._response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                # A kept-alive connection may have been closed by the server meanwhile
+                if not reused or attempt:
+                    raise
+
+    async def _response(self):
+        status_line = await self.reader.readuntil(b"\r\n")
+        version, status = status_line.split(b" ", 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readuntil(b"\r\n")
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            body = b"".join(chunks)
+        else:
+            body = await self.reader.read()
+            headers["connection"] = "close"
+        if version == b"HTTP/1.0" or headers.get("connection", "").lower() == "close":
+            await self.close()
+        return int(status), body
+
+
+class Recorder:
+    """
+    Collects latency samples and errors per endpoint, ignoring those before `start`.
+    """
+
+    def __init__(self, start):
+        self.start = start
+        self.samples = {}
+        self.errors = {}
+
+    def add(self, name, started, elapsed, error=None):
+        if started < self.start:
+            return
+        self.samples.setdefault(name, []).append(elapsed)
+        if error is not None:
+            errors = self.errors.setdefault(name, {})
+            errors[error] = errors.get(error, 0) + 1
+
+    async def timed(self, name, coroutine):
+        """
+        Await a request coroutine, recording its latency and its error type if it fails.
+        Returns its result, or None on error.
+        """
+        started = time.perf_counter()
+        try:
+            status, body = await coroutine
+            if status >= 400:
+                raise HTTPError(f"HTTP {status}")
+            self.add(name, started, time.perf_counter() - started)
+            return body
+        except (HTTPError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            error = str(e) if isinstance(e, HTTPError) else type(e).__name__
+            self.add(name, started, time.perf_counter() - started, error)
+            return None
+
+    def report(self, measured_seconds):
+        results = {}
+        for name, samples in sorted(self.samples.items()):
+            errors = self.errors.get(name, {})
+            ordered = sorted(samples)
+            results[name] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / measured_seconds, 3),
+                "error_rate": round(sum(errors.values()) / len(samples), 4),
+                "errors": errors,
+                "median_ms": percentile(ordered, 50),
+                "p95_ms": percentile(ordered, 95),
+                "p99_ms": percentile(ordered, 99),
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3),
+            }
+        return results
+
+
+def percentile(ordered, p):
+    """
+    Nearest-rank percentile of sorted samples (seconds), in milliseconds.
+    """
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return round(ordered[rank - 1] * 1000, 3)
+
+
+def parse_mix(text):
+    """
+    Parse "refresh=5,switch=3" into {"refresh": 5.0, "switch": 3.0}.
+    """
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}'. Use: {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class User:
+    """
+    One simulated user with its own connections and its own random sequence.
+    """
+
+    def __init__(self, number, load):
+        self.number = number
+        self.load = load
+        self.rng = random.Random(load.seed * 1000 + number)
+        self.connections = {
+            name: Connection(url, load.timeout) for name, url in load.urls.items()
+        }
+        self.account = self.rng.choice(load.accounts)
+
+    async def close(self):
+        for connection in self.connections.values():
+            await connection.close()
+
+    async def callbacks(self, accounts_only):
+        """
+        Run the dashboard callbacks the browser would fire, concurrently and each on
+        its own connection as a browser does.
+        """
+        requests = []
+        for callback in self.load.callbacks:
+            if accounts_only and ACCOUNT_INPUT not in callback["keys"]:
+                continue
+            inputs = [
+                dict(item, value=self.account if key == ACCOUNT_INPUT else INITIAL_VALUES.get(key))
+                for item, key in zip(callback["inputs"], callback["keys"])
+            ]
+            body = json.dumps({
+                "output": callback["output"],
+                "outputs": callback["outputs"],
+                "inputs": inputs,
+                "changedPropIds": [f"{item['id']}.{item['property']}" for item in inputs],
+                "state": callback["state"],
+            }).encode()
+            connection = Connection(self.load.urls["dashboard"], self.load.timeout)
+            requests.append(self._callback(connection, callback["name"], body))
+        await asyncio.gather(*requests)
+
+    async def _callback(self, connection, name, body):
+        try:
+            await self.load.recorder.timed(
+                f"dashboard POST callback {name}",
+                connection.request("POST", "/_dash-update-component", body, {"Content-Type": "application/json"}),
+            )
+        finally:
+            await connection.close()
+
+    async def refresh(self):
+        dashboard = self.connections["dashboard"]
+        for path in ("/", "/_dash-layout", "/_dash-dependencies"):
+            await self.load.recorder.timed(f"dashboard GET {path}", dashboard.request("GET", path))
+        await self.callbacks(accounts_only=False)
+
+    async def switch(self):
+        others = [account for account in self.load.accounts if account != self.account]
+        self.account = self.rng.choice(others or self.load.accounts)
+        await self.callbacks(accounts_only=True)
+
+    async def upload(self):
+        trade = self.load.next_trade()
+        boundary = uuid.uuid4().hex
+        filename = f"load_{self.load.run_id}_{trade['index']}.md"
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"account_id\"\r\n\r\n{self.account}\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: text/markdown\r\n\r\n"
+        ).encode() + render_markdown(trade).encode() + f"\r\n--{boundary}--\r\n".encode()
+        await self.load.recorder.timed("importer POST /upload", self.connections["importer"].request(
+            "POST", "/upload", body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        ))
+
+    async def api(self):
+        endpoint = self.rng.choice(STATS_ENDPOINTS)
+        await self.load.recorder.timed(
+            f"backend GET {endpoint}",
+            self.connections["backend"].request("GET", f"{endpoint}?account_id={self.account}"),
+        )
+
+    async def run(self, deadline):
+        names, weights = zip(*self.load.mix.items())
+        try:
+            while time.perf_counter() < deadline:
+                scenario = self.rng.choices(names, weights)[0]
+                started = time.perf_counter()
+                await getattr(self, scenario)()
+                self.load.recorder.add(f"scenario {scenario}", started, time.perf_counter() - started)
+                if self.load.think:
+                    await asyncio.sleep(self.rng.expovariate(1 / self.load.think))
+        finally:
+            await self.close()
+
+
+
+class LoadTest:
+    """
+    Shared state of a run: service addresses, dashboard callbacks, accounts and notes.
+    """
+
+    def __init__(self, urls, accounts, mix, seed, think, timeout):
+        self.urls = urls
+        self.accounts = accounts
+        self.mix = mix
+        self.seed = seed
+        self.think = think
+        self.timeout = timeout
+        self.run_id = uuid.uuid4().hex[:8]
+        self.callbacks = load_callbacks(urls["dashboard"])
+        self.recorder = None
+        # Notes are generated on demand from a seed no generated database uses
+        self._trades = synthetic_trades(10 ** 9, seed + 7919, 1)
+
+    def next_trade(self):
+        return next(self._trades)
+
+    async def run(self, users, duration, warmup):
+        start = time.perf_counter()
+        self.recorder = Recorder(start + warmup)
+        deadline = start + warmup + duration
+        await asyncio.gather(*(User(number, self).run(deadline) for number in range(users)))
+        return time.perf_counter() - (start + warmup)
+
+
+def load_callbacks(dashboard_url):
+    """
+    Read the dashboard's callback definitions from Dash and keep those the page fires
+    on load, i.e. whose inputs are all known initial values or the account.
+    """
+    with urllib.request.urlopen(f"{dashboard_url}/_dash-dependencies", timeout=30) as response:
+        dependencies = json.load(response)
+    callbacks = []
+    for dependency in dependencies:
+        keys = [(item["id"], item["property"]) for item in dependency["inputs"]]
+        if not all(key in INITIAL_VALUES or key == ACCOUNT_INPUT for key in keys):
+            continue
+        output = dependency["output"]
+        if output.startswith(".."):
+            targets = [target.rsplit(".", 1) for target in output.strip(".").split("...")]
+            outputs = [{"id": target_id, "property": prop} for target_id, prop in targets]
+        else:
+            target_id, prop = output.rsplit(".", 1)
+            outputs = {"id": target_id, "property": prop}
+        first = outputs[0] if isinstance(outputs, list) else outputs
+        callbacks.append({
+            "name": first["id"],
+            "output": output,
+            "outputs": outputs,
+            "inputs": [{"id": item["id"], "property": item["property"]} for item in dependency["inputs"]],
+            "keys": keys,
+            "state": [{"id": item["id"], "property": item["property"]} for item in dependency.get("state", [])],
+        })
+    return callbacks
+
+
+def wait_until_ready(url, process=None, timeout=120):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Service behind {url} exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not answer within {timeout}s")
+
+
+def upgrade_schema(db_path):
+    """
+    Apply schema additions to a cached database generated by an older revision, as the
+    launcher does on start.
+    """
+    previous = database_utils.DB_NAME, database_utils.DATA_DIR
+    database_utils.DB_NAME = db_path
+    database_utils.DATA_DIR = os.path.dirname(db_path)
+    try:
+        database_utils.DatabaseManager.setup_database()
+    finally:
+        database_utils.DB_NAME, database_utils.DATA_DIR = previous
+
+
+def start_services(data_dir, production, env):
+    """
+    Start the services on the load-test ports, either as the development servers or
+    through `launcher.py --production` (waitress workers). Returns the processes.
+    """
+    env = dict(env, TRADESTAT_DATA_DIR=data_dir, TRADESTAT_MAINTENANCE="off",
+               TRADESTAT_BACKEND_URL=f"http://127.0.0.1:{PORTS['backend']}",
+               TRADESTAT_IMPORTER_URL=f"http://127.0.0.1:{PORTS['importer']}")
+    for name, (_, _, port_variable, _) in SERVICES.items():
+        env[port_variable] = str(PORTS[name])
+    log = open(os.path.join(data_dir, "services.log"), "wb")
+    if production:
+        commands = [[sys.executable, "launcher.py", "--production"]]
+    else:
+        commands = [[sys.executable, script] for _, script, _, _ in SERVICES.values()]
+    processes = [
+        subprocess.Popen(command, cwd=APP_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+        for command in commands
+    ]
+    try:
+        for i, (name, (_, _, _, health)) in enumerate(SERVICES.items()):
+            wait_until_ready(f"http://127.0.0.1:{PORTS[name]}{health}", processes[0 if production else i])
+    except Exception:
+        stop_services(processes)
+        raise
+    return processes
+
+
+def stop_services(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def account_ids(backend_url):
+    with urllib.request.urlopen(f"{backend_url}/accounts", timeout=30) as response:
+        return [account["id"] for account in json.load(response)]
+
+
+def print_table(results):
+    print(f"{'endpoint':<58} {'requests':>8} {'req/s':>8} {'errors':>7} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, result in results.items():
+        print(f"{name:<58} {result['requests']:>8} {result['throughput_rps']:>8.1f} "
+              f"{result['error_rate']:>7.1%} {result['median_ms']:>9.1f} "
+              f"{result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the backend, dashboard and importer.")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=60, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=10, help="Seconds run before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument("--think", type=float, default=1.0,
+                        help="Mean pause between a user's scenarios in seconds (0 for none)")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds before a request counts as failed")
+    parser.add_argument("--size", type=int, default=100000, help="Trades in the generated database")
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--production", action="store_true",
+                        help="Serve through launcher.py --production (waitress workers)")
+    parser.add_argument("--no-start", action="store_true",
+                        help="Use services that are already running at the given URLs")
+    parser.add_argument("--backend-url", default=f"http://127.0.0.1:{PORTS['backend']}")
+    parser.add_argument("--dashboard-url", default=f"http://127.0.0.1:{PORTS['dashboard']}")
+    parser.add_argument("--importer-url", default=f"http://127.0.0.1:{PORTS['importer']}")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    urls = {"backend": args.backend_url, "dashboard": args.dashboard_url, "importer": args.importer_url}
+    data_dir = processes = None
+    if not args.no_start:
+        # Uploads write to the database, so every run starts from a fresh copy
+        data_dir = tempfile.mkdtemp(prefix="tse_load_")
+        db_path = os.path.join(data_dir, "trades.db")
+        shutil.copy(cached_database(args.size, args.accounts, args.seed), db_path)
+        upgrade_schema(db_path)
+        print(f"Starting the services ({'production' if args.production else 'development'} servers)...")
+        processes = start_services(data_dir, args.production, os.environ)
+    try:
+        load = LoadTest(urls, account_ids(urls["backend"]), mix, args.seed, args.think, args.timeout)
+        print(f"Running {args.users} users for {args.warmup:g}s warm-up + {args.duration:g}s ({args.mix})...")
+        measured = asyncio.run(load.run(args.users, args.duration, args.warmup))
+    finally:
+        if processes:
+            stop_services(processes)
+        if data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    results = load.recorder.report(measured)
+    print_table(results)
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "mix": mix,
+            "think": args.think,
+            "size": None if args.no_start else args.size,
+            "accounts": args.accounts,
+            "seed": args.seed,
+            "production": args.production,
+            "measured_seconds": round(measured, 3),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"Report written to '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Peak memory of the per-trade stats endpoints and the dashboard as an account grows.
+
+For every size, a fresh process loads the backend against a generated single-account
+database, warms it up on a tiny account, then calls each endpoint (or builds the whole
+dashboard) and reports the peak resident set size (ru_maxrss) reached. The per-trade
+endpoints read in chunks of TRADESTAT_STREAM_CHUNK rows and keep at most
+TRADESTAT_MAX_POINTS points, so the peak must not follow the account size: the run
+fails (exit code 1) when the largest size peaks more than --max-growth above the
+smallest one.
+
+Usage:
+    python benchmarks/memory_report.py                       # 10000 and 1000000 trades
+    python benchmarks/memory_report.py --sizes 5000 500000 --max-growth 1.2 --output rss.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from generate_journal import APP_DIR
+from run_benchmarks import git_revision
+
+TARGETS = [
+    "/stats/pnl",
+    "/stats/monthly",
+    "/stats/reward_ratios",
+    "/stats/duration_heatmap",
+    "dashboard",
+]
+
+# Run in a child process so every measurement starts from the same clean interpreter
+CHILD = r"""
+import contextlib, io, json, resource, sys
+
+db_path, target = sys.argv[1], sys.argv[2]
+sys.path.insert(0, ".")
+import app as backend
+from utils import storage
+
+backend.store = storage.SQLiteStorage(db_path)
+client = backend.app.test_client()
+
+
+def fetch_data(endpoint, params=None):
+    response = client.get(endpoint, query_string=params)
+    return response.get_json() if response.status_code == 200 else {}
+
+
+def peak_mb():
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+if target == "dashboard":
+    with contextlib.redirect_stdout(io.StringIO()):
+        import dashboard
+    dashboard.fetch_data = fetch_data
+    run = lambda account_id: dashboard.update_dashboard(account_id, False)
+else:
+    run = lambda account_id: fetch_data(target, {"account_id": account_id})
+
+# Warm up imports and caches on an account without trades
+run("0")
+baseline = peak_mb()
+run("1")
+print(json.dumps({"baseline_mb": round(baseline, 1), "peak_mb": round(peak_mb(), 1)}))
+"""
+
+
+def prepare_database(size, seed):
+    """
+    Path of the generated single-account database, built in a separate process: on Linux
+    a child starts with its parent's peak RSS, which generating it would inflate.
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", f"from run_benchmarks import cached_database; print(cached_database({size}, 1, {seed}))"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+    ).stdout
+    return output.strip().splitlines()[-1]
+
+
+def measure(db_path, target):
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, db_path, target],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+        env=dict(os.environ, TRADESTAT_REPLICA_INTERVAL="0"),
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report peak RSS of the per-trade endpoints by account size.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 1000000],
+                        help="Trades in the single account, smallest first")
+    parser.add_argument("--targets", nargs="+", default=TARGETS, help="Endpoints and/or 'dashboard'")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-growth", type=float, default=1.25,
+                        help="Largest allowed ratio of peak RSS between the largest and smallest size")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    sizes = sorted(args.sizes)
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "max_growth": args.max_growth,
+        },
+        "results": {},
+    }
+    databases = {size: prepare_database(size, args.seed) for size in sizes}
+    failures = []
+    print(f"{'target':<28}" + "".join(f"{size:>14,}" for size in sizes) + "    growth")
+    for target in args.targets:
+        peaks = []
+        for size in sizes:
+            result = measure(databases[size], target)
+            report["results"][f"rss.{target}.{size}"] = result
+            peaks.append(result["peak_mb"])
+        growth = peaks[-1] / peaks[0]
+        print(f"{target:<28}" + "".join(f"{peak:>11.1f} MB" for peak in peaks) + f"{growth:>9.2f}x")
+        if growth > args.max_growth:
+            failures.append(target)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to '{args.output}'.")
+    if failures:
+        print(f"Peak RSS grew more than {args.max_growth}x with the account size: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Repeatable timings for ingest, the /stats/* endpoints and dashboard figure building.
+
+Every run writes a JSON report (one entry per benchmark with min/median/mean in
+milliseconds) that can be diffed between commits with benchmarks/compare.py.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 --output before.json
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 1000000 --repeat 3
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+from generate_journal import APP_DIR, generate_database, generate_markdown_files
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+
+STATS_ENDPOINTS = [
+    "/accounts",
+    "/stats/summary",
+    "/stats/pnl",
+    "/stats/duration_heatmap",
+    "/stats/duration_histogram",
+    "/stats/monthly",
+    "/stats/daily",
+    "/stats/killzone",
+    "/stats/killzone_outcomes",
+    "/stats/best_worst_trade",
+    "/stats/reward_ratios",
+    "/stats/reward_ratio_summary",
+    "/stats/average_trade_duration",
+    "/stats/strategy_success",
+]
+
+
+def measure(func, repeat, warmup=1):
+    """
+    Run func warmup + repeat times and summarize the timed runs in milliseconds.
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "mean_ms": round(statistics.mean(samples), 3),
+        "repeat": repeat,
+    }
+
+
+def cached_database(size, accounts, seed):
+    """
+    Return the path of a generated database, building it on first use.
+    """
+    path = os.path.join(CACHE_DIR, f"trades_{size}_{accounts}_{seed}.db")
+    if not os.path.exists(path):
+        print(f"Generating {size} trades across {accounts} accounts...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_database(path, size, accounts, seed)
+    return path
+
+
+def bench_ingest(files, repeat, seed):
+    """
+    Time parsing every generated note and inserting it into an empty database.
+    """
+    import web_importer
+    from utils import storage
+
+    work_dir = tempfile.mkdtemp(prefix="tse_ingest_")
+    try:
+        paths = generate_markdown_files(os.path.join(work_dir, "notes"), files, seed)
+        db_path = os.path.join(work_dir, "trades.db")
+        previous = web_importer.store
+
+        def parse_all():
+            for path in paths:
+                web_importer.parse_markdown_file(path)
+
+        def ingest_all():
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_database(db_path, 0, 1, seed)
+            web_importer.store = storage.SQLiteStorage(db_path)
+            for path in paths:
+                web_importer.insert_trade_into_db(web_importer.parse_markdown_file(path), "1")
+
+        try:
+            results = {
+                "ingest.parse": measure(parse_all, repeat),
+                "ingest.parse_insert": measure(ingest_all, repeat),
+            }
+        finally:
+            web_importer.store = previous
+        for result in results.values():
+            result["files"] = files
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def largest_account(db_path):
+    import sqlite3
+
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT account_id FROM trades GROUP BY account_id ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row else "1"
+    finally:
+        conn.close()
+
+
+@contextlib.contextmanager
+def backend_store(db_path, engine="sqlite"):
+    """
+    Point the backend at db_path using the given storage engine, restoring it afterwards.
+    The DuckDB copy is built up front in a temporary directory, so timings exclude the load.
+    """
+    import app as backend
+    from utils import storage
+
+    previous = backend.store
+    work_dir = None
+    if engine == "duckdb":
+        work_dir = tempfile.mkdtemp(prefix="tse_duckdb_")
+        store = storage.DuckDBStorage(db_path, path=os.path.join(work_dir, "trades.duckdb"), interval=float("inf"))
+        start = time.perf_counter()
+        store.refresh()
+        print(f"  DuckDB copy loaded in {time.perf_counter() - start:.2f}s")
+    else:
+        store = storage.SQLiteStorage(db_path)
+    backend.store = store
+    try:
+        yield backend
+    finally:
+        backend.store = previous
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_endpoints(db_path, account_id, repeat, engine="sqlite"):
+    """
+    Time every stats endpoint through Flask's test client against the given database.
+    """
+    results = {}
+    with backend_store(db_path, engine) as backend:
+        client = backend.app.test_client()
+        for endpoint in STATS_ENDPOINTS:
+            def call(endpoint=endpoint):
+                response = client.get(endpoint, query_string={"account_id": account_id})
+                if response.status_code != 200:
+                    raise RuntimeError(f"{endpoint} returned {response.status_code}")
+                return response
+
+            result = measure(call, repeat)
+            result["bytes"] = len(call().get_data())
+            # SQLite keeps the historical key names so reports stay comparable across commits
+            prefix = "endpoint" if engine == "sqlite" else f"{engine}.endpoint"
+            results[f"{prefix}{endpoint}"] = result
+    return results
+
+
+def bench_dashboard(db_path, account_id, repeat):
+    """
+    Time update_dashboard end to end, with its backend calls served by the Flask test client.
+    """
+    import app as backend
+    from utils import storage
+    with contextlib.redirect_stdout(io.StringIO()):
+        import dashboard
+
+    previous_store, previous_fetch = backend.store, dashboard.fetch_data
+    backend.store = storage.SQLiteStorage(db_path)
+    client = backend.app.test_client()
+
+    def fetch_data(endpoint, params=None):
+        response = client.get(endpoint, query_string=params)
+        return response.get_json() if response.status_code == 200 else {}
+
+    # Pre-fetch the responses once so the figure timing excludes the backend
+    responses = {}
+
+    def recording_fetch(endpoint, params=None):
+        responses[(endpoint, str(params))] = fetch_data(endpoint, params)
+        return responses[(endpoint, str(params))]
+
+    def replay_fetch(endpoint, params=None):
+        return responses[(endpoint, str(params))]
+
+    try:
+        dashboard.fetch_data = fetch_data
+        results = {"dashboard.update_end_to_end": measure(
+            lambda: dashboard.update_dashboard(account_id, False), repeat
+        )}
+        dashboard.fetch_data = recording_fetch
+        dashboard.update_dashboard(account_id, False)
+        dashboard.fetch_data = replay_fetch
+        results["dashboard.figures_only"] = measure(
+            lambda: dashboard.update_dashboard(account_id, False), repeat
+        )
+    finally:
+        backend.store, dashboard.fetch_data = previous_store, previous_fetch
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the TradeStatEngine benchmark suite.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000],
+                        help="Database sizes in trades (e.g. 1000 100000 1000000)")
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--ingest-files", type=int, default=500,
+                        help="Number of markdown notes parsed and inserted by the ingest benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--engines", nargs="+", default=["sqlite"], choices=["sqlite", "duckdb"],
+                        help="Storage engines to time the endpoints on (duckdb needs `pip install duckdb`)")
+    parser.add_argument("--skip-dashboard", action="store_true")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    os.chdir(APP_DIR)
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "accounts": args.accounts,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+
+    print(f"Benchmarking ingest of {args.ingest_files} notes...")
+    report["results"].update(bench_ingest(args.ingest_files, args.repeat, args.seed))
+
+    for size in args.sizes:
+        db_path = cached_database(size, args.accounts, args.seed)
+        account_id = largest_account(db_path)
+        print(f"Benchmarking {size} trades (account {account_id})...")
+        for engine in args.engines:
+            for name, result in bench_endpoints(db_path, account_id, args.repeat, engine).items():
+                report["results"][f"{size}.{name}"] = result
+        if not args.skip_dashboard:
+            for name, result in bench_dashboard(db_path, account_id, args.repeat).items():
+                report["results"][f"{size}.{name}"] = result
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"Report written to '{args.output}'.")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
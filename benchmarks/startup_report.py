@@ -0,0 +1,112 @@
+"""
+Startup-time report for the three services.
+
+For each service it records `python -X importtime` for the module (total import time
+and the slowest top-level imports), and the wall-clock time from process start until
+the service answers its health endpoint.
+
+Usage:
+    python benchmarks/startup_report.py [--top 10] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from generate_journal import APP_DIR, generate_database
+
+# Service -> (module, script, port environment variable, health path)
+SERVICES = {
+    "backend": ("app", "app.py", "TRADESTAT_BACKEND_PORT", "/stats/health"),
+    "dashboard": ("dashboard", "dashboard.py", "TRADESTAT_DASHBOARD_PORT", "/health"),
+    "importer": ("web_importer", "web_importer.py", "TRADESTAT_IMPORTER_PORT", "/health"),
+}
+PORTS = {"backend": 15000, "dashboard": 18050, "importer": 15050}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(module, env, top):
+    """
+    Run `python -X importtime -c "import <module>"` and summarize its output.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR, env=env, capture_output=True, text=True,
+    )
+    imports = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, name = int(match.group(2)), match.group(4)
+        # Nesting is shown as two extra spaces per level: one space is a top-level import
+        depth = (len(match.group(3)) + 1) // 2
+        if depth == 1:
+            total_us += cumulative
+        elif depth == 2:
+            imports.append({"module": name, "cumulative_ms": round(cumulative / 1000, 2)})
+    imports.sort(key=lambda item: item["cumulative_ms"], reverse=True)
+    return {"import_ms": round(total_us / 1000, 2), "slowest_imports": imports[:top]}
+
+
+def time_to_ready(script, port_variable, port, health, env, timeout=60):
+    """
+    Start a service script and measure how long it takes to answer its health endpoint.
+    """
+    env = dict(env, **{port_variable: str(port)})
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, script], cwd=APP_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                return None
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{health}", timeout=1) as response:
+                    if response.status == 200:
+                        return round((time.perf_counter() - start) * 1000, 1)
+            except OSError:
+                time.sleep(0.02)
+        return None
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report service startup times.")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="tse_startup_")
+    generate_database(os.path.join(data_dir, "trades.db"), 100, 2)
+    env = dict(os.environ, TRADESTAT_DATA_DIR=data_dir,
+               TRADESTAT_BACKEND_URL=f"http://127.0.0.1:{PORTS['backend']}")
+
+    report = {}
+    for name, (module, script, port_variable, health) in SERVICES.items():
+        print(f"Measuring {name}...")
+        report[name] = import_profile(module, env, args.top)
+        report[name]["ready_ms"] = time_to_ready(script, port_variable, PORTS[name], health, env)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"Report written to '{args.output}'.")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Shared fixtures: the app modules run against a throwaway data directory.
+
+TRADESTAT_DATA_DIR is read when utils.config is imported, so it is set here, before any
+test imports the app.
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app"))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+os.environ["TRADESTAT_DATA_DIR"] = tempfile.mkdtemp(prefix="tradestat-tests-")
+os.environ["TRADESTAT_STORAGE"] = "sqlite"
+os.environ["TRADESTAT_SHARDING"] = "off"
+os.environ["TRADESTAT_REPLICA_INTERVAL"] = "0"
+
+DATE_FORMAT = "%d/%m/%Y %H:%M"
+ACCOUNTS = ["1", "2", "3"]
+STRATEGIES = ["Breaker Block", "Order Block", "FVG Retest", None]
+KILLZONES = ["London", "New York", "Asia", None]
+# Text as written in the journal: '#' is an unknown result, the rest must be ignored too
+UNKNOWN_VALUES = ["#", "", None, "n/a"]
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """
+    An empty trades database (schema, cube and leaderboards) in a fresh directory.
+    """
+    from utils import database_utils
+
+    monkeypatch.setattr(database_utils, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(database_utils, "DB_NAME", str(tmp_path / "trades.db"))
+    database_utils.DatabaseManager.setup_database()
+    return database_utils.DatabaseManager
+
+
+def _random_trade(rng, index):
+    """
+    A trade dict as insert_trades takes it, with some missing or non-numeric values.
+    """
+    opened = datetime(2022, 1, 1) + timedelta(minutes=rng.randrange(0, 3 * 365 * 24 * 60))
+    profit_loss = f"{rng.uniform(-200, 200):.2f}" if rng.random() > 0.1 else rng.choice(UNKNOWN_VALUES)
+    return {
+        "account_id": rng.choice(ACCOUNTS),
+        "filename": f"trade_{index:05d}.md",
+        "opened": opened.strftime(DATE_FORMAT) if rng.random() > 0.05 else None,
+        "open_day": opened.strftime("%A"),
+        # Some P/L waits for an FX rate: NULL, with the amount as written kept aside
+        "profit_loss": profit_loss if rng.random() > 0.1 else None,
+        "profit_loss_original": profit_loss,
+        "pips_gained_lost": f"{rng.randint(-80, 120):+d}" if rng.random() > 0.1 else rng.choice(UNKNOWN_VALUES),
+        "risk_reward": f"{rng.uniform(0.3, 5.0):.1f}" if rng.random() > 0.1 else rng.choice(UNKNOWN_VALUES),
+        "strategy_used": rng.choice(STRATEGIES),
+        "killzone": rng.choice(KILLZONES),
+        "trade_duration_minutes": float(rng.randrange(1, 480)) if rng.random() > 0.1 else None,
+    }
+
+
+def _churn(manager, rng, rounds=5, batch=60):
+    """
+    Random inserts, updates (moving trades to another account and date) and deletes
+    through the DatabaseManager, yielding after every round.
+    """
+    store = manager.storage()
+    index = 0
+    for _ in range(rounds):
+        trades = [_random_trade(rng, index + i) for i in range(batch)]
+        index += batch
+        result = manager.insert_trades(trades, chunk_size=16)
+        assert result["inserted"] == batch and not result["failed"]
+
+        ids = [row[0] for row in store.query("SELECT id FROM trades")]
+        with store.transaction() as conn:
+            for trade_id in rng.sample(ids, len(ids) // 4):
+                changed = _random_trade(rng, trade_id)
+                conn.execute(
+                    "UPDATE trades SET account_id = ?, opened = ?, open_day = ?, profit_loss = ?, "
+                    "profit_loss_original = ?, pips_gained_lost = ?, strategy_used = ?, killzone = ? WHERE id = ?",
+                    (changed["account_id"], changed["opened"], changed["open_day"], changed["profit_loss"],
+                     changed["profit_loss_original"], changed["pips_gained_lost"], changed["strategy_used"],
+                     changed["killzone"], trade_id)
+                )
+
+        rows = store.query("SELECT id, account_id FROM trades")
+        for account_id in ACCOUNTS:
+            owned = [str(trade_id) for trade_id, owner in rows if owner == account_id]
+            doomed = rng.sample(owned, len(owned) // 5)
+            assert manager.delete_entries(account_id, doomed)["deleted"] == len(doomed)
+        yield
+
+
+@pytest.fixture
+def churn(database):
+    """
+    Generator function changing the trades of `database` at random (see _churn), with a fixed seed.
+    """
+    rng = random.Random(42)
+    return lambda rounds=5, batch=60: _churn(database, rng, rounds, batch)
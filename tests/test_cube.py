@@ -0,0 +1,34 @@
+from utils import cube, outcomes
+
+
+def test_cube_matches_rebuild_after_random_changes(database, churn):
+    store = database.storage()
+    for _ in churn():
+        with store.transaction() as conn:
+            assert cube.verify(conn.cursor()) == []
+
+
+def test_cube_follows_the_break_even_threshold(database, churn):
+    store = database.storage()
+    for _ in churn(rounds=2):
+        pass
+    outcomes.set_threshold(store, "1", 50)
+    with store.transaction() as conn:
+        assert cube.verify(conn.cursor()) == []
+
+
+def test_verify_reports_a_stale_cell(database, churn):
+    store = database.storage()
+    for _ in churn(rounds=1):
+        pass
+    with store.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT account_id, weekday, hour, killzone, outcome, strategy FROM {cube.CUBE_TABLE} LIMIT 1")
+        key = cursor.fetchone()
+        cursor.execute(
+            f"UPDATE {cube.CUBE_TABLE} SET trades = trades + 1 WHERE account_id = ? AND weekday = ? "
+            "AND hour = ? AND killzone = ? AND outcome = ? AND strategy = ?", key
+        )
+        assert len(cube.verify(cursor)) == 1
+        cube.rebuild(cursor)
+        assert cube.verify(cursor) == []
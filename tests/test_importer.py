@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def importer(database):
+    import web_importer
+
+    return web_importer
+
+
+def test_internal_job_kinds_cannot_be_submitted(importer, tmp_path):
+    victim = tmp_path / "victim"
+    victim.mkdir()
+    response = importer.app.test_client().post("/jobs", json={
+        "kind": "import_upload", "payload": {"spool": str(victim), "files": [], "account_id": "1"},
+    })
+    assert response.status_code == 400
+    assert "import_upload" not in response.get_json()["kinds"]
+    assert victim.exists()
+
+
+def test_spool_path_stays_inside_the_spool_directory(importer, tmp_path):
+    root = os.path.realpath(importer.SPOOL_DIR)
+    assert importer.spool_path("0123abcd") == os.path.join(root, "0123abcd")
+    for name in (str(tmp_path), "..", "../..", "a/b", "", "."):
+        assert importer.spool_path(name) is None
+
+
+def test_upload_job_refuses_a_spool_outside_the_spool_directory(importer, tmp_path):
+    victim = tmp_path / "victim"
+    victim.mkdir()
+    with pytest.raises(ValueError):
+        importer.import_upload_job(None, {"spool": str(victim), "files": [], "account_id": "1"})
+    assert victim.exists()
+
+
+def test_a_non_integer_priority_is_rejected(importer):
+    response = importer.app.test_client().post("/jobs", json={"kind": "reclassify_killzones", "priority": "high"})
+    assert response.status_code == 400
+    assert "priority" in response.get_json()["error"]
+
+
+def test_reparse_workers_are_integers_within_the_default(importer):
+    client = importer.app.test_client()
+    for workers in ("many", 2.5, None):
+        response = client.post("/jobs", json={"kind": "reparse_trades", "payload": {"workers": workers}})
+        assert response.status_code == 400
+    assert importer.reparse_workers(10000) == importer.reparse.DEFAULT_WORKERS
+    assert importer.reparse_workers("0") == 1
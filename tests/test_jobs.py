@@ -0,0 +1,55 @@
+from utils import jobs
+
+
+def queues(tmp_path):
+    first, second = (jobs.JobQueue(str(tmp_path / "jobs.db")) for _ in range(2))
+    for queue in (first, second):
+        queue.register("noop", lambda context, payload: None)
+        queue._ensure_schema()
+    return first, second
+
+
+def submit(queue):
+    # Queue without starting worker threads, so the test claims the job itself
+    conn = queue._connect()
+    try:
+        job_id = conn.execute(
+            "INSERT INTO jobs (kind, payload, priority, status, created_at, updated_at) VALUES ('noop', '{}', 5, ?, ?, ?)",
+            (jobs.QUEUED, jobs._now(), jobs._now())
+        ).lastrowid
+        conn.commit()
+    finally:
+        conn.close()
+    return job_id
+
+
+def test_a_starting_process_leaves_running_jobs_of_others_alone(tmp_path):
+    first, second = queues(tmp_path)
+    job_id = submit(first)
+    assert first._claim(True)["id"] == job_id
+
+    second._ensure_schema()
+    assert second.get(job_id)["status"] == jobs.RUNNING
+    assert second._claim(True) is None
+    assert first.update_progress(job_id, progress=1) is False
+
+
+def test_a_job_with_an_expired_lease_is_requeued_once(tmp_path):
+    first, second = queues(tmp_path)
+    job_id = submit(first)
+    first._claim(True)
+    conn = first._connect()
+    conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (jobs._now(-2 * jobs.LEASE_SECONDS), job_id))
+    conn.commit()
+    conn.close()
+
+    second._requeue_expired()
+    assert second._claim(True)["id"] == job_id
+    assert second.get(job_id)["owner"] == second.owner
+
+    # The first owner is told to stop and cannot overwrite the new run's result
+    assert first.update_progress(job_id, progress=1) is True
+    first._finish(job_id, jobs.FAILED, error="stale")
+    assert second.get(job_id)["status"] == jobs.RUNNING
+    second._finish(job_id, jobs.SUCCEEDED)
+    assert second.get(job_id)["status"] == jobs.SUCCEEDED
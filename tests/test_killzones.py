@@ -0,0 +1,27 @@
+from utils import killzones
+
+# Europe/Rome skips 02:00-03:00 on 31/03/2024; sessions in UTC split the possible readings
+GAP_CONFIG = {
+    "journal_timezone": "Europe/Rome",
+    "instruments": {
+        "default": {
+            "timezone": "UTC",
+            "sessions": [
+                {"name": "Early", "start": "01:00", "end": "01:30"},
+                {"name": "Late", "start": "01:30", "end": "02:00"},
+            ],
+        },
+    },
+}
+
+
+def test_import_and_backfill_agree_on_a_dst_gap(tmp_path, monkeypatch):
+    monkeypatch.setattr(killzones, "SESSIONS_FILE", str(tmp_path / "killzones.json"))
+    killzones.save_config(GAP_CONFIG)
+    try:
+        opened = ["31/03/2024 02:30", "31/03/2024 01:15", "27/10/2024 02:30"]
+        expected = killzones.classify_killzones(opened)
+        assert expected[0] == "Early"
+        assert [killzones.determine_killzone(value) for value in opened] == expected
+    finally:
+        killzones._config_cache["config"] = None
@@ -0,0 +1,20 @@
+from utils import leaderboard
+
+
+def test_leaderboards_match_brute_force_after_random_changes(database, churn):
+    store = database.storage()
+    for _ in churn():
+        with store.transaction() as conn:
+            assert leaderboard.verify(conn.cursor()) == []
+
+
+def test_verify_reports_a_stale_rank(database, churn):
+    store = database.storage()
+    for _ in churn(rounds=1):
+        pass
+    with store.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"DELETE FROM {leaderboard.RANK_TABLE} WHERE trade_id = (SELECT MAX(trade_id) FROM {leaderboard.RANK_TABLE})")
+        assert leaderboard.verify(cursor)
+        leaderboard.rebuild(cursor)
+        assert leaderboard.verify(cursor) == []
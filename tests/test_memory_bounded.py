@@ -0,0 +1,43 @@
+"""
+Peak memory of the per-trade endpoints must not follow the size of the account: they
+read in chunks and cap the number of points, so 100x more trades stays within 1.25x.
+Same measurement as benchmarks/memory_report.py, on smaller databases.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+BENCHMARKS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+if BENCHMARKS_DIR not in sys.path:
+    sys.path.insert(0, BENCHMARKS_DIR)
+
+from memory_report import measure  # noqa: E402
+
+SIZES = [1000, 100000]
+MAX_GROWTH = 1.25
+
+
+@pytest.fixture(scope="module")
+def databases(tmp_path_factory):
+    """
+    Single-account databases of every size, each generated in its own process: on Linux
+    a child starts with its parent's peak RSS, which generating them here would inflate.
+    """
+    folder = tmp_path_factory.mktemp("memory")
+    paths = {}
+    for size in SIZES:
+        paths[size] = str(folder / f"trades_{size}.db")
+        subprocess.run(
+            [sys.executable, "-c", f"from generate_journal import generate_database; "
+                                   f"generate_database({paths[size]!r}, {size}, accounts=1)"],
+            cwd=BENCHMARKS_DIR, capture_output=True, check=True,
+        )
+    return paths
+
+
+@pytest.mark.parametrize("endpoint", ["/stats/pnl", "/stats/reward_ratios", "/stats/duration_heatmap"])
+def test_peak_rss_does_not_grow_with_the_account(databases, endpoint):
+    small, large = (measure(databases[size], endpoint)["peak_mb"] for size in SIZES)
+    assert large / small < MAX_GROWTH, f"{endpoint}: {small} MB -> {large} MB"
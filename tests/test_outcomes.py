@@ -0,0 +1,39 @@
+import pytest
+
+from utils import cube, outcomes
+
+
+@pytest.fixture
+def backend(database, monkeypatch):
+    import app as backend
+
+    monkeypatch.setattr(backend, "store", database.storage())
+    return backend.app.test_client()
+
+
+def test_a_trade_without_an_fx_rate_keeps_its_count_and_outcome(database, backend):
+    database.storage().execute("INSERT INTO accounts (name, type) VALUES ('EUR account', 'Real')")
+    trade = {"account_id": "1", "opened": "04/03/2024 09:30", "open_day": "Monday", "killzone": "London"}
+    result = database.insert_trades([
+        dict(trade, filename="eur.md", profit_loss="30.00", currency="EUR"),
+        # No USD rate is loaded: stored without a base-currency P/L
+        dict(trade, filename="usd.md", profit_loss="-20.00", currency="USD"),
+    ])
+    assert result["inserted"] == 2
+    rows = database.storage().query("SELECT filename, profit_loss, profit_loss_original FROM trades ORDER BY filename")
+    assert rows == [("eur.md", "30.00", "30.00"), ("usd.md", None, "-20.00")]
+
+    summary = backend.get("/stats/summary?account_id=1").get_json()
+    assert (summary["total_trades"], summary["total_wins"], summary["total_losses"], summary["total_unknowns"]) == (2, 1, 1, 0)
+    assert backend.get("/stats/killzone?account_id=1").get_json() == {"London": {"Monday": 2}}
+    assert backend.get("/stats/killzone_outcomes?account_id=1").get_json()["London"]["losses"] == 1
+
+    # Counted as a trade and a loss, but its P/L stays out of the sums
+    cells = backend.get("/stats/cube?account_id=1&group_by=outcome").get_json()
+    loss = next(cell for cell in cells if cell["outcome"] == "Loss")
+    assert (loss["trades"], loss["pnl_trades"], loss["pnl_sum"]) == (1, 0, 0)
+    assert [point["profit_loss"] for point in backend.get("/stats/pnl?account_id=1").get_json()] == [30.0]
+    with database.storage().transaction() as conn:
+        assert cube.verify(conn.cursor()) == []
+        expression = outcomes.expression("t", outcomes.DEFAULT_THRESHOLD)
+        assert conn.execute(f"SELECT {expression} FROM trades t WHERE filename = 'usd.md'").fetchone() == ("Loss",)
@@ -0,0 +1,55 @@
+import pytest
+
+from utils import cube, storage
+
+ACCOUNTS = [str(i) for i in range(1, 14)]
+
+
+@pytest.fixture
+def sharded(database, monkeypatch):
+    """
+    The test database with one shard per account, more shards than SQLite can attach.
+    """
+    monkeypatch.setattr(storage, "SHARDING", "account")
+    store = database.storage()
+    assert store.sharded
+    store.execute_many("INSERT INTO accounts (name, type) VALUES (?, 'Real')", [(f"Account {a}",) for a in ACCOUNTS])
+    trades = [
+        {"account_id": account_id, "filename": f"trade_{account_id}_{i}.md", "opened": f"0{i + 1}/03/2024 09:30",
+         "open_day": "Friday", "profit_loss": f"{(i - 1) * 10:.2f}", "strategy_used": "FVG Retest"}
+        for account_id in ACCOUNTS for i in range(3)
+    ]
+    assert database.insert_trades(trades)["inserted"] == len(trades)
+    assert len(store.shard_paths()) == len(ACCOUNTS)
+    return database
+
+
+def test_cross_account_reads_beyond_the_attach_limit(sharded, capsys):
+    store = sharded.storage()
+    assert sum(row[0] for row in store.query_each("SELECT COUNT(*) FROM trades")) == 3 * len(ACCOUNTS)
+
+    pages = list(sharded.iter_trade_pages(page_size=7))
+    assert sum(len(page) for page in pages) == 3 * len(ACCOUNTS)
+    assert [row[0] for page in pages for row in page] == sorted(row[0] for page in pages for row in page)
+
+    sharded.view_summary()
+    lines = [line.split() for line in capsys.readouterr().out.splitlines() if line.strip()[:1].isdigit()]
+    # ID, name (two words), type, trades, wins, losses, win %, P/L
+    assert [(line[0], line[4], line[5], line[6], line[8]) for line in lines] == [
+        (account_id, "3", "1", "1", "0.00") for account_id in ACCOUNTS
+    ]
+
+
+def test_cube_slices_are_merged_across_shards(sharded):
+    store = sharded.storage()
+    query, params, fields = cube.slice_query(["outcome"])
+    connections = store.analytics_connections()
+    try:
+        rows = cube.merge_slices([conn.execute(query, params).fetchall() for conn in connections], ["outcome"])
+    finally:
+        for conn in connections:
+            conn.close()
+    by_outcome = {row[0]: dict(zip(fields, row)) for row in rows}
+    assert sorted(by_outcome) == ["Break-even", "Loss", "Win"]
+    assert all(cell["trades"] == len(ACCOUNTS) for cell in by_outcome.values())
+    assert by_outcome["Win"]["pnl_sum"] == pytest.approx(10.0 * len(ACCOUNTS))